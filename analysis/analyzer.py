@@ -9,25 +9,39 @@ from analysis.classifier import (
 from filters.shock_filter import filter_vehicle_shock
 from filters.vibration_filter import filter_vehicle_vibration
 import math
+import threading
 import time
+import numpy as np
+from datetime import datetime
 # from analysis.buffer import first_data_received_time, buffer.INITIAL_SKIP_PERIOD, buffer.data_buffer
 from analysis.visualizer import create_analysis_visualization
 from analysis.saver import save_analysis_to_database
+from analysis.reading import ReadingColumns, SENSOR_COUNT
+from analysis.windowing import (
+    SlidingWindowAggregator, extract_surface_changes, extract_shock_candidates,
+    extract_vibration_candidates, extract_speeds
+)
+
+# Urutan keparahan klasifikasi (jendela overlap hanya melaporkan kerusakan yang lebih berat)
+DAMAGE_SEVERITY_RANK = {'baik': 0, 'rusak_ringan': 1, 'rusak_sedang': 2, 'rusak_berat': 3}
 
 
 
-def analyze_speed_data(data_points):
+def analyze_speed_data(window):
     """Analisis data kecepatan untuk tracking dan informasi saja (bukan klasifikasi)"""
-    speeds = []
-    
-    for data in data_points:
-        speed = data.get('speed')  # km/h dari GPS
-        if speed is not None and speed >= 0:
-            speeds.append(speed)
-    
-    if not speeds:
+    # km/h dari GPS (NaN jika tidak ada, tidak lolos >= 0)
+    return summarize_speed_data(extract_speeds(window))
+
+def summarize_speed_data(speeds):
+    """Statistik kecepatan dari list kecepatan GPS valid (km/h)"""
+    speed_analysis = {'speeds': speeds}
+    speed_analysis.update(speed_stats(len(speeds), sum(speeds), max(speeds, default=0), min(speeds, default=0)))
+    return speed_analysis
+
+def speed_stats(count, total, max_speed, min_speed):
+    """Statistik kecepatan dari count/jumlah/max/min (list atau running aggregate jendela)"""
+    if not count:
         return {
-            'speeds': speeds,
             'avg_speed': 0,
             'max_speed': 0,
             'min_speed': 0,
@@ -36,9 +50,7 @@ def analyze_speed_data(data_points):
             'has_speed_data': False
         }
     
-    avg_speed = sum(speeds) / len(speeds)
-    max_speed = max(speeds)
-    min_speed = min(speeds)
+    avg_speed = total / count
     
     # Format range kecepatan
     if min_speed == max_speed:
@@ -47,53 +59,89 @@ def analyze_speed_data(data_points):
         speed_range = f"{min_speed:.1f} - {max_speed:.1f} km/h"
     
     return {
-        'speeds': speeds,
         'avg_speed': avg_speed,
         'max_speed': max_speed,
         'min_speed': min_speed,
         'speed_range': speed_range,
-        'count': len(speeds),
+        'count': count,
         'has_speed_data': True
     }
 
-def analyze_surface_changes(data_points):
+def analyze_surface_changes(window):
     """Analisis perubahan permukaan jalan dari data ultrasonic"""
-    changes = []
-    
-    for i in range(1, len(data_points)):
-        prev_data = data_points[i-1]
-        curr_data = data_points[i]
-        
-        for sensor_idx in range(1, 9):
-            sensor_key = f'sensor{sensor_idx}'
-            prev_val = prev_data.get(sensor_key)
-            curr_val = curr_data.get(sensor_key)
-            
-            if prev_val is not None and curr_val is not None and prev_val != -1 and curr_val != -1:
-                change = curr_val - prev_val  # Bisa positif atau negatif
-                if abs(change) >= SURFACE_CHANGE_THRESHOLDS['minor']:
-                    changes.append(change)  # Simpan dengan tanda asli
-    
+    return summarize_surface_changes(*extract_surface_changes(window))
+
+def summarize_surface_changes(changes, channels=None):
+    """
+    Statistik perubahan permukaan dari array perubahan (cm, dengan tanda asli).
+    channels (index sensor 0-7 tiap perubahan) menambahkan statistik per sensor.
+    """
+    changes = np.asarray(changes, dtype=np.float64)
+    count = len(changes)
+    magnitudes = np.abs(changes)
+    positive = changes[changes > 0]
+    negative = changes[changes < 0]
+    
+    surface_analysis = {'changes': changes.tolist()}
+    surface_analysis.update(surface_change_stats(
+        count,
+        sum(magnitudes.tolist()),  # sum() Python: avg_change sama persis dengan implementasi list
+        magnitudes.max().item() if count else 0,
+        positive.max().item() if len(positive) else 0,
+        negative.min().item() if len(negative) else 0
+    ))
+    if channels is not None:
+        surface_analysis['channels'] = summarize_surface_channels(changes, magnitudes, channels)
+    return surface_analysis
+
+def surface_change_stats(count, total, max_change, max_positive, max_negative):
+    """Statistik perubahan permukaan dari count/jumlah |perubahan|/max (list atau running aggregate jendela)"""
+    return {
+        'max_change': max_change,  # ABSOLUT untuk klasifikasi
+        'avg_change': total / count if count else 0,  # ABSOLUT
+        'max_positive': max_positive,  # Lubang terdalam
+        'max_negative': max_negative,  # Gundukan tertinggi
+        'count': count
+    }
+
+def summarize_surface_details(changes, channels):
+    """List perubahan permukaan dan statistik per sensor untuk jendela yang disimpan"""
     return {
-        'changes': changes,
-        'max_change': max([abs(c) for c in changes]) if changes else 0,  # ABSOLUT untuk klasifikasi
-        'avg_change': sum([abs(c) for c in changes]) / len(changes) if changes else 0,  # ABSOLUT
-        'max_positive': max([c for c in changes if c > 0]) if any(c > 0 for c in changes) else 0,  # Lubang terdalam
-        'max_negative': min([c for c in changes if c < 0]) if any(c < 0 for c in changes) else 0,  # Gundukan tertinggi
-        'count': len(changes)
+        'changes': changes.tolist(),
+        'channels': summarize_surface_channels(changes, np.abs(changes), channels)
     }
 
-def analyze_shocks(data_points):
+def summarize_surface_channels(changes, magnitudes, channels):
+    """Statistik perubahan permukaan per sensor ultrasonic (sensor1 - sensor8)"""
+    channels = np.asarray(channels, dtype=np.intp)
+    counts = np.bincount(channels, minlength=SENSOR_COUNT)
+    totals = np.bincount(channels, weights=magnitudes, minlength=SENSOR_COUNT)
+    max_change = np.zeros(SENSOR_COUNT)
+    max_positive = np.zeros(SENSOR_COUNT)
+    max_negative = np.zeros(SENSOR_COUNT)
+    np.maximum.at(max_change, channels, magnitudes)
+    np.maximum.at(max_positive, channels, np.maximum(changes, 0))
+    np.minimum.at(max_negative, channels, np.minimum(changes, 0))
+    
+    return [
+        {
+            'sensor': f"sensor{channel + 1}",
+            'count': int(counts[channel]),
+            'max_change': max_change[channel].item(),
+            'avg_change': (totals[channel] / counts[channel]).item() if counts[channel] else 0,
+            'max_positive': max_positive[channel].item(),
+            'max_negative': max_negative[channel].item()
+        }
+        for channel in range(SENSOR_COUNT)
+    ]
+
+def analyze_shocks(window):
     """Analisis guncangan dari shock_magnitude ESP32 (accelerometer)"""
-    shocks = []
-    
-    for data in data_points:
-        # Gunakan shock_magnitude dari ESP32 langsung
-        shock = data.get('shock_magnitude')
-        
-        if shock is not None and shock >= SHOCK_THRESHOLDS['light']:
-            shocks.append(shock)
-    
+    # Gunakan shock_magnitude dari ESP32 langsung (NaN tidak lolos threshold)
+    return analyze_shock_candidates(extract_shock_candidates(window))
+
+def analyze_shock_candidates(shocks):
+    """Filter kendaraan dan statistik untuk kandidat guncangan (>= threshold light) satu jendela"""
     # Terapkan filter kendaraan pada data shock
     if shocks:
         filter_result = filter_vehicle_shock(shocks)
@@ -131,17 +179,13 @@ def analyze_shocks(data_points):
         }
     }
 
-def analyze_vibrations(data_points):
+def analyze_vibrations(window):
     """Analisis getaran dari vibration_magnitude ESP32 (gyroscope)"""
-    vibrations = []
-    
-    for data in data_points:
-        # Gunakan vibration_magnitude dari ESP32 langsung
-        vibration = data.get('vibration_magnitude')
-        
-        if vibration is not None and abs(vibration) >= VIBRATION_THRESHOLDS['light']:
-            vibrations.append(abs(vibration))
-    
+    # Gunakan vibration_magnitude dari ESP32 langsung (NaN tidak lolos threshold)
+    return analyze_vibration_candidates(extract_vibration_candidates(window))
+
+def analyze_vibration_candidates(vibrations):
+    """Filter kendaraan & slope dan statistik untuk kandidat getaran (>= threshold light) satu jendela"""
     # Terapkan filter kendaraan dan slope pada data vibration
     if vibrations:
         filter_result = filter_vehicle_vibration(vibrations)
@@ -181,12 +225,15 @@ def analyze_vibrations(data_points):
         }
     }
 
-def detect_anomalies(data_points):
+def detect_anomalies(window):
     """Deteksi semua anomali dalam periode analisis"""
+    return build_anomalies(analyze_surface_changes(window), analyze_shocks(window), analyze_vibrations(window))
+
+def build_anomalies(surface_analysis, shock_analysis, vibration_analysis):
+    """Daftar anomali dari hasil analisis surface, shock (m/s²), dan vibration (deg/s) yang sudah dihitung"""
     anomalies = []
     
     # Analisis perubahan permukaan
-    surface_analysis = analyze_surface_changes(data_points)
     if surface_analysis['count'] > 0:
         anomalies.append({
             'type': 'surface_change',
@@ -195,7 +242,6 @@ def detect_anomalies(data_points):
         })
     
     # Analisis guncangan (m/s²) - dengan filter kendaraan
-    shock_analysis = analyze_shocks(data_points)
     if shock_analysis['count'] > 0:
         anomalies.append({
             'type': 'shock',
@@ -204,7 +250,6 @@ def detect_anomalies(data_points):
         })
     
     # Analisis getaran (deg/s) - dengan filter kendaraan dan slope
-    vibration_analysis = analyze_vibrations(data_points)
     if vibration_analysis['count'] > 0:
         anomalies.append({
             'type': 'vibration',
@@ -230,17 +275,15 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return EARTH_RADIUS * c
 
-def calculate_damage_length(data_points, has_damage=False):
+def calculate_damage_length(window, has_damage=False):
     """Menghitung panjang kerusakan berdasarkan data GPS - hanya jika ada kerusakan"""
     if not has_damage:
         return 0
     
-    gps_points = []
-    
-    for data in data_points:
-        if data.get('latitude') is not None and data.get('longitude') is not None:
-            gps_points.append((data['latitude'], data['longitude']))
-    
+    return calculate_track_length(window.gps_points())
+
+def calculate_track_length(gps_points):
+    """Panjang lintasan dari list (latitude, longitude) urut waktu, lompatan > MAX_GPS_GAP diabaikan"""
     if len(gps_points) < 2:
         return 0
     
@@ -257,44 +300,178 @@ def calculate_damage_length(data_points, has_damage=False):
     
     return total_distance
 
-def perform_30s_analysis():
-    """Melakukan analisis komprehensif setiap 30 detik dengan 3 parameter - SKIP 30 detik pertama"""
-    global last_analysis_time
+class AnalysisStageStats:
+    """Statistik waktu per tahap pipeline analisis jendela (semua device), untuk /status"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows = 0
+        self.stages = {}  # tahap -> [jumlah, total ms, max ms]
+    
+    def record(self, timings):
+        with self.lock:
+            self.windows += 1
+            for stage, elapsed_ms in timings.items():
+                stats = self.stages.setdefault(stage, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += elapsed_ms
+                stats[2] = max(stats[2], elapsed_ms)
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                "windows": self.windows,
+                "stages": {
+                    stage: {"count": count, "avg_ms": total_ms / count, "max_ms": max_ms}
+                    for stage, (count, total_ms, max_ms) in self.stages.items()
+                }
+            }
+
+
+class WindowAnalysis:
+    """
+    Pipeline analisis satu jendela (WindowSummary): setiap tahap dihitung sekali saat pertama dibutuhkan
+    dan di-cache selama umur jendela. Anomali, klasifikasi, dan panjang kerusakan diturunkan dari hasil
+    surface / shock / vibration yang sama (filter kendaraan tidak dijalankan ulang).
+    Waktu tiap tahap dicatat di `timings` (ms).
+    """
+    def __init__(self, window):
+        self.window = window
+        self.timings = {}
+        self._results = {}
+    
+    def stage(self, name, compute):
+        """Hasil tahap `name` (dihitung dengan compute() jika belum ada di cache)"""
+        if name not in self._results:
+            started_at = time.perf_counter()
+            self._results[name] = compute()
+            self.timings[name] = (time.perf_counter() - started_at) * 1000
+        return self._results[name]
+    
+    @property
+    def surface_analysis(self):
+        # Statistik dari running aggregate jendela
+        return self.stage('surface', lambda: surface_change_stats(*self.window.surface_stats))
+    
+    @property
+    def shock_analysis(self):
+        # m/s² dengan filter kendaraan (kandidat dari ringkasan pane)
+        return self.stage('shock', lambda: analyze_shock_candidates(self.window.shock_candidates))
+    
+    @property
+    def vibration_analysis(self):
+        # deg/s dengan filter kendaraan & slope
+        return self.stage('vibration', lambda: analyze_vibration_candidates(self.window.vibration_candidates))
+    
+    @property
+    def speed_analysis(self):
+        return self.stage('speed', lambda: speed_stats(*self.window.speed_stats))
+    
+    @property
+    def anomalies(self):
+        return self.stage('anomalies', lambda: build_anomalies(
+            self.surface_analysis, self.shock_analysis, self.vibration_analysis
+        ))
+    
+    @property
+    def damage_classification(self):
+        # Klasifikasi dengan 3 parameter
+        return self.stage('classification', lambda: classify_damage_three_params(
+            self.surface_analysis['max_change'], self.shock_analysis['max_shock'],
+            self.vibration_analysis['max_vibration']
+        ))
+    
+    @property
+    def has_damage(self):
+        return self.damage_classification != 'baik'
+    
+    @property
+    def damage_length(self):
+        # Hitung panjang kerusakan hanya jika ada kerusakan
+        return self.stage('damage_length', lambda: calculate_track_length(self.window.gps_points) if self.has_damage else 0)
+    
+    def attach_details(self):
+        """Detail list (perubahan permukaan per sensor, kecepatan) untuk kerusakan yang disimpan"""
+        def compute():
+            self.surface_analysis.update(summarize_surface_details(self.window.surface_changes, self.window.surface_channels))
+            self.speed_analysis['speeds'] = self.window.speeds
+            return True
+        self.stage('details', compute)
+    
+    def analysis_data(self):
+        return {
+            'surface_analysis': self.surface_analysis,
+            'shock_analysis': self.shock_analysis,
+            'vibration_analysis': self.vibration_analysis,
+            'speed_analysis': self.speed_analysis,
+            'damage_length': self.damage_length,
+            'anomalies': self.anomalies,
+            'damage_classification': self.damage_classification,
+            'start_location': self.window.start_location,
+            'end_location': self.window.end_location,
+            'has_damage': self.has_damage
+        }
+    
+    def format_timings(self):
+        return ", ".join(f"{stage} {elapsed_ms:.2f}ms" for stage, elapsed_ms in self.timings.items())
+
+
+def perform_30s_analysis(session, data_points=None):
+    """
+    Melakukan analisis komprehensif jendela 30 detik dengan 3 parameter - SKIP 30 detik pertama.
+    Jendela overlap (panjang ANALYSIS_INTERVAL, tiap ANALYSIS_HOP detik) disusun dari ringkasan pane
+    per device; setiap jendela yang selesai sejak analisis sebelumnya dievaluasi.
+    data_points opsional: data tertentu (misalnya replay offline), dianalisis per jendela dengan aggregator baru.
+    """
     import analysis.buffer as buffer
     
     current_time = time.time()
+    device_id = session.device_id
     
     # CEK APAKAH SUDAH MENERIMA DATA DARI ESP32
-    if buffer.first_data_received_time is None:
-        print(f"⏳ Belum menerima data dari ESP32 - Menunggu koneksi hardware...")
+    if session.first_data_received_time is None:
+        print(f"⏳ [{device_id}] Belum menerima data dari ESP32 - Menunggu koneksi hardware...")
         return
     
     # CEK APAKAH MASIH DALAM PERIODE SKIP 30 DETIK SETELAH DATA PERTAMA
-    elapsed_since_first_data = current_time - buffer.first_data_received_time
+    elapsed_since_first_data = current_time - session.first_data_received_time
     if elapsed_since_first_data < buffer.INITIAL_SKIP_PERIOD:
         remaining_time = buffer.INITIAL_SKIP_PERIOD - elapsed_since_first_data
-        print(f"⏳ Skipping analysis - Hardware warming up: {remaining_time:.1f}s remaining")
+        print(f"⏳ [{device_id}] Skipping analysis - Hardware warming up: {remaining_time:.1f}s remaining")
         print(f"💡 Reason: Sensor stabilization, GPS acquisition, initial data settling")
         return
     
-    data_points = buffer.data_buffer.get_data()
-    print(f"🔎🪲  DEBUG: MIN_DATA_POINTS = {MIN_DATA_POINTS}, data_buffer_count = {len(data_points)}")
+    # Kolom NumPy (view tanpa copy untuk buffer kolumnar) -> pane yang sudah selesai -> jendela
+    if data_points is None:
+        aggregator = session.window_aggregator
+        windows = aggregator.advance(session.data_buffer.get_columns())
+    else:
+        aggregator = SlidingWindowAggregator()
+        windows = aggregator.advance(ReadingColumns.from_readings(data_points), final=True)
     
-    if len(data_points) < MIN_DATA_POINTS:
-        print(f"⏳ Data tidak cukup untuk analisis: {len(data_points)}/{MIN_DATA_POINTS}")
+    for window in windows:
+        analyze_window(session, window, aggregator, elapsed_since_first_data)
+
+def analyze_window(session, window, aggregator, elapsed_since_first_data=0):
+    """Klasifikasi satu jendela (WindowSummary) dan simpan hasilnya jika ada kerusakan"""
+    device_id = session.device_id
+    print(f"🔎🪲  DEBUG: MIN_DATA_POINTS = {MIN_DATA_POINTS}, data_buffer_count = {len(window)}")
+    
+    if len(window) < MIN_DATA_POINTS:
+        print(f"⏳ Data tidak cukup untuk analisis: {len(window)}/{MIN_DATA_POINTS}")
         return
     
-    print(f"🔍 Memulai analisis 30 detik dengan {len(data_points)} data points...")
+    print(f"🔍 [{device_id}] Memulai analisis 30 detik dengan {len(window)} data points "
+          f"({window.pane_count} pane, berakhir {datetime.fromtimestamp(window.end_time):%H:%M:%S})...")
     print(f"📊 Menggunakan 3 parameter: Surface + Shock + Vibration")
     print(f"✅ Hardware sudah stabil - Warming up period selesai ({elapsed_since_first_data:.1f}s since first data)")
     
-    start_time = time.time()
+    pipeline = WindowAnalysis(window)
     
-    # Analisis berbagai aspek dengan filter
-    surface_analysis = analyze_surface_changes(data_points)
-    shock_analysis = analyze_shocks(data_points)        # m/s² dengan filter
-    vibration_analysis = analyze_vibrations(data_points) # deg/s dengan filter
-    speed_analysis = analyze_speed_data(data_points)
+    # Setiap fitur dihitung sekali (filter kendaraan termasuk), anomali & klasifikasi memakai hasil yang sama
+    surface_analysis = pipeline.surface_analysis
+    shock_analysis = pipeline.shock_analysis
+    vibration_analysis = pipeline.vibration_analysis
+    speed_analysis = pipeline.speed_analysis
     
     print(f"📊 Speed Info:")
     if speed_analysis['has_speed_data']:
@@ -304,67 +481,46 @@ def perform_30s_analysis():
     else:
         print(f"   - No GPS speed data available")
     
-    anomalies = detect_anomalies(data_points)
-    
-    # Tentukan lokasi awal dan akhir
-    start_location = None
-    end_location = None
-    
-    for data in data_points:
-        if data.get('latitude') is not None and data.get('longitude') is not None:
-            if start_location is None:
-                start_location = (data['latitude'], data['longitude'])
-            end_location = (data['latitude'], data['longitude'])
-    
-    # Klasifikasi dengan 3 parameter
-    max_surface_change = surface_analysis['max_change']
-    max_shock = shock_analysis['max_shock']
-    max_vibration = vibration_analysis['max_vibration']
-    
-    damage_classification = classify_damage_three_params(max_surface_change, max_shock, max_vibration)
-    
-    # Hitung panjang kerusakan jika ada kerusakan
-    has_damage = damage_classification != 'baik'
-    damage_length = calculate_damage_length(data_points, has_damage)
+    damage_classification = pipeline.damage_classification
+    has_damage = pipeline.has_damage
+    damage_length = pipeline.damage_length
     
     print(f"📊 Parameter Klasifikasi (3 Parameter dengan Filter):")
-    print(f"   - Surface Change Max: {max_surface_change:.2f} cm")
-    print(f"   - Shock Max: {max_shock:.2f} m/s² (FILTERED)")
-    print(f"   - Vibration Max: {max_vibration:.2f} deg/s (FILTERED)")
+    print(f"   - Surface Change Max: {surface_analysis['max_change']:.2f} cm")
+    print(f"   - Shock Max: {shock_analysis['max_shock']:.2f} m/s² (FILTERED)")
+    print(f"   - Vibration Max: {vibration_analysis['max_vibration']:.2f} deg/s (FILTERED)")
     print(f"   - Hasil Klasifikasi: {damage_classification.upper().replace('_', ' ')}")
     print(f"   - Panjang Kerusakan: {damage_length:.1f}m")
     
+    # Jendela overlap: kerusakan yang sama tidak disimpan berulang kali
+    if has_damage and not aggregator.claim_damage(window, damage_classification, DAMAGE_SEVERITY_RANK):
+        print(f"🔁 [{device_id}] Kerusakan sudah dilaporkan jendela sebelumnya (overlap) - tidak disimpan ulang")
+        finish_window_analysis(pipeline)
+        return
+    
     # HANYA PROSES LEBIH LANJUT JIKA ADA KERUSAKAN
     if has_damage:
         print(f"⚠️  KERUSAKAN TERDETEKSI - Memproses dan menyimpan data...")
         
-        # Compile analysis data
-        analysis_data = {
-            'surface_analysis': surface_analysis,
-            'shock_analysis': shock_analysis,
-            'vibration_analysis': vibration_analysis,
-            'speed_analysis': speed_analysis,
-            'damage_length': damage_length,
-            'anomalies': anomalies,
-            'damage_classification': damage_classification,
-            'start_location': start_location,
-            'end_location': end_location,
-            'has_damage': has_damage
-        }
+        # Compile analysis data (anomali dari hasil surface/shock/vibration yang sama)
+        pipeline.attach_details()
+        analysis_data = pipeline.analysis_data()
         
         # Buat dan simpan visualisasi
         image_path = None
         image_filename = None
         
         try:
-            image_path, image_filename = create_analysis_visualization(analysis_data)
+            image_path, image_filename = pipeline.stage(
+                'visualization', lambda: create_analysis_visualization(analysis_data)
+            )
             print(f"📸 Gambar analisis dibuat: {image_filename}")
         except Exception as e:
             print(f"❌ Error membuat visualisasi: {e}")
         
         # Simpan ke database dan kirim ke ThingsBoard
         try:
-            save_analysis_to_database(analysis_data, image_path, image_filename)
+            pipeline.stage('save', lambda: save_analysis_to_database(analysis_data, image_path, image_filename))
             print(f"✅ Analisis kerusakan tersimpan - Klasifikasi: {damage_classification}")
             print(f"📏 Panjang kerusakan: {damage_length:.1f}m")
             print(f"💾 Data dikirim ke MySQL dan ThingsBoard")
@@ -377,4 +533,13 @@ def perform_30s_analysis():
         print(f"💡 Resource saved: No MySQL insert, no ThingsBoard data, no image generated")
         print(f"📊 Threshold tidak terpenuhi untuk ketiga parameter")
     
-    buffer.last_analysis_time = current_time
+    finish_window_analysis(pipeline)
+
+def finish_window_analysis(pipeline):
+    """Catat waktu per tahap pipeline jendela ke statistik global"""
+    analysis_stage_stats.record(pipeline.timings)
+    print(f"⏱️ Tahap analisis: {pipeline.format_timings()}")
+
+
+# Statistik waktu tahap analisis jendela (semua device)
+analysis_stage_stats = AnalysisStageStats()
@@ -0,0 +1,250 @@
+import atexit
+import os
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from core.config import ARCHIVE_CONFIG
+
+# Skema kolom arsip: satu baris per data sensor, nama kolom sama seperti payload firmware
+ARCHIVE_SCHEMA = pa.schema(
+    [
+        ('device_id', pa.string()),
+        ('timestamp', pa.timestamp('ms')),      # Waktu data (jam device yang disinkronkan)
+        ('device_timestamp', pa.int64()),       # millis device
+        ('seq', pa.int64()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('speed', pa.float32()),
+        ('satellites', pa.int16()),
+    ]
+    + [(f'sensor{i}', pa.float32()) for i in range(1, 9)]
+    + [(key, pa.int32()) for key in ('accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ')]
+    + [(key, pa.float32()) for key in (
+        'accelX_ms2', 'accelY_ms2', 'accelZ_ms2', 'accel_magnitude_ms2',
+        'gyroX_dps', 'gyroY_dps', 'gyroZ_dps', 'rotation_magnitude_dps',
+        'shock_magnitude', 'vibration_magnitude'
+    )]
+)
+
+_ARCHIVE_FIELDS = tuple((field.name, field.type) for field in ARCHIVE_SCHEMA if field.name != 'device_id')
+
+
+def _partition_value(value):
+    """Nilai partisi aman untuk nama folder (MAC 'AA:BB:..' -> 'AA-BB-..')"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '-', value) or 'unknown'
+
+
+def _temp_path(path):
+    """File yang sedang ditulis diawali '.', diabaikan pyarrow.dataset saat membaca arsip"""
+    directory, filename = os.path.split(path)
+    return os.path.join(directory, f".{filename}.tmp")
+
+
+def build_archive_row(device_id, reading):
+    """Ambil kolom arsip dari Reading (NaN disimpan sebagai null)"""
+    values = reading.to_dict()
+    row = {'device_id': device_id}
+    for name, field_type in _ARCHIVE_FIELDS:
+        value = values.get(name)
+        if name == 'timestamp':
+            value = value if value is not None else datetime.now()
+        elif value is not None and pa.types.is_integer(field_type):
+            value = int(value)
+        row[name] = value
+    return row
+
+
+class SensorArchiver:
+    """
+    Arsip streaming data sensor mentah ke Parquet, partisi Hive-style:
+        <directory>/date=YYYY-MM-DD/device=<id>/part-<waktu>.parquet
+    Data dikumpulkan per partisi di memori dan ditulis sebagai satu row group
+    (row_group_size data, atau sisa data setiap flush_interval detik).
+    File ditutup (footer ditulis, siap dibaca) saat ganti hari, max_rows_per_file tercapai,
+    partisi idle, atau proses berhenti.
+    """
+    def __init__(self, directory, max_queue_size=20000, row_group_size=5000, flush_interval=60,
+                 max_rows_per_file=200000, compression='zstd'):
+        self.directory = directory
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.row_group_size = max(1, row_group_size)
+        self.flush_interval = flush_interval
+        self.max_rows_per_file = max_rows_per_file
+        self.compression = compression
+        self.pending = {}   # (tanggal, device_id) -> list row
+        self.writers = {}   # (tanggal, device_id) -> [ParquetWriter, path, jumlah row, waktu tulis terakhir]
+        self.thread = None
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'archived_rows': 0,
+            'row_groups': 0,
+            'files_closed': 0,
+            'errors': 0,
+            'max_write_ms': 0.0
+        }
+    
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self.thread = threading.Thread(target=self._run, name="sensor-archiver")
+            self.thread.daemon = True
+            self.thread.start()
+        atexit.register(self.close)
+        print(f"🗄️ Sensor archiver started: {self.directory} (row group {self.row_group_size} data)")
+    
+    def submit(self, device_id, reading):
+        """Masukkan satu data ke antrian arsip. Return False jika antrian penuh"""
+        if self.thread is None:
+            self.start()
+        
+        try:
+            self.queue.put_nowait(build_archive_row(device_id, reading))
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return False
+        
+        with self.lock:
+            self.stats['enqueued'] += 1
+        return True
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        with self.write_lock:
+            stats['pending_rows'] = sum(len(rows) for rows in self.pending.values())
+            stats['open_files'] = len(self.writers)
+        stats['directory'] = self.directory
+        return stats
+    
+    def close(self):
+        """Tulis semua data tertunda dan tutup semua file (dipanggil otomatis saat exit)"""
+        self._drain()
+        with self.write_lock:
+            for key in list(self.pending):
+                self._write_row_group(key)
+            for key in list(self.writers):
+                self._close_writer(key)
+    
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                row = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                row = None
+            
+            with self.write_lock:
+                if row is not None:
+                    self._add_row(row)
+                
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    last_flush = time.monotonic()
+                    self._flush_all()
+    
+    def _drain(self):
+        with self.write_lock:
+            while True:
+                try:
+                    self._add_row(self.queue.get_nowait())
+                except queue.Empty:
+                    return
+    
+    def _add_row(self, row):
+        key = (row['timestamp'].strftime('%Y-%m-%d'), row['device_id'])
+        rows = self.pending.setdefault(key, [])
+        rows.append(row)
+        if len(rows) >= self.row_group_size:
+            self._write_row_group(key)
+    
+    def _flush_all(self):
+        for key in list(self.pending):
+            self._write_row_group(key)
+        
+        # Tutup file partisi yang idle atau harinya sudah lewat supaya bisa dibaca
+        today = datetime.now().strftime('%Y-%m-%d')
+        now = time.monotonic()
+        for key, (_, _, _, last_write) in list(self.writers.items()):
+            if key[0] != today or now - last_write >= self.flush_interval * 2:
+                self._close_writer(key)
+    
+    def _write_row_group(self, key):
+        rows = self.pending.pop(key, None)
+        if not rows:
+            return
+        
+        started_at = time.monotonic()
+        try:
+            table = pa.Table.from_pylist(rows, schema=ARCHIVE_SCHEMA)
+            entry = self.writers.get(key)
+            if entry is None:
+                entry = self.writers[key] = self._open_writer(key)
+            entry[0].write_table(table, row_group_size=len(rows))
+            entry[2] += len(rows)
+            entry[3] = time.monotonic()
+        except (pa.ArrowException, OSError) as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"❌ Archive write error {key}: {e}")
+            return
+        
+        write_ms = (time.monotonic() - started_at) * 1000
+        with self.lock:
+            self.stats['archived_rows'] += len(rows)
+            self.stats['row_groups'] += 1
+            self.stats['max_write_ms'] = max(self.stats['max_write_ms'], write_ms)
+        
+        if entry[2] >= self.max_rows_per_file:
+            self._close_writer(key)
+    
+    def _open_writer(self, key):
+        date, device_id = key
+        partition = os.path.join(self.directory, f"date={date}", f"device={_partition_value(device_id)}")
+        os.makedirs(partition, exist_ok=True)
+        path = os.path.join(partition, f"part-{datetime.now().strftime('%H%M%S%f')}.parquet")
+        writer = pq.ParquetWriter(_temp_path(path), ARCHIVE_SCHEMA, compression=self.compression)
+        return [writer, path, 0, time.monotonic()]
+    
+    def _close_writer(self, key):
+        writer, path, row_count, _ = self.writers.pop(key)
+        try:
+            writer.close()
+            # File sementara di-rename setelah footer ditulis: reader hanya melihat file lengkap
+            os.replace(_temp_path(path), path)
+        except (pa.ArrowException, OSError) as e:
+            with self.lock:
+                self.stats['errors'] += 1
+            print(f"❌ Archive close error {path}: {e}")
+            return
+        with self.lock:
+            self.stats['files_closed'] += 1
+        print(f"🗄️ Archive file closed: {path} ({row_count} data)")
+
+
+# Archiver global data sensor mentah (None jika dimatikan lewat config)
+sensor_archiver = SensorArchiver(
+    ARCHIVE_CONFIG['directory'],
+    ARCHIVE_CONFIG['max_queue_size'],
+    ARCHIVE_CONFIG['row_group_size'],
+    ARCHIVE_CONFIG['flush_interval'],
+    ARCHIVE_CONFIG['max_rows_per_file'],
+    ARCHIVE_CONFIG['compression']
+) if ARCHIVE_CONFIG['enabled'] else None
+
+def archive_sensor_data(device_id, reading):
+    """Arsipkan satu data sensor mentah (Reading, tidak blocking)"""
+    if sensor_archiver is None:
+        return False
+    return sensor_archiver.submit(device_id, reading)
@@ -1,32 +1,567 @@
+import heapq
 import threading
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from operator import itemgetter
+
+import numpy as np
+
+from analysis.dedup import ReplayFilter
+from analysis.reading import ReadingColumns, SENSOR_COUNT
+from analysis.windowing import SlidingWindowAggregator
+from core.config import BUFFER_CONFIG
+from thresholds import (
+    ANALYSIS_INTERVAL, ANALYSIS_HOP, DEFAULT_DEVICE_ID, DEVICE_IDLE_TIMEOUT, MAX_DEVICES, DEVICE_SWEEP_INTERVAL,
+    CLOCK_RESYNC_THRESHOLD
+)
+
+BUFFER_BACKEND_COLUMNAR = 'columnar'
+BUFFER_BACKEND_DEQUE = 'deque'
+BUFFER_BACKEND_SHARED = 'shared'
+
+
+class InstrumentedLock:
+    """Lock writer buffer yang mencatat berapa kali (dan berapa lama) harus menunggu writer lain"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_seconds = 0.0
+    
+    def __enter__(self):
+        if not self._lock.acquire(blocking=False):
+            wait_start = time.perf_counter()
+            self._lock.acquire()
+            # Counter diubah saat lock dipegang, jadi tidak perlu lock tambahan
+            self.contended += 1
+            self.wait_seconds += time.perf_counter() - wait_start
+        self.acquisitions += 1
+        return self
+    
+    def __exit__(self, *exc_info):
+        self._lock.release()
+    
+    def get_stats(self):
+        return {
+            "lock_acquisitions": self.acquisitions,
+            "lock_contended": self.contended,
+            "lock_wait_ms": self.wait_seconds * 1000
+        }
 
-from thresholds import ANALYSIS_INTERVAL
 
 # Data storage untuk analisis 30 detik
 class DataBuffer:
+    """
+    Buffer jendela analisis (objek Reading), terurut berdasarkan waktu data.
+    Disimpan di deque: append di ekor dan eviction dari kepala O(1) amortized.
+    Data yang membawa timestamp device (millis) ditempatkan di waktu device + offset jam per device,
+    sehingga batch offline yang terlambat masuk di posisi waktu aslinya (merge di ekor deque).
+    
+    Reader (analisis, /status) tidak mengambil lock writer: get_data() memakai sequence lock.
+    Writer menaikkan version menjadi ganjil selama mengubah deque dan genap setelah selesai;
+    reader menyalin deque lalu mengulang jika version berubah. Snapshot (tuple) di-cache per version,
+    jadi reader berikutnya tanpa perubahan data tidak menyalin lagi.
+    """
     def __init__(self, max_duration=30):
         self.max_duration = max_duration
-        self.data_points = []
-        self.lock = threading.Lock()
+        self.data_points = deque()   # Urut berdasarkan waktu
+        self.point_times = deque()   # Epoch detik tiap data (sejajar data_points)
+        self.clock_offset = None  # Waktu server - waktu device (detik)
+        self.lock = InstrumentedLock()
+        self.version = 0  # Ganjil = writer sedang mengubah buffer
+        self._snapshot = (0, ())
+        self.snapshot_retries = BUFFER_CONFIG['snapshot_retries']
+        # Statistik reader (tanpa lock, nilainya perkiraan)
+        self.snapshot_reads = 0
+        self.snapshot_cache_hits = 0
+        self.snapshot_conflicts = 0
+        self.snapshot_fallbacks = 0
     
-    def add_data(self, data):
-        with self.lock:
-            current_time = datetime.now()
-            data['timestamp'] = current_time
-            self.data_points.append(data)
+    def add_data(self, reading, live=True, current_time=None):
+        """
+        Tambah satu Reading. live=True: data baru saja dikirim, dipakai untuk sinkronisasi jam device.
+        current_time: waktu server saat data diterima (replay WAL), default sekarang.
+        """
+        with self._mutating():
+            point_time = self._stamp(reading, current_time if current_time is not None else time.time(), live)
             
-            # Hapus data yang lebih dari 30 detik
-            cutoff_time = current_time - timedelta(seconds=self.max_duration)
-            self.data_points = [dp for dp in self.data_points if dp['timestamp'] >= cutoff_time]
+            if not self.point_times or point_time >= self.point_times[-1]:
+                self.point_times.append(point_time)
+                self.data_points.append(reading)
+            else:
+                self._merge_tail([(point_time, reading)])
+            
+            self._evict()
+    
+    def add_batch(self, batch, live=False, current_time=None):
+        """Tambah banyak data sekaligus: batch diurutkan lalu di-merge ke jendela (bukan rebuild per data)"""
+        if not batch:
+            return
+        
+        with self._mutating():
+            stamped = self._stamp_batch(batch, live, current_time)
+            
+            if not self.point_times or stamped[0][0] >= self.point_times[-1]:
+                self.point_times.extend(point_time for point_time, _ in stamped)
+                self.data_points.extend(data for _, data in stamped)
+            else:
+                self._merge_tail(stamped)
+            
+            self._evict()
     
     def get_data(self):
+        """Snapshot isi buffer (tuple immutable, konsisten) tanpa menahan writer"""
+        self.snapshot_reads += 1
+        version, snapshot = self._snapshot
+        if version == self.version:
+            self.snapshot_cache_hits += 1
+            return snapshot
+        
+        for _ in range(self.snapshot_retries):
+            version = self.version
+            if not version & 1:
+                try:
+                    snapshot = tuple(self.data_points)
+                except RuntimeError:
+                    snapshot = None  # deque berubah saat disalin
+                if snapshot is not None and self.version == version:
+                    self._snapshot = (version, snapshot)
+                    return snapshot
+            self.snapshot_conflicts += 1
+            time.sleep(0)
+        
+        # Writer terus aktif: ambil lock supaya reader tidak starvation
+        self.snapshot_fallbacks += 1
         with self.lock:
-            return list(self.data_points)
+            snapshot = tuple(self.data_points)
+            self._snapshot = (self.version, snapshot)
+        return snapshot
     
     def get_data_count(self):
+        return len(self.data_points)
+    
+    def get_latest(self):
+        """Data terbaru di jendela (None jika kosong) tanpa menyalin buffer; sequence lock seperti get_data()"""
+        for _ in range(self.snapshot_retries):
+            version = self.version
+            if not version & 1:
+                latest = self.data_points[-1] if self.data_points else None
+                if self.version == version:
+                    return latest
+            time.sleep(0)
+        
+        with self.lock:
+            return self.data_points[-1] if self.data_points else None
+    
+    def get_columns(self):
+        """Jendela dalam bentuk kolom NumPy (copy dari snapshot)"""
+        return ReadingColumns.from_readings(self.get_data())
+    
+    def clear(self):
+        with self._mutating():
+            self.data_points.clear()
+            self.point_times.clear()
+    
+    def get_stats(self):
+        """Statistik contention lock writer dan snapshot reader"""
+        stats = {
+            "backend": BUFFER_BACKEND_DEQUE,
+            "version": self.version,
+            "snapshot_reads": self.snapshot_reads,
+            "snapshot_cache_hits": self.snapshot_cache_hits,
+            "snapshot_conflicts": self.snapshot_conflicts,
+            "snapshot_fallbacks": self.snapshot_fallbacks
+        }
+        stats.update(self.lock.get_stats())
+        return stats
+    
+    @contextmanager
+    def _mutating(self):
+        # Writer: lock antar writer + version ganjil selama perubahan (sequence lock untuk reader)
+        with self.lock:
+            self.version += 1
+            try:
+                yield
+            finally:
+                self.version += 1
+    
+    def _merge_tail(self, stamped):
+        # Lepas ekor yang lebih baru dari data terlambat, lalu merge (biaya sebanding panjang overlap)
+        first_time = stamped[0][0]
+        tail = []
+        while self.point_times and self.point_times[-1] > first_time:
+            tail.append((self.point_times.pop(), self.data_points.pop()))
+        tail.reverse()
+        
+        for point_time, data in heapq.merge(tail, stamped, key=itemgetter(0)):
+            self.point_times.append(point_time)
+            self.data_points.append(data)
+    
+    def _evict(self):
+        # Hapus data yang lebih dari 30 detik dari data terbaru (jam device, bukan jam server)
+        cutoff_time = self.point_times[-1] - self.max_duration
+        while self.point_times[0] < cutoff_time:
+            self.point_times.popleft()
+            self.data_points.popleft()
+    
+    def _stamp(self, reading, current_time, live):
+        """Tentukan waktu data (epoch detik) dan set reading.timestamp sebagai datetime"""
+        device_millis = reading.device_timestamp
+        
+        if device_millis is None:
+            point_time = reading.timestamp.timestamp() if reading.timestamp is not None else current_time
+        else:
+            if live or self.clock_offset is None:
+                self._sync_clock(device_millis, current_time)
+            point_time = self.clock_offset + device_millis / 1000.0
+        
+        reading.timestamp = datetime.fromtimestamp(point_time)
+        return point_time
+    
+    def _stamp_batch(self, batch, live, current_time=None):
+        """Stamp semua data batch, return list (waktu, reading) terurut waktu"""
+        current_time = current_time if current_time is not None else time.time()
+        
+        # Sinkronisasi jam hanya dari data terbaru batch (data lama di batch memang terlambat)
+        device_times = [reading.device_timestamp for reading in batch if reading.device_timestamp is not None]
+        if device_times and (live or self.clock_offset is None):
+            self._sync_clock(max(device_times), current_time)
+        
+        return sorted(((self._stamp(reading, current_time, False), reading) for reading in batch), key=itemgetter(0))
+    
+    def _sync_clock(self, device_millis, current_time):
+        # Offset terkecil = latency jaringan terkecil; lompatan besar = device reboot (millis reset)
+        candidate = current_time - device_millis / 1000.0
+        if (self.clock_offset is None or candidate < self.clock_offset
+                or candidate - self.clock_offset > CLOCK_RESYNC_THRESHOLD):
+            self.clock_offset = candidate
+
+
+class ColumnarDataBuffer(DataBuffer):
+    """
+    Backend buffer kolumnar: tiap field (waktu, 8 ultrasonic, shock, vibration, lat/lon, speed)
+    disimpan di array NumPy yang dialokasikan di awal, jendela aktif = slot [start:end].
+    get_columns() memberi view tanpa copy. Slot yang sudah diberikan sebagai view tidak pernah ditulis ulang:
+    append hanya menulis slot kosong setelah end, sedangkan compaction, data terlambat, dan clear
+    menulis ke array baru (copy-on-write), sehingga view lama tetap konsisten.
+    
+    Karena itu reader tidak butuh lock sama sekali: setiap selesai menulis, writer mempublikasikan
+    (array, start, end) sebagai satu tuple (assignment atomik) dan reader membaca slot dari tuple itu.
+    """
+    def __init__(self, max_duration=30, capacity=1024):
+        # Tidak memakai deque DataBuffer; hanya clock sync, lock writer, dan statistik yang dipakai bersama
+        self.max_duration = max_duration
+        self.clock_offset = None
+        self.lock = InstrumentedLock()
+        self.version = 0
+        self.snapshot_reads = 0
+        self.snapshot_cache_hits = 0
+        self.snapshot_conflicts = 0
+        self.snapshot_fallbacks = 0
+        self.initial_capacity = max(16, capacity)
+        self._allocate(self.initial_capacity)
+        self.start = 0
+        self.end = 0
+        self._publish()
+    
+    def add_data(self, reading, live=True, current_time=None):
+        with self.lock:
+            point_time = self._stamp(reading, current_time if current_time is not None else time.time(), live)
+            self._insert([(point_time, reading)])
+    
+    def add_batch(self, batch, live=False, current_time=None):
+        if not batch:
+            return
+        with self.lock:
+            self._insert(self._stamp_batch(batch, live, current_time))
+    
+    def get_data(self):
+        """Snapshot isi buffer (tuple immutable) dari jendela yang terakhir dipublikasikan"""
+        self.snapshot_reads += 1
+        columns, start, end = self._window
+        readings = columns[-1]  # Kolom terakhir = objek Reading
+        return tuple(readings[start:end].tolist())
+    
+    def get_data_count(self):
+        _, start, end = self._window
+        return end - start
+    
+    def get_latest(self):
+        columns, start, end = self._window
+        return columns[-1][end - 1] if end > start else None
+    
+    def get_columns(self):
+        """View kolom jendela aktif (tanpa copy, read-only, tanpa lock)"""
+        self.snapshot_reads += 1
+        columns, start, end = self._window
+        views = [array[start:end] for array in columns]
+        for view in views:
+            view.flags.writeable = False
+        return ReadingColumns(*views)
+    
+    def clear(self):
+        with self.lock:
+            self._allocate(self.initial_capacity)
+            self.start = 0
+            self.end = 0
+            self._publish()
+    
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["backend"] = BUFFER_BACKEND_COLUMNAR
+        stats["capacity"] = self.capacity
+        return stats
+    
+    @property
+    def capacity(self):
+        return len(self.times)
+    
+    def _allocate(self, capacity):
+        self.times = np.empty(capacity, dtype=np.float64)
+        self.sensors = np.empty((capacity, SENSOR_COUNT), dtype=np.float64)
+        self.shock_magnitude = np.empty(capacity, dtype=np.float64)
+        self.vibration_magnitude = np.empty(capacity, dtype=np.float64)
+        self.latitude = np.empty(capacity, dtype=np.float64)
+        self.longitude = np.empty(capacity, dtype=np.float64)
+        self.speed = np.empty(capacity, dtype=np.float64)
+        self.readings = np.empty(capacity, dtype=object)
+    
+    def _columns(self):
+        return (self.times, self.sensors, self.shock_magnitude, self.vibration_magnitude,
+                self.latitude, self.longitude, self.speed, self.readings)
+    
+    def _insert(self, stamped):
+        count = self.end - self.start
+        first_time = stamped[0][0]
+        
+        if count == 0 or first_time >= self.times[self.end - 1]:
+            # Jalur normal: append di slot kosong setelah end
+            if self.end + len(stamped) > self.capacity:
+                self._reallocate(count + len(stamped), self.start, self.end)
+            self._write(self.end, stamped)
+            self.end += len(stamped)
+        else:
+            # Data terlambat: ekor yang overlap di-merge ke array baru (view lama tidak berubah)
+            split = self.start + int(np.searchsorted(self.times[self.start:self.end], first_time, side='right'))
+            tail = list(zip(self.times[split:self.end].tolist(), self.readings[split:self.end].tolist()))
+            merged = list(heapq.merge(tail, stamped, key=itemgetter(0)))
+            self._reallocate(split - self.start + len(merged), self.start, split)
+            self._write(self.end, merged)
+            self.end += len(merged)
+        
+        self._evict()
+        self._publish()
+    
+    def _publish(self):
+        # Slot [start:end] array ini tidak akan ditulis ulang, aman dibaca reader tanpa lock
+        self._window = (self._columns(), self.start, self.end)
+        self.version += 1
+    
+    def _reallocate(self, needed, copy_start, copy_end):
+        """Pindahkan slot [copy_start:copy_end] ke awal array baru dengan ruang untuk `needed` data"""
+        old_columns = self._columns()
+        capacity = self.capacity
+        while capacity < needed * 2:
+            capacity *= 2
+        self._allocate(capacity)
+        count = copy_end - copy_start
+        for new_array, old_array in zip(self._columns(), old_columns):
+            new_array[:count] = old_array[copy_start:copy_end]
+        self.start = 0
+        self.end = count
+    
+    def _write(self, index, stamped):
+        rows = slice(index, index + len(stamped))
+        readings = [reading for _, reading in stamped]
+        count = len(readings)
+        self.times[rows] = [point_time for point_time, _ in stamped]
+        self.sensors[rows] = [reading.sensors for reading in readings]
+        self.shock_magnitude[rows] = np.fromiter((r.shock_magnitude for r in readings), np.float64, count)
+        self.vibration_magnitude[rows] = np.fromiter((r.vibration_magnitude for r in readings), np.float64, count)
+        self.latitude[rows] = np.fromiter((r.latitude for r in readings), np.float64, count)
+        self.longitude[rows] = np.fromiter((r.longitude for r in readings), np.float64, count)
+        self.speed[rows] = np.fromiter((r.speed for r in readings), np.float64, count)
+        self.readings[rows] = readings
+    
+    def _evict(self):
+        # Geser start melewati data > max_duration dari data terbaru (binary search, tanpa memindah data)
+        cutoff_time = self.times[self.end - 1] - self.max_duration
+        evicted = int(np.searchsorted(self.times[self.start:self.end], cutoff_time, side='left'))
+        # Slot lama tidak dikosongkan (mungkin masih dibaca lewat view); dilepas saat realokasi
+        self.start += evicted
+
+
+def create_data_buffer(max_duration=ANALYSIS_INTERVAL):
+    """Buat buffer jendela in-process sesuai BUFFER_CONFIG['backend'] ('columnar' atau 'deque')"""
+    if BUFFER_CONFIG['backend'] == BUFFER_BACKEND_COLUMNAR:
+        return ColumnarDataBuffer(max_duration, BUFFER_CONFIG['initial_capacity'])
+    return DataBuffer(max_duration)
+
+
+class DeviceSession:
+    """State ingest per device ESP32: buffer, waktu warming up, dan jadwal analisis"""
+    def __init__(self, device_id, max_duration=ANALYSIS_INTERVAL):
+        self.device_id = device_id
+        # Buffer menyimpan satu hop lebih lama dari jendela supaya pane terakhir sempat diringkas
+        self.data_buffer = create_data_buffer(max_duration + ANALYSIS_HOP)
+        self.window_aggregator = SlidingWindowAggregator(max_duration, ANALYSIS_HOP)
+        self.first_data_received_time = None  # Waktu pertama data diterima dari device ini
+        self.last_analysis_time = 0
+        self.warming_up_cleared = False
+        self.last_seen = time.time()
+        self.replay_filter = ReplayFilter()  # Buang data replay (seq / timestamp device sama)
+        self.offline_replay = []  # Data offline baru (replay yang sedang berjalan) yang belum dianalisis
+        self.bulk_pending = {}  # batch_id request /multisensor/bulk -> [waktu terima terakhir, potongan yang menunggu]
+        self.usage_lock = threading.Lock()
+        self.users = 0  # Batch ingest / job analisis yang sedang memakai session
+        self.closed = False
+    
+    def touch(self, current_time=None):
+        self.last_seen = current_time if current_time is not None else time.time()
+    
+    def acquire_analysis(self, current_time=None):
+        """Boleh menjalankan analisis device ini di proses ini (selalu, untuk session in-process)"""
+        return True
+    
+    def begin_use(self):
+        """Tandai session dipakai worker (ingest/analisis). False jika session sudah dihapus dari registry"""
+        with self.usage_lock:
+            if self.closed:
+                return False
+            self.users += 1
+            return True
+    
+    def end_use(self):
+        with self.usage_lock:
+            self.users -= 1
+            release = self.closed and self.users == 0
+        if release:
+            self.release()
+    
+    def close(self):
+        """
+        Dipanggil saat session dihapus dari registry. Resource dilepas (release) setelah pemakai
+        terakhir selesai, sehingga batch ingest / job analisis yang sedang berjalan tidak terputus.
+        """
+        with self.usage_lock:
+            if self.closed:
+                return
+            self.closed = True
+            release = self.users == 0
+        if release:
+            self.release()
+    
+    def release(self):
+        """Lepas resource session (session in-process: tidak ada)"""
+        pass
+
+
+def create_device_session(device_id, max_duration=ANALYSIS_INTERVAL):
+    """Session device sesuai backend buffer (shared memory antar worker atau in-process)"""
+    if BUFFER_CONFIG['backend'] == BUFFER_BACKEND_SHARED:
+        # Import di sini: backend shared butuh fcntl (POSIX) dan tidak dipakai mode default
+        from analysis.shared_buffer import SharedDeviceSession
+        return SharedDeviceSession(device_id, max_duration)
+    return DeviceSession(device_id, max_duration)
+
+
+class DeviceRegistry:
+    """Registry session per device, dengan eviction device idle dan batas LRU"""
+    def __init__(self, max_duration=ANALYSIS_INTERVAL, idle_timeout=DEVICE_IDLE_TIMEOUT,
+                 max_devices=MAX_DEVICES, sweep_interval=DEVICE_SWEEP_INTERVAL):
+        self.max_duration = max_duration
+        self.idle_timeout = idle_timeout
+        self.max_devices = max_devices
+        self.sweep_interval = sweep_interval
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.last_sweep_time = time.time()
+        self.evicted_count = 0
+    
+    def get_session(self, device_id):
+        """Ambil session device (dibuat jika belum ada) dan tandai sebagai aktif"""
+        current_time = time.time()
+        with self.lock:
+            session = self.sessions.get(device_id)
+            if session is None:
+                session = create_device_session(device_id, self.max_duration)
+                self.sessions[device_id] = session
+                print(f"🆕 Device baru terdaftar: {device_id} ({len(self.sessions)} device aktif)")
+            else:
+                self.sessions.move_to_end(device_id)
+            session.touch(current_time)
+            
+            if current_time - self.last_sweep_time >= self.sweep_interval:
+                self._evict_idle(current_time)
+            
+            # Batas jumlah device: buang yang paling lama tidak aktif
+            while len(self.sessions) > self.max_devices:
+                old_id, old_session = self.sessions.popitem(last=False)
+                old_session.close()
+                self.evicted_count += 1
+                print(f"🗑️ Device {old_id} dihapus (batas {self.max_devices} device)")
+            
+            return session
+    
+    def find_session(self, device_id):
+        """Ambil session tanpa membuat baru dan tanpa mengubah urutan LRU"""
+        with self.lock:
+            return self.sessions.get(device_id)
+    
+    def get_sessions(self):
+        with self.lock:
+            return list(self.sessions.values())
+    
+    @contextmanager
+    def sessions_in_use(self):
+        """Session aktif yang ditandai dipakai selama blok: resource-nya tidak dilepas walau di-evict"""
+        sessions = [session for session in self.get_sessions() if session.begin_use()]
+        try:
+            yield sessions
+        finally:
+            for session in sessions:
+                session.end_use()
+    
+    def latest_session(self):
+        """Session device yang terakhir mengirim data"""
+        with self.lock:
+            if not self.sessions:
+                return None
+            return next(reversed(self.sessions.values()))
+    
+    def evict_idle(self):
         with self.lock:
-            return len(self.data_points)
+            return self._evict_idle(time.time())
+    
+    def _evict_idle(self, current_time):
+        self.last_sweep_time = current_time
+        # OrderedDict terurut dari yang paling lama tidak aktif
+        evicted = []
+        for device_id, session in self.sessions.items():
+            if current_time - session.last_seen < self.idle_timeout:
+                break
+            evicted.append(device_id)
+        
+        for device_id in evicted:
+            self.sessions.pop(device_id).close()
+            print(f"💤 Device {device_id} idle > {self.idle_timeout}s - session dihapus")
+        
+        self.evicted_count += len(evicted)
+        return len(evicted)
+    
+    def __len__(self):
+        with self.lock:
+            return len(self.sessions)
+
+
+def resolve_device_id(data):
+    """Ambil device_id dari payload, fallback ke DEFAULT_DEVICE_ID"""
+    device_id = data.get('device_id') if isinstance(data, dict) else None
+    if device_id is None or device_id == '':
+        return DEFAULT_DEVICE_ID
+    return str(device_id)
 
 # Global buffer instance
 # data_buffer = None
@@ -34,9 +569,7 @@ class DataBuffer:
 # def init_buffer(duration):
 #     global data_buffer
 #     data_buffer = DataBuffer(duration)
-    
-# Global data buffer
-data_buffer = DataBuffer(ANALYSIS_INTERVAL)
-last_analysis_time = 0
-first_data_received_time = None  # Waktu pertama data diterima dari ESP32
-INITIAL_SKIP_PERIOD = 30  # Skip 30 detik pertama setelah data pertama
\ No newline at end of file
+
+# Registry session per device (menggantikan buffer & timestamp global)
+device_registry = DeviceRegistry(ANALYSIS_INTERVAL)
+INITIAL_SKIP_PERIOD = 30  # Skip 30 detik pertama setelah data pertama
@@ -0,0 +1,271 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+
+from analysis.buffer import device_registry
+from analysis.reading import readings_to_records, records_to_readings
+from core.config import SESSION_CHECKPOINT_CONFIG
+from core.wal import ingest_wal
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+try:
+    import fcntl
+except ImportError:  # Non-POSIX (development): tanpa lock antar proses
+    fcntl = None
+
+
+@contextmanager
+def checkpoint_file_lock(path):
+    """Lock eksklusif antar proses (flock) selama baca-gabung-tulis checkpoint"""
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SessionCheckpoint:
+    """
+    Snapshot berkala state session semua device ke satu file lokal (.npz): jendela buffer sebagai
+    record RECORD_DTYPE, ditambah waktu warming up, status warming up, jadwal analisis, offset jam,
+    dan posisi pane jendela analisis. Dipulihkan saat startup supaya restart tidak mengulang
+    INITIAL_SKIP_PERIOD dan analisis langsung berlanjut.
+    
+    File ditulis ke file sementara lalu os.replace (atomic); checkpoint tanpa perubahan tidak ditulis ulang.
+    Checkpoint yang lebih lama dari max_age diabaikan (device kemungkinan juga sudah restart).
+    
+    Beberapa worker memakai file yang sama: setiap worker menulis session di registry-nya dan
+    mempertahankan device lain yang sudah ada di file (ditulis worker lain, umur per device <= max_age),
+    di bawah flock supaya tidak ada worker yang menimpa device worker lain.
+    
+    Setiap checkpoint menutup segmen WAL aktif dan menulis penanda (waktu checkpoint) di awal segmen baru,
+    di bawah wal.apply_lock bersama snapshot: record sebelum penanda sudah ada di snapshot, record
+    sesudahnya belum (replay WAL memakai posisi ini, bukan waktu terima record). Segmen dihapus
+    setelah checkpoint berikutnya berhasil.
+    """
+    def __init__(self, path, interval=5, max_age=120, registry=None, wal=None):
+        self.path = path
+        self.interval = interval
+        self.max_age = max_age
+        self.registry = registry if registry is not None else device_registry
+        self.wal = wal
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_signature = None
+        self.wal_boundary = None  # Index segmen WAL aktif saat checkpoint sebelumnya
+        self.stats = {
+            'saves': 0,
+            'unchanged_skipped': 0,
+            'errors': 0,
+            'last_save_ms': 0.0,
+            'max_save_ms': 0.0,
+            'last_devices': 0,
+            'last_merged_devices': 0,
+            'last_bytes': 0,
+            'last_saved_at': None,
+            'wal_segments_truncated': 0,
+            'restored_devices': 0,
+            'restored_readings': 0,
+            'restore_ms': 0.0
+        }
+    
+    def start(self):
+        """Mulai thread checkpoint berkala (dan checkpoint terakhir saat proses keluar normal)"""
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._checkpoint_loop, name="session-checkpoint")
+            self.thread.daemon = True
+            self.thread.start()
+        atexit.register(self.save)
+        print(f"💾 Session checkpoint started: {self.path} (setiap {self.interval:g}s)")
+    
+    def save(self):
+        """Tulis checkpoint semua session. Return jumlah device, atau None jika tidak ada perubahan / gagal"""
+        with self.lock, self.registry.sessions_in_use() as sessions:
+            signature = tuple(
+                (session.device_id, session.data_buffer.version, session.last_analysis_time,
+                 session.first_data_received_time, session.warming_up_cleared)
+                for session in sessions
+            )
+            if signature == self.last_signature:
+                self.stats['unchanged_skipped'] += 1
+                return None
+            
+            started_at = time.monotonic()
+            saved_at = time.time()
+            devices = []
+            windows = []
+            # Worker ingest tidak bisa menyelipkan append WAL + update buffer di antara penanda dan snapshot
+            with self.wal.apply_lock if self.wal is not None else nullcontext():
+                wal_boundary = self.wal.rotate(saved_at) if self.wal is not None else None
+                for session in sessions:
+                    windows.append(session.data_buffer.get_data())
+                    devices.append({
+                        "device_id": session.device_id,
+                        "saved_at": saved_at,
+                        "first_data_received_time": session.first_data_received_time,
+                        "warming_up_cleared": session.warming_up_cleared,
+                        "last_analysis_time": session.last_analysis_time,
+                        "last_seen": session.last_seen,
+                        "clock_offset": session.data_buffer.clock_offset,
+                        "aggregator": session.window_aggregator.export_state()
+                    })
+            arrays = {
+                f'records_{i}': readings_to_records([(reading.timestamp.timestamp(), reading) for reading in readings])
+                for i, readings in enumerate(windows)
+            }
+            own_count = len(devices)
+            
+            # Nama file sementara per proses: beberapa worker bisa checkpoint ke path yang sama
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with checkpoint_file_lock(f"{self.path}.lock"):
+                    merged_count = self._merge_saved_devices(devices, arrays, saved_at)
+                    meta = {"format": CHECKPOINT_FORMAT_VERSION, "saved_at": saved_at, "devices": devices}
+                    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+                    with open(temp_path, 'wb') as checkpoint_file:
+                        np.savez(checkpoint_file, **arrays)
+                        checkpoint_file.flush()
+                        os.fsync(checkpoint_file.fileno())
+                        size = checkpoint_file.tell()
+                    os.replace(temp_path, self.path)
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"❌ Session checkpoint error: {e}")
+                return None
+            
+            self.last_signature = signature
+            if self.wal_boundary is not None:
+                self.stats['wal_segments_truncated'] += self.wal.truncate(self.wal_boundary)
+            self.wal_boundary = wal_boundary
+            save_ms = (time.monotonic() - started_at) * 1000
+            self.stats['saves'] += 1
+            self.stats['last_save_ms'] = save_ms
+            self.stats['max_save_ms'] = max(self.stats['max_save_ms'], save_ms)
+            self.stats['last_devices'] = own_count
+            self.stats['last_merged_devices'] = merged_count
+            self.stats['last_bytes'] = size
+            self.stats['last_saved_at'] = saved_at
+            return own_count
+    
+    def restore(self, current_time=None):
+        """
+        Pulihkan session dari checkpoint (dipanggil sekali saat startup, sebelum replay WAL).
+        Return dict device_id -> waktu checkpoint; record WAL sebelum penanda waktu itu sudah ada di buffer.
+        """
+        current_time = current_time if current_time is not None else time.time()
+        if not os.path.exists(self.path):
+            return {}
+        
+        started_at = time.monotonic()
+        try:
+            with np.load(self.path, allow_pickle=False) as checkpoint:
+                meta = json.loads(checkpoint['meta'].tobytes().decode('utf-8'))
+                if meta.get('format') != CHECKPOINT_FORMAT_VERSION:
+                    print(f"⚠️ Session checkpoint {self.path}: format {meta.get('format')} tidak dikenal, diabaikan")
+                    return {}
+                
+                saved_at = meta['saved_at']
+                age = current_time - saved_at
+                if age > self.max_age:
+                    print(f"⚠️ Session checkpoint {self.path} sudah {age:.0f}s (> {self.max_age:g}s), diabaikan")
+                    return {}
+                
+                restored = {}
+                reading_count = 0
+                for i, device in enumerate(meta['devices']):
+                    device_id = device['device_id']
+                    device_saved_at = device.get('saved_at', saved_at)
+                    if current_time - device_saved_at > self.max_age:
+                        continue  # Ditulis worker lain yang sudah lama tidak menerima data device ini
+                    session = self.registry.get_session(device_id)
+                    if session.data_buffer.get_data_count():
+                        continue  # Buffer shared memory masih hidup (worker lain), tidak perlu dipulihkan
+                    
+                    readings = records_to_readings(checkpoint[f'records_{i}'], device_id)
+                    session.data_buffer.clock_offset = device['clock_offset']
+                    session.data_buffer.add_batch(readings, live=False, current_time=device_saved_at)
+                    session.first_data_received_time = device['first_data_received_time']
+                    session.warming_up_cleared = device['warming_up_cleared']
+                    session.last_analysis_time = device['last_analysis_time']
+                    session.window_aggregator.restore_state(device['aggregator'], session.data_buffer.get_columns())
+                    session.touch(device['last_seen'])
+                    
+                    restored[device_id] = device_saved_at
+                    reading_count += len(readings)
+        except (OSError, ValueError, KeyError) as e:
+            self.stats['errors'] += 1
+            print(f"❌ Session checkpoint restore error {self.path}: {e}")
+            return {}
+        
+        restore_ms = (time.monotonic() - started_at) * 1000
+        self.stats['restored_devices'] = len(restored)
+        self.stats['restored_readings'] = reading_count
+        self.stats['restore_ms'] = restore_ms
+        print(f"💾 Session checkpoint restored: {len(restored)} device, {reading_count} data "
+              f"(umur {age:.1f}s, {restore_ms:.0f}ms)")
+        return restored
+    
+    def _merge_saved_devices(self, devices, arrays, current_time):
+        """Tambahkan device dari checkpoint di disk yang tidak ada di registry proses ini. Return jumlahnya"""
+        if not os.path.exists(self.path):
+            return 0
+        
+        own_devices = {device['device_id'] for device in devices}
+        merged = 0
+        try:
+            with np.load(self.path, allow_pickle=False) as checkpoint:
+                meta = json.loads(checkpoint['meta'].tobytes().decode('utf-8'))
+                if meta.get('format') != CHECKPOINT_FORMAT_VERSION:
+                    return 0
+                for i, device in enumerate(meta['devices']):
+                    device.setdefault('saved_at', meta['saved_at'])
+                    if device['device_id'] in own_devices or current_time - device['saved_at'] > self.max_age:
+                        continue
+                    arrays[f'records_{len(devices)}'] = checkpoint[f'records_{i}']
+                    devices.append(device)
+                    merged += 1
+        except (OSError, ValueError, KeyError) as e:
+            self.stats['errors'] += 1
+            print(f"⚠️ Session checkpoint {self.path} tidak bisa digabung (ditimpa): {e}")
+        return merged
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['path'] = self.path
+        stats['interval'] = self.interval
+        stats['max_age'] = self.max_age
+        return stats
+    
+    def _checkpoint_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.save()
+            except Exception as e:
+                self.stats['errors'] += 1
+                print(f"❌ Session checkpoint error: {e}")
+
+
+# Checkpoint global session device (None jika dimatikan lewat config)
+session_checkpoint = SessionCheckpoint(
+    SESSION_CHECKPOINT_CONFIG['path'],
+    SESSION_CHECKPOINT_CONFIG['interval'],
+    SESSION_CHECKPOINT_CONFIG['max_age'],
+    wal=ingest_wal
+) if SESSION_CHECKPOINT_CONFIG['enabled'] else None
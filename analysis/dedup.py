@@ -0,0 +1,120 @@
+from collections import deque
+
+from thresholds import DEDUP_WINDOW_SIZE, CLOCK_RESYNC_THRESHOLD
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class SequenceWindow:
+    """
+    Sliding bitmap nomor urut (seq): bit ke-i = seq (highest - i) sudah diterima.
+    Seq yang sudah tertinggal di belakang window dibuang sebagai duplikat; reboot device
+    ditangani ReplayFilter.observe_clock dengan membuat window baru.
+    """
+    def __init__(self, size=DEDUP_WINDOW_SIZE):
+        self.size = size
+        self.mask = (1 << size) - 1
+        self.highest = None
+        self.bitmap = 0
+
+    def check_and_add(self, seq):
+        """Return True jika seq baru (dan tandai), False jika duplikat"""
+        if self.highest is None or seq > self.highest:
+            shift = seq - self.highest if self.highest is not None else self.size
+            self.bitmap = ((self.bitmap << shift) | 1) & self.mask if shift < self.size else 1
+            self.highest = seq
+            return True
+
+        offset = self.highest - seq
+        if offset >= self.size:
+            # Terlalu lama untuk dicek: anggap replay, jangan geser window
+            return False
+
+        bit = 1 << offset
+        if self.bitmap & bit:
+            return False
+        self.bitmap |= bit
+        return True
+
+
+class RecentKeySet:
+    """Set FIFO berukuran tetap untuk key tanpa urutan rapat (timestamp millis device)"""
+    def __init__(self, size=DEDUP_WINDOW_SIZE):
+        self.size = size
+        self.keys = set()
+        self.order = deque()
+
+    def check_and_add(self, key):
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        self.order.append(key)
+        if len(self.order) > self.size:
+            self.keys.discard(self.order.popleft())
+        return True
+
+
+class ReplayFilter:
+    """
+    Dedup data per device untuk replay /offline-data: pakai seq jika ada,
+    jika tidak pakai timestamp device (millis). Data tanpa keduanya selalu diterima.
+
+    Seq dan millis firmware disimpan di RAM dan mulai dari awal setelah device reboot, jadi reboot
+    dideteksi dari data live (observe_clock) lalu window di-reset. State filter ada di memori proses:
+    dengan beberapa worker, batch yang dikirim ulang ke worker lain tidak dikenali sebagai duplikat.
+    """
+    def __init__(self, size=DEDUP_WINDOW_SIZE, resync_threshold=CLOCK_RESYNC_THRESHOLD):
+        self.size = size
+        self.resync_threshold = resync_threshold
+        self.sequences = SequenceWindow(size)
+        self.timestamps = RecentKeySet(size)
+        self.duplicate_count = 0
+        self.reboot_count = 0
+        self.clock_offset = None  # Offset terkecil waktu server - millis device (detik), seperti buffer
+        self.last_device_millis = None
+
+    def observe_clock(self, readings, received_at):
+        """
+        Cek reboot device dari data live (realtime/bulk) sebelum accept(): millis terbaru mundur dan
+        offset jam melompat lebih dari resync_threshold (sinyal yang sama dengan sinkronisasi jam buffer).
+        Data yang dikirim ulang tidak memundurkan millis terbaru, jadi tetap dianggap duplikat.
+        Return True jika reboot terdeteksi (window seq dan timestamp di-reset).
+        """
+        device_times = [data.get('timestamp') for data in readings if is_number(data.get('timestamp'))]
+        if not device_times:
+            return False
+
+        device_millis = max(device_times)
+        candidate = received_at - device_millis / 1000.0
+        rebooted = (self.last_device_millis is not None and device_millis < self.last_device_millis
+                    and candidate - self.clock_offset > self.resync_threshold)
+
+        if rebooted:
+            self.sequences = SequenceWindow(self.size)
+            self.timestamps = RecentKeySet(self.size)
+            self.reboot_count += 1
+            self.clock_offset = candidate
+            self.last_device_millis = device_millis
+            return True
+
+        if self.clock_offset is None or candidate < self.clock_offset:
+            self.clock_offset = candidate
+        if self.last_device_millis is None or device_millis > self.last_device_millis:
+            self.last_device_millis = device_millis
+        return False
+
+    def accept(self, data):
+        seq = data.get('seq')
+        if isinstance(seq, int) and not isinstance(seq, bool):
+            is_new = self.sequences.check_and_add(seq)
+        else:
+            timestamp = data.get('timestamp')
+            if not is_number(timestamp):
+                return True
+            is_new = self.timestamps.check_and_add(timestamp)
+
+        if not is_new:
+            self.duplicate_count += 1
+        return is_new
@@ -0,0 +1,432 @@
+import time
+import queue
+import threading
+import zlib
+from contextlib import nullcontext
+from datetime import datetime
+from operator import attrgetter
+
+from thresholds import MIN_DATA_POINTS, ANALYSIS_INTERVAL, ANALYSIS_HOP, BULK_PENDING_TIMEOUT
+from analysis.buffer import INITIAL_SKIP_PERIOD, device_registry
+from analysis.scheduler import analysis_scheduler
+from analysis.saver import save_sensor_data
+from analysis.archiver import archive_sensor_data
+from analysis.reading import Reading
+from filters.shock_filter import process_realtime_shock
+from filters.vibration_filter import process_realtime_vibration
+from core.thingsboard import send_to_thingsboard
+from core.config import INGEST_QUEUE_CONFIG, WAL_CONFIG
+from core.wal import ingest_wal
+
+
+def check_warming_up(session, current_time):
+    """
+    Cek status warming up device. Return (warming_up, remaining_time, elapsed_since_first_data).
+    Buffer dibersihkan saat pertama kali keluar dari warming up.
+    """
+    # SET WAKTU PERTAMA MENERIMA DATA
+    if session.first_data_received_time is None:
+        session.first_data_received_time = current_time
+        print(f"🔌 ESP32 [{session.device_id}] connected! Hardware warming up started ({INITIAL_SKIP_PERIOD}s)")
+        print(f"💡 During warming up: NO data save, NO buffer collection, NO analysis")
+    
+    elapsed_since_first_data = current_time - session.first_data_received_time
+    
+    if elapsed_since_first_data < INITIAL_SKIP_PERIOD:
+        return True, INITIAL_SKIP_PERIOD - elapsed_since_first_data, elapsed_since_first_data
+    
+    # CLEAR BUFFER SAAT PERTAMA KALI KELUAR DARI WARMING UP
+    if not session.warming_up_cleared:
+        session.data_buffer.clear()  # Clear semua data warming up
+        session.window_aggregator.reset()
+        session.warming_up_cleared = True
+        session.last_analysis_time = current_time
+        print("🧹 Buffer cleared after warming up period - Starting fresh data collection")
+        print("✅ Hardware stabilized - Normal operations begin")
+    
+    return False, 0, elapsed_since_first_data
+
+
+def process_sensor_reading(session, data, verbose=True):
+    """Tambahkan data ke buffer device dan jalankan filter shock & vibration real-time"""
+    # Tambahkan ke buffer untuk analisis (HANYA SETELAH WARMING UP)
+    session.data_buffer.add_data(data)
+    
+    # Simpan data mentah ke database (HANYA SETELAH WARMING UP) - antrian writer batch
+    save_sensor_data(data)
+    archive_sensor_data(session.device_id, data)
+    
+    # Proses shock dan vibration real-time
+    shock_result = process_realtime_shock(data)
+    vibration_result = process_realtime_vibration(data)
+    
+    realtime_payload = {}
+    
+    if shock_result and shock_result['is_road_shock']:
+        realtime_payload["realtime_shock_ms2"] = shock_result['filtered_shock']
+        if verbose:
+            print(f"📡 Shock real-time: {shock_result['filtered_shock']:.2f} m/s²")
+    
+    if vibration_result and vibration_result['is_road_vibration']:
+        realtime_payload["realtime_vibration_dps"] = vibration_result['filtered_vibration']
+        if verbose:
+            print(f"📡 Vibration real-time: {vibration_result['filtered_vibration']:.2f} deg/s")
+    
+    return realtime_payload
+
+
+def process_sensor_batch(session, readings, live=False, current_time=None):
+    """
+    Versi batch process_sensor_reading: semua data di-merge ke buffer sekaligus (urut waktu device),
+    lalu filter real-time dijalankan per data. Return payload real-time gabungan (nilai puncak).
+    """
+    session.data_buffer.add_batch(readings, live=live, current_time=current_time)
+    for data in readings:
+        save_sensor_data(data)
+        archive_sensor_data(session.device_id, data)
+    
+    realtime_payload = {}
+    for data in readings:
+        shock_result = process_realtime_shock(data)
+        vibration_result = process_realtime_vibration(data)
+        
+        if shock_result and shock_result['is_road_shock']:
+            merge_realtime_payload(realtime_payload, {"realtime_shock_ms2": shock_result['filtered_shock']})
+        if vibration_result and vibration_result['is_road_vibration']:
+            merge_realtime_payload(realtime_payload, {"realtime_vibration_dps": vibration_result['filtered_vibration']})
+    
+    return realtime_payload
+
+
+def merge_realtime_payload(target, realtime_payload):
+    """Gabungkan payload real-time beberapa data (ambil nilai puncak) untuk satu kali kirim"""
+    for key, value in realtime_payload.items():
+        if value > target.get(key, float('-inf')):
+            target[key] = value
+    return target
+
+
+def send_realtime_payload(realtime_payload, data_type="realtime_3param"):
+    """Kirim payload real-time ke ThingsBoard (jika ada guncangan/getaran jalan)"""
+    if not realtime_payload:
+        return False
+    
+    realtime_payload.update({
+        "timestamp": datetime.now().isoformat(),
+        # "fls_data_type": "realtime_3param",
+        # "fls_shock_filter_enabled": True,
+        # "fls_vibration_filter_enabled": True,
+        # "fls_post_warming_up": True
+    })
+    return send_to_thingsboard(realtime_payload, data_type)
+
+
+def trigger_analysis_if_due(session, current_time=None):
+    """Jadwalkan analisis jendela device (scheduler analisis) jika hop device sudah lewat"""
+    current_time = current_time if current_time is not None else time.time()
+    data_buffer = session.data_buffer
+    
+    if (current_time - session.last_analysis_time) < ANALYSIS_HOP:
+        return False
+    
+    if data_buffer.get_data_count() < MIN_DATA_POINTS:
+        print(f"⚠️ Skip analisis: data belum cukup ({data_buffer.get_data_count()}/{MIN_DATA_POINTS})")
+        return False
+    
+    # Backend shared: hanya satu worker yang menganalisis device (lease)
+    if not session.acquire_analysis(current_time):
+        return False
+    
+    # Jadwal hop berikutnya dihitung dari trigger ini, sehingga burst request tidak menjadwalkan ulang
+    session.last_analysis_time = current_time
+    return analysis_scheduler.schedule(session)
+
+
+def hold_bulk_chunk(session, batch_id, readings, received_at):
+    """Tahan potongan bulk per request (batch_id) sampai potongan terakhir request yang sama datang"""
+    pending = session.bulk_pending.setdefault(batch_id, [received_at, []])
+    pending[0] = received_at
+    pending[1].extend(readings)
+
+
+def take_stale_bulk(session, current_time):
+    """
+    Ambil potongan bulk yang potongan terakhirnya tidak pernah datang (ditolak 503 atau koneksi putus)
+    lebih dari BULK_PENDING_TIMEOUT. Data ini sudah tercatat di filter duplikat, jadi tidak boleh dibuang.
+    Return list (waktu terima terakhir, data).
+    """
+    stale = [batch_id for batch_id, (last_received_at, _) in session.bulk_pending.items()
+             if current_time - last_received_at > BULK_PENDING_TIMEOUT]
+    return [tuple(session.bulk_pending.pop(batch_id)) for batch_id in stale]
+
+
+def analyze_offline_replay(session, readings):
+    """
+    Analisis data offline per jendela ANALYSIS_INTERVAL (tiap ANALYSIS_HOP) berdasarkan waktu device,
+    sehingga data yang dikumpulkan selama beberapa menit tidak dianalisis sebagai satu burst.
+    """
+    readings.sort(key=attrgetter('timestamp'))
+    
+    span = (readings[-1].timestamp - readings[0].timestamp).total_seconds()
+    print(f"📼 [{session.device_id}] Offline replay: {len(readings)} data, {span:.0f}s waktu device "
+          f"(jendela {ANALYSIS_INTERVAL}s tiap {ANALYSIS_HOP}s)")
+    
+    # Satu job untuk seluruh replay: jendela overlap memakai ringkasan pane bersama
+    if len(readings) >= MIN_DATA_POINTS:
+        analysis_scheduler.schedule(session, readings)
+
+
+# Mode pemrosesan item antrian
+MODE_REALTIME = 'realtime'  # Satu data dari /multisensor
+MODE_BULK = 'bulk'          # Batch dari /multisensor/bulk (potongan terakhir request)
+MODE_BULK_CHUNK = 'bulk_chunk'  # Potongan /multisensor/bulk sebelum potongan terakhir (ditahan)
+MODE_OFFLINE = 'offline'    # Potongan terakhir replay /offline-data (trigger analisis)
+MODE_OFFLINE_CHUNK = 'offline_chunk'  # Potongan replay /offline-data (tanpa analisis)
+LIVE_MODES = (MODE_REALTIME, MODE_BULK_CHUNK, MODE_BULK)  # Data baru dikirim device (dipakai sinkronisasi jam)
+
+
+class IngestQueue:
+    """
+    Antrian ingest terbatas yang diproses worker thread.
+    Antrian dibagi per worker berdasarkan device_id supaya urutan data satu device tetap terjaga.
+    """
+    def __init__(self, max_size=2000, workers=4):
+        self.worker_count = max(1, workers)
+        self.shard_size = max(1, max_size // self.worker_count)
+        self.queues = [queue.Queue(maxsize=self.shard_size) for _ in range(self.worker_count)]
+        self.workers = []
+        self.lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'rejected': 0,
+            'processed_items': 0,
+            'processed_readings': 0,
+            'duplicates_dropped': 0,
+            'closed_skipped': 0,
+            'errors': 0,
+            'max_wait_ms': 0.0,
+            'total_wait_ms': 0.0
+        }
+    
+    def start(self):
+        with self.lock:
+            if self.workers:
+                return
+            for index, shard in enumerate(self.queues):
+                worker = threading.Thread(target=self._worker, args=(shard,), name=f"ingest-worker-{index}")
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+            print(f"🧵 Ingest queue started: {self.worker_count} workers, {self.shard_size} slot/worker")
+    
+    def submit(self, session, readings, mode=MODE_REALTIME, batch_id=None):
+        """
+        Masukkan data ke antrian. Return False jika antrian penuh (backpressure).
+        batch_id menandai potongan-potongan satu request bulk (MODE_BULK_CHUNK sampai MODE_BULK).
+        """
+        if not self.workers:
+            self.start()
+        
+        shard = self.queues[zlib.crc32(session.device_id.encode('utf-8')) % self.worker_count]
+        try:
+            shard.put_nowait((session, readings, mode, batch_id, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.stats['rejected'] += 1
+            return False
+        
+        with self.lock:
+            self.stats['enqueued'] += 1
+        return True
+    
+    def depth(self):
+        return sum(shard.qsize() for shard in self.queues)
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        processed = stats['processed_items']
+        stats['avg_wait_ms'] = stats.pop('total_wait_ms') / processed if processed else 0.0
+        stats['depth'] = self.depth()
+        stats['capacity'] = self.shard_size * self.worker_count
+        stats['workers'] = self.worker_count
+        return stats
+    
+    def _worker(self, shard):
+        while True:
+            session, readings, mode, batch_id, enqueued_at = shard.get()
+            wait_ms = (time.monotonic() - enqueued_at) * 1000
+            try:
+                # Session dihapus dari registry (LRU) selama item antri: buffer-nya sudah dilepas
+                if not session.begin_use():
+                    with self.lock:
+                        self.stats['closed_skipped'] += 1
+                    print(f"💤 [{session.device_id}] Session sudah dihapus - {len(readings)} data dilewati")
+                    continue
+                try:
+                    self._process(session, readings, mode, time.time() - wait_ms / 1000, batch_id)
+                finally:
+                    session.end_use()
+            except Exception as e:
+                with self.lock:
+                    self.stats['errors'] += 1
+                print(f"❌ Ingest worker error [{session.device_id}]: {e}")
+            finally:
+                shard.task_done()
+                with self.lock:
+                    self.stats['processed_items'] += 1
+                    self.stats['processed_readings'] += len(readings)
+                    self.stats['total_wait_ms'] += wait_ms
+                    self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], wait_ms)
+    
+    def _process(self, session, readings, mode, received_at=None, batch_id=None):
+        received_at = received_at if received_at is not None else time.time()
+        
+        # Device reboot (seq & millis mulai dari awal): reset filter duplikat sebelum dipakai
+        if mode in LIVE_MODES and session.replay_filter.observe_clock(readings, received_at):
+            print(f"🔄 [{session.device_id}] Device reboot terdeteksi (millis mundur) - filter duplikat di-reset")
+        
+        # Buang data yang sudah pernah diterima (replay offline batch setelah timeout)
+        accepted = [data for data in readings if session.replay_filter.accept(data)]
+        if len(accepted) != len(readings):
+            dropped = len(readings) - len(accepted)
+            with self.lock:
+                self.stats['duplicates_dropped'] += dropped
+            print(f"♻️ [{session.device_id}] {dropped} duplicate data point(s) dropped")
+        
+        # Append WAL sampai data masuk buffer tidak boleh diselingi checkpoint session (apply_lock)
+        with ingest_wal.apply_lock if ingest_wal is not None else nullcontext():
+            readings, realtime_payload = self._apply(session, accepted, mode, received_at, batch_id)
+        
+        if mode == MODE_REALTIME:
+            if not readings:
+                return
+            send_realtime_payload(realtime_payload, "realtime_3param")
+            trigger_analysis_if_due(session)
+            return
+        
+        if mode == MODE_BULK_CHUNK:
+            return
+        
+        if mode == MODE_BULK:
+            # Satu payload real-time (nilai puncak) untuk seluruh batch
+            send_realtime_payload(realtime_payload, "realtime_3param")
+            trigger_analysis_if_due(session)
+            return
+        
+        # Data offline: dianalisis sekali di potongan terakhir, hanya data baru (bukan replay)
+        session.offline_replay.extend(readings)
+        if mode == MODE_OFFLINE and session.offline_replay:
+            replay, session.offline_replay = session.offline_replay, []
+            analyze_offline_replay(session, replay)
+    
+    def _apply(self, session, readings, mode, received_at, batch_id):
+        """Catat data ke WAL lalu masukkan ke buffer. Return (list Reading, payload real-time)"""
+        # Catat ke WAL sebelum diproses supaya bisa dipulihkan setelah restart
+        if ingest_wal is not None and readings:
+            ingest_wal.append({
+                "device_id": session.device_id,
+                "received_at": received_at,
+                "mode": mode,
+                "batch_id": batch_id,
+                "readings": readings
+            })
+        
+        # Validasi & konversi sekali ke Reading; tahap berikutnya memakai field bertipe
+        readings = [Reading.from_dict(data, session.device_id) for data in readings]
+        
+        if mode == MODE_REALTIME:
+            return readings, process_sensor_reading(session, readings[0]) if readings else {}
+        
+        # Potongan bulk ditahan sampai potongan terakhir request yang sama: jam device disinkronkan sekali
+        # dari data terbaru seluruh request (sinkronisasi per potongan memampatkan waktu data)
+        if mode in (MODE_BULK_CHUNK, MODE_BULK):
+            for last_received_at, stale in take_stale_bulk(session, received_at):
+                print(f"⌛ [{session.device_id}] {len(stale)} data bulk tanpa potongan terakhir diproses sendiri")
+                process_sensor_batch(session, stale, live=True, current_time=last_received_at)
+        if mode == MODE_BULK_CHUNK:
+            hold_bulk_chunk(session, batch_id, readings, received_at)
+            return readings, {}
+        if mode == MODE_BULK:
+            readings = session.bulk_pending.pop(batch_id, [received_at, []])[1] + readings
+        
+        return readings, process_sensor_batch(session, readings, live=(mode == MODE_BULK))
+
+
+def replay_write_ahead_log(wal=None, restored=None, current_time=None, max_age=None):
+    """
+    Pulihkan buffer, filter duplikat, dan replay offline yang belum selesai dari WAL saat startup.
+    Data ditempatkan di waktu server saat diterima; tidak dikirim ulang ke ThingsBoard/database.
+    restored: device_id -> waktu checkpoint session. Record WAL di segmen sebelum penanda checkpoint itu
+    sudah ada di buffer hasil checkpoint (posisi di WAL, bukan waktu terima: data yang diterima sebelum
+    checkpoint bisa baru diproses setelahnya), jadi hanya filter duplikat dan replay offline yang
+    dipulihkan dari record itu.
+    Tanpa checkpoint, analisis device berjalan lagi di data berikutnya (last_analysis_time tidak ada di WAL).
+    Record yang lebih lama dari max_age diabaikan (sama seperti checkpoint): device yang lama tidak
+    mengirim data harus melewati warming up lagi.
+    """
+    wal = wal if wal is not None else ingest_wal
+    if wal is None:
+        return 0
+    restored = restored or {}
+    current_time = current_time if current_time is not None else time.time()
+    max_age = max_age if max_age is not None else WAL_CONFIG['replay_max_age']
+    
+    started_at = time.monotonic()
+    record_count = 0
+    reading_count = 0
+    expired_count = 0
+    markers = wal.checkpoint_markers()
+    for index, record in wal.replay(with_index=True):
+        raw_readings = record.get('readings') or []
+        received_at = record.get('received_at') or current_time
+        if current_time - received_at > max_age:
+            expired_count += 1
+            continue
+        
+        mode = record.get('mode', MODE_REALTIME)
+        session = device_registry.get_session(str(record.get('device_id')))
+        session.touch(received_at)
+        # Tanpa penanda (checkpoint device ditulis worker lain) tidak ada record yang tercakup snapshot
+        in_checkpoint = index < markers.get(restored.get(session.device_id), 0)
+        
+        # Data di WAL hanya dicatat setelah warming up selesai
+        if not in_checkpoint:
+            warmed_up_since = received_at - INITIAL_SKIP_PERIOD
+            if session.first_data_received_time is None or warmed_up_since < session.first_data_received_time:
+                session.first_data_received_time = warmed_up_since
+            session.warming_up_cleared = True
+        
+        if mode in LIVE_MODES:
+            session.replay_filter.observe_clock(raw_readings, received_at)
+        for data in raw_readings:
+            session.replay_filter.accept(data)
+        readings = [Reading.from_dict(data, session.device_id) for data in raw_readings]
+        
+        if mode == MODE_REALTIME:
+            if not in_checkpoint:
+                for data in readings:
+                    session.data_buffer.add_data(data, live=True, current_time=received_at)
+        elif mode == MODE_BULK_CHUNK:
+            hold_bulk_chunk(session, record.get('batch_id'), readings, received_at)
+        else:
+            if mode == MODE_BULK:
+                readings = session.bulk_pending.pop(record.get('batch_id'), [received_at, []])[1] + readings
+            if not in_checkpoint:
+                session.data_buffer.add_batch(readings, live=(mode == MODE_BULK), current_time=received_at)
+            if mode == MODE_OFFLINE_CHUNK:
+                session.offline_replay.extend(readings)
+            elif mode == MODE_OFFLINE:
+                session.offline_replay = []
+        
+        record_count += 1
+        reading_count += len(readings)
+    
+    if record_count or expired_count:
+        print(f"📝 WAL replay: {record_count} record, {reading_count} data, "
+              f"{len(device_registry)} device, {expired_count} record kedaluwarsa diabaikan "
+              f"({(time.monotonic() - started_at) * 1000:.0f}ms)")
+    return reading_count
+
+# Antrian global untuk semua endpoint ingest
+ingest_queue = IngestQueue(INGEST_QUEUE_CONFIG['max_size'], INGEST_QUEUE_CONFIG['workers'])
@@ -0,0 +1,236 @@
+import math
+from datetime import datetime
+
+import numpy as np
+
+NAN = float('nan')
+SENSOR_COUNT = 8
+
+# Key payload firmware -> atribut Reading untuk nilai float (hilang/invalid disimpan NaN)
+FLOAT_FIELDS = (
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude'),
+    ('speed', 'speed'),
+    # Raw accelerometer & gyroscope
+    ('accelX', 'accel_x'), ('accelY', 'accel_y'), ('accelZ', 'accel_z'),
+    ('gyroX', 'gyro_x'), ('gyroY', 'gyro_y'), ('gyroZ', 'gyro_z'),
+    # Accelerometer (m/s²) dan gyroscope (deg/s) terkonversi
+    ('accelX_ms2', 'accel_x_ms2'), ('accelY_ms2', 'accel_y_ms2'), ('accelZ_ms2', 'accel_z_ms2'),
+    ('accel_magnitude_ms2', 'accel_magnitude_ms2'),
+    ('gyroX_dps', 'gyro_x_dps'), ('gyroY_dps', 'gyro_y_dps'), ('gyroZ_dps', 'gyro_z_dps'),
+    ('rotation_magnitude_dps', 'rotation_magnitude_dps'),
+    # Shock & vibration magnitude dari ESP32
+    ('shock_magnitude', 'shock_magnitude'),
+    ('vibration_magnitude', 'vibration_magnitude'),
+)
+SENSOR_KEYS = tuple(f'sensor{i}' for i in range(1, SENSOR_COUNT + 1))
+
+# Layout record fixed-size per data sensor (little-endian): shared memory antar worker dan checkpoint session
+INT_NONE = -1  # device_timestamp / seq / satellites yang tidak ada
+RECORD_DTYPE = np.dtype([
+    ('time', '<f8'),                # Epoch detik (waktu data setelah sinkronisasi jam)
+    ('device_timestamp', '<i8'),
+    ('seq', '<i8'),
+    ('satellites', '<i8'),
+    ('sensors', '<f8', (SENSOR_COUNT,)),
+] + [(attribute, '<f8') for _, attribute in FLOAT_FIELDS])
+
+
+def _to_float(value):
+    if isinstance(value, float):
+        return value
+    if isinstance(value, int) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return NAN
+    return NAN
+
+
+def _to_distance(value):
+    # Jarak ultrasonic (cm); -1 dari firmware = sensor error
+    value = _to_float(value)
+    return NAN if value < 0 else value
+
+
+def _to_int(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return None
+
+
+def nullable(value):
+    """NaN -> None (untuk database / JSON)"""
+    return None if value != value else value
+
+
+class Reading:
+    """
+    Satu data sensor yang sudah divalidasi, dibuat sekali saat ingest (Reading.from_dict).
+    Nilai sensor yang tidak ada / error disimpan sebagai NaN, sehingga perbandingan threshold
+    (NaN >= x selalu False) otomatis mengabaikannya tanpa cek None / -1 berulang.
+    """
+    __slots__ = (
+        'device_id', 'timestamp', 'device_timestamp', 'seq', 'satellites', 'sensors'
+    ) + tuple(attribute for _, attribute in FLOAT_FIELDS)
+    
+    @classmethod
+    def from_dict(cls, data, device_id=None):
+        reading = cls.__new__(cls)
+        reading.device_id = device_id if device_id is not None else data.get('device_id')
+        
+        # timestamp numerik = millis device; datetime = waktu yang sudah ditentukan (replay)
+        timestamp = data.get('timestamp')
+        if isinstance(timestamp, datetime):
+            reading.timestamp = timestamp
+            reading.device_timestamp = _to_int(data.get('device_timestamp'))
+        else:
+            reading.timestamp = None
+            reading.device_timestamp = _to_int(timestamp)
+        
+        reading.seq = _to_int(data.get('seq'))
+        reading.satellites = _to_int(data.get('satellites'))
+        reading.sensors = tuple(_to_distance(data.get(key)) for key in SENSOR_KEYS)
+        for key, attribute in FLOAT_FIELDS:
+            setattr(reading, attribute, _to_float(data.get(key)))
+        return reading
+    
+    @property
+    def has_gps(self):
+        return not (math.isnan(self.latitude) or math.isnan(self.longitude))
+    
+    @property
+    def location(self):
+        return (self.latitude, self.longitude) if self.has_gps else None
+    
+    @property
+    def active_sensor_count(self):
+        return sum(1 for value in self.sensors if value == value)
+    
+    @property
+    def has_motion(self):
+        return not (math.isnan(self.accel_x) and math.isnan(self.accel_y) and math.isnan(self.accel_z))
+    
+    def to_dict(self):
+        """Dict dengan key payload firmware (NaN -> None), untuk arsip / export"""
+        data = {
+            'device_id': self.device_id,
+            'timestamp': self.timestamp,
+            'device_timestamp': self.device_timestamp,
+            'seq': self.seq,
+            'satellites': self.satellites
+        }
+        data.update(zip(SENSOR_KEYS, map(nullable, self.sensors)))
+        for key, attribute in FLOAT_FIELDS:
+            data[key] = nullable(getattr(self, attribute))
+        return data
+    
+    def __repr__(self):
+        return f"Reading(device_id={self.device_id!r}, timestamp={self.timestamp}, seq={self.seq})"
+
+
+class ReadingColumns:
+    """
+    Jendela data dalam bentuk kolom NumPy (satu array per field, urut waktu) untuk analisis vektor.
+    Dari ColumnarDataBuffer.get_columns() array ini adalah view tanpa copy; jangan diubah.
+    """
+    __slots__ = (
+        'times', 'sensors', 'shock_magnitude', 'vibration_magnitude',
+        'latitude', 'longitude', 'speed', 'readings'
+    )
+    
+    def __init__(self, times, sensors, shock_magnitude, vibration_magnitude, latitude, longitude, speed, readings):
+        self.times = times                          # Epoch detik
+        self.sensors = sensors                      # (N x 8) jarak ultrasonic cm, NaN = tidak ada/error
+        self.shock_magnitude = shock_magnitude
+        self.vibration_magnitude = vibration_magnitude
+        self.latitude = latitude
+        self.longitude = longitude
+        self.speed = speed
+        self.readings = readings                    # Objek Reading asli (array object)
+    
+    @classmethod
+    def from_readings(cls, readings):
+        """Bangun kolom (copy) dari list Reading, misalnya jendela replay offline"""
+        count = len(readings)
+        
+        def column(attribute):
+            return np.fromiter((getattr(reading, attribute) for reading in readings), dtype=np.float64, count=count)
+        
+        times = np.fromiter(
+            (reading.timestamp.timestamp() if reading.timestamp is not None else NAN for reading in readings),
+            dtype=np.float64, count=count
+        )
+        sensors = np.array([reading.sensors for reading in readings], dtype=np.float64).reshape(count, SENSOR_COUNT)
+        objects = np.empty(count, dtype=object)
+        objects[:] = readings
+        return cls(
+            times, sensors, column('shock_magnitude'), column('vibration_magnitude'),
+            column('latitude'), column('longitude'), column('speed'), objects
+        )
+    
+    def slice(self, start, stop):
+        """Sub-jendela baris [start:stop] (view, tanpa copy)"""
+        return ReadingColumns(*(getattr(self, name)[start:stop] for name in self.__slots__))
+    
+    def gps_points(self):
+        """Daftar (latitude, longitude) data yang punya GPS, urut waktu"""
+        mask = ~(np.isnan(self.latitude) | np.isnan(self.longitude))
+        return list(zip(self.latitude[mask].tolist(), self.longitude[mask].tolist()))
+    
+    def __len__(self):
+        return len(self.times)
+
+
+def readings_to_records(stamped):
+    """List (waktu, Reading) terurut -> array RECORD_DTYPE"""
+    records = np.empty(len(stamped), dtype=RECORD_DTYPE)
+    if not stamped:
+        return records  # Buffer kosong (misalnya device masih warming up)
+    readings = [reading for _, reading in stamped]
+    records['time'] = [point_time for point_time, _ in stamped]
+    records['device_timestamp'] = [r.device_timestamp if r.device_timestamp is not None else INT_NONE for r in readings]
+    records['seq'] = [r.seq if r.seq is not None else INT_NONE for r in readings]
+    records['satellites'] = [r.satellites if r.satellites is not None else INT_NONE for r in readings]
+    records['sensors'] = [r.sensors for r in readings]
+    for _, attribute in FLOAT_FIELDS:
+        records[attribute] = [getattr(r, attribute) for r in readings]
+    return records
+
+
+def records_to_readings(records, device_id):
+    """Array RECORD_DTYPE -> list Reading (timestamp datetime dari kolom time)"""
+    columns = {name: records[name].tolist() for name in RECORD_DTYPE.names}
+    float_columns = [(attribute, columns[attribute]) for _, attribute in FLOAT_FIELDS]
+    readings = []
+    for i, point_time in enumerate(columns['time']):
+        reading = Reading.__new__(Reading)
+        reading.device_id = device_id
+        reading.timestamp = datetime.fromtimestamp(point_time)
+        device_timestamp = columns['device_timestamp'][i]
+        reading.device_timestamp = device_timestamp if device_timestamp != INT_NONE else None
+        seq = columns['seq'][i]
+        reading.seq = seq if seq != INT_NONE else None
+        satellites = columns['satellites'][i]
+        reading.satellites = satellites if satellites != INT_NONE else None
+        reading.sensors = tuple(columns['sensors'][i])
+        for attribute, values in float_columns:
+            setattr(reading, attribute, values[i])
+        readings.append(reading)
+    return readings
+
+
+def records_to_columns(records, device_id):
+    """Array RECORD_DTYPE -> ReadingColumns (kolom contiguous hasil copy)"""
+    readings = np.empty(len(records), dtype=object)
+    readings[:] = records_to_readings(records, device_id)
+    return ReadingColumns(
+        np.ascontiguousarray(records['time']), np.ascontiguousarray(records['sensors']),
+        np.ascontiguousarray(records['shock_magnitude']), np.ascontiguousarray(records['vibration_magnitude']),
+        np.ascontiguousarray(records['latitude']), np.ascontiguousarray(records['longitude']),
+        np.ascontiguousarray(records['speed']), readings
+    )
@@ -6,107 +6,206 @@ import os
 import io
 import json
 import threading
+import queue
+import time
 import requests
 from PIL import Image
-from core.database import get_db_connection
+from core.database import get_db_connection, get_pooled_connection
+from analysis.reading import nullable
 from core.config import (
-    DB_CONFIG, THINGSBOARD_URL, THINGSBOARD_IMAGE_CONFIG, UPLOAD_FOLDER, THINGSBOARD_CONFIG
+    DB_CONFIG, THINGSBOARD_URL, THINGSBOARD_IMAGE_CONFIG, UPLOAD_FOLDER, THINGSBOARD_CONFIG,
+    SENSOR_WRITER_CONFIG
 )
 from core.thingsboard import send_analysis_with_optimized_image_to_thingsboard
 
 
-# def save_sensor_data(data):
-#     """Menyimpan data sensor mentah ke database"""
-#     connection = get_db_connection()
-#     if not connection:
-#         return False
+SENSOR_DATA_INSERT_QUERY = """
+INSERT INTO sensor_data (
+    timestamp, 
+    sensor1_distance, sensor2_distance, sensor3_distance, sensor4_distance,
+    sensor5_distance, sensor6_distance, sensor7_distance, sensor8_distance,
+    accel_x, accel_y, accel_z, accel_magnitude,
+    accel_x_ms2, accel_y_ms2, accel_z_ms2, accel_magnitude_ms2,
+    gyro_x, gyro_y, gyro_z, rotation_magnitude,
+    gyro_x_dps, gyro_y_dps, gyro_z_dps, rotation_magnitude_dps,
+    shock_magnitude, vibration_magnitude,
+    latitude, longitude, speed, satellites
+) VALUES (
+    %s, %s, %s, %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s, %s, %s, %s,
+    %s, %s, %s, %s, %s, %s
+)
+"""
+
+def build_sensor_data_row(reading):
+    """Ubah Reading menjadi satu baris parameter INSERT sensor_data (NaN disimpan sebagai NULL)"""
+    # Calculate magnitudes dari raw data jika belum ada
+    accel_magnitude = math.sqrt(reading.accel_x**2 + reading.accel_y**2 + reading.accel_z**2)
+    rotation_magnitude = math.sqrt(
+        (reading.gyro_x/131.0)**2 + (reading.gyro_y/131.0)**2 + (reading.gyro_z/131.0)**2
+    )
     
-#     try:
-#         cursor = connection.cursor()
-        
-#         insert_query = """
-#         INSERT INTO sensor_data (
-#             timestamp, 
-#             sensor1_distance, sensor2_distance, sensor3_distance, sensor4_distance,
-#             sensor5_distance, sensor6_distance, sensor7_distance, sensor8_distance,
-#             accel_x, accel_y, accel_z, accel_magnitude,
-#             accel_x_ms2, accel_y_ms2, accel_z_ms2, accel_magnitude_ms2,
-#             gyro_x, gyro_y, gyro_z, rotation_magnitude,
-#             gyro_x_dps, gyro_y_dps, gyro_z_dps, rotation_magnitude_dps,
-#             shock_magnitude, vibration_magnitude,
-#             latitude, longitude, speed, satellites
-#         ) VALUES (
-#             %s, %s, %s, %s, %s, %s, %s, %s, %s,
-#             %s, %s, %s, %s, %s, %s, %s, %s,
-#             %s, %s, %s, %s, %s, %s, %s, %s,
-#             %s, %s, %s, %s, %s, %s
-#         )
-#         """
-        
-#         # Calculate magnitudes dari raw data jika belum ada
-#         accel_magnitude = None
-#         if all(data.get(key) is not None for key in ['accelX', 'accelY', 'accelZ']):
-#             accel_magnitude = math.sqrt(data['accelX']**2 + data['accelY']**2 + data['accelZ']**2)
-        
-#         rotation_magnitude = None
-#         if all(data.get(key) is not None for key in ['gyroX', 'gyroY', 'gyroZ']):
-#             rotation_magnitude = math.sqrt(
-#                 (data['gyroX']/131.0)**2 + (data['gyroY']/131.0)**2 + (data['gyroZ']/131.0)**2
-#             )
-        
-#         # Calculate converted magnitudes
-#         accel_magnitude_ms2 = None
-#         if all(data.get(key) is not None for key in ['accelX_ms2', 'accelY_ms2', 'accelZ_ms2']):
-#             accel_magnitude_ms2 = math.sqrt(
-#                 data['accelX_ms2']**2 + data['accelY_ms2']**2 + data['accelZ_ms2']**2
-#             )
-#         elif data.get('accel_magnitude_ms2') is not None:
-#             accel_magnitude_ms2 = data['accel_magnitude_ms2']
-        
-#         rotation_magnitude_dps = None
-#         if all(data.get(key) is not None for key in ['gyroX_dps', 'gyroY_dps', 'gyroZ_dps']):
-#             rotation_magnitude_dps = math.sqrt(
-#                 data['gyroX_dps']**2 + data['gyroY_dps']**2 + data['gyroZ_dps']**2
-#             )
-#         elif data.get('rotation_magnitude_dps') is not None:
-#             rotation_magnitude_dps = data['rotation_magnitude_dps']
+    # Calculate converted magnitudes (NaN jika salah satu komponen tidak ada)
+    accel_magnitude_ms2 = math.sqrt(reading.accel_x_ms2**2 + reading.accel_y_ms2**2 + reading.accel_z_ms2**2)
+    if math.isnan(accel_magnitude_ms2):
+        accel_magnitude_ms2 = reading.accel_magnitude_ms2
+    
+    rotation_magnitude_dps = math.sqrt(reading.gyro_x_dps**2 + reading.gyro_y_dps**2 + reading.gyro_z_dps**2)
+    if math.isnan(rotation_magnitude_dps):
+        rotation_magnitude_dps = reading.rotation_magnitude_dps
+    
+    # Waktu data di buffer (jam device yang disinkronkan), fallback waktu server
+    timestamp = reading.timestamp if reading.timestamp is not None else datetime.now()
+    
+    return (timestamp,) + tuple(map(nullable, (
+        # Ultrasonic data
+        *reading.sensors,
+        # Raw accelerometer data
+        reading.accel_x, reading.accel_y, reading.accel_z, accel_magnitude,
+        # Converted accelerometer data (m/s²)
+        reading.accel_x_ms2, reading.accel_y_ms2, reading.accel_z_ms2, accel_magnitude_ms2,
+        # Raw gyroscope data  
+        reading.gyro_x, reading.gyro_y, reading.gyro_z, rotation_magnitude,
+        # Converted gyroscope data (deg/s)
+        reading.gyro_x_dps, reading.gyro_y_dps, reading.gyro_z_dps, rotation_magnitude_dps,
+        # Shock & Vibration magnitude dari ESP32
+        reading.shock_magnitude,      # m/s² (dari accelerometer)
+        reading.vibration_magnitude,  # deg/s (dari gyroscope)
+        # GPS data
+        reading.latitude, reading.longitude, reading.speed
+    ))) + (reading.satellites,)
+
+
+class SensorDataWriter:
+    """
+    Writer latar belakang untuk tabel sensor_data (group commit).
+    Data dikumpulkan di antrian lalu ditulis dengan satu executemany (multi-row INSERT)
+    setiap batch_size data atau setiap flush_interval_ms, lewat koneksi dari pool.
+    """
+    def __init__(self, max_queue_size=20000, batch_size=500, flush_interval_ms=1000):
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stats = {
+            'enqueued': 0,
+            'dropped': 0,          # Antrian penuh
+            'written_rows': 0,
+            'failed_rows': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'total_flush_ms': 0.0,
+            'last_batch_size': 0
+        }
+    
+    def start(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+            self.thread = threading.Thread(target=self._run, name="sensor-data-writer")
+            self.thread.daemon = True
+            self.thread.start()
+        print(f"🧵 Sensor data writer started: batch {self.batch_size} data / {self.flush_interval * 1000:.0f}ms")
+    
+    def submit(self, reading):
+        """Masukkan satu Reading ke antrian tulis. Return False jika antrian penuh (data tidak disimpan)"""
+        if self.thread is None:
+            self.start()
         
-#         insert_data = (
-#             datetime.now(),
-#             # Ultrasonic data
-#             data.get('sensor1'), data.get('sensor2'), data.get('sensor3'), data.get('sensor4'),
-#             data.get('sensor5'), data.get('sensor6'), data.get('sensor7'), data.get('sensor8'),
-#             # Raw accelerometer data
-#             data.get('accelX'), data.get('accelY'), data.get('accelZ'), accel_magnitude,
-#             # Converted accelerometer data (m/s²)
-#             data.get('accelX_ms2'), data.get('accelY_ms2'), data.get('accelZ_ms2'), accel_magnitude_ms2,
-#             # Raw gyroscope data  
-#             data.get('gyroX'), data.get('gyroY'), data.get('gyroZ'), rotation_magnitude,
-#             # Converted gyroscope data (deg/s)
-#             data.get('gyroX_dps'), data.get('gyroY_dps'), data.get('gyroZ_dps'), rotation_magnitude_dps,
-#             # Shock & Vibration magnitude dari ESP32
-#             data.get('shock_magnitude'),      # m/s² (dari accelerometer)
-#             data.get('vibration_magnitude'),  # deg/s (dari gyroscope)
-#             # GPS data
-#             data.get('latitude'), data.get('longitude'), data.get('speed'), data.get('satellites')
-#         )
+        try:
+            self.queue.put_nowait(build_sensor_data_row(reading))
+        except queue.Full:
+            with self.lock:
+                self.stats['dropped'] += 1
+            return False
         
-#         cursor.execute(insert_query, insert_data)
-#         connection.commit()
+        with self.lock:
+            self.stats['enqueued'] += 1
+        return True
+    
+    def depth(self):
+        return self.queue.qsize()
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        flushes = stats['flushes']
+        stats['avg_flush_ms'] = stats.pop('total_flush_ms') / flushes if flushes else 0.0
+        stats['queue_depth'] = self.depth()
+        stats['capacity'] = self.queue.maxsize
+        stats['batch_size'] = self.batch_size
+        stats['flush_interval_ms'] = self.flush_interval * 1000
+        return stats
+    
+    def _run(self):
+        while True:
+            # Tunggu data pertama, lalu kumpulkan sampai batch penuh atau interval habis
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+    
+    def _flush(self, rows):
+        started_at = time.monotonic()
+        connection = get_pooled_connection()
+        if not connection:
+            with self.lock:
+                self.stats['failed_flushes'] += 1
+                self.stats['failed_rows'] += len(rows)
+            return False
         
-#         shock_val = data.get('shock_magnitude', 0)
-#         vibration_val = data.get('vibration_magnitude', 0)
-#         print(f"✅ Raw sensor data saved to MySQL (ID: {cursor.lastrowid})")
-#         print(f"📊 Shock: {shock_val:.2f} m/s², Vibration: {vibration_val:.2f} deg/s")
-#         return True
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            cursor.executemany(SENSOR_DATA_INSERT_QUERY, rows)
+            connection.commit()
+            success = True
+        except Error as e:
+            print(f"❌ Error saving sensor data batch ({len(rows)} rows): {e}")
+            success = False
+        finally:
+            if cursor is not None:
+                cursor.close()
+            connection.close()  # Kembali ke pool
         
-#     except Error as e:
-#         print(f"❌ Error saving sensor data: {e}")
-#         return False
-#     finally:
-#         if connection.is_connected():
-#             cursor.close()
-#             connection.close()
+        flush_ms = (time.monotonic() - started_at) * 1000
+        with self.lock:
+            if success:
+                self.stats['flushes'] += 1
+                self.stats['written_rows'] += len(rows)
+                self.stats['last_flush_ms'] = flush_ms
+                self.stats['max_flush_ms'] = max(self.stats['max_flush_ms'], flush_ms)
+                self.stats['total_flush_ms'] += flush_ms
+                self.stats['last_batch_size'] = len(rows)
+            else:
+                self.stats['failed_flushes'] += 1
+                self.stats['failed_rows'] += len(rows)
+        return success
+
+
+# Writer global sensor_data (None jika dimatikan lewat config)
+sensor_data_writer = SensorDataWriter(
+    SENSOR_WRITER_CONFIG['max_queue_size'],
+    SENSOR_WRITER_CONFIG['batch_size'],
+    SENSOR_WRITER_CONFIG['flush_interval_ms']
+) if SENSOR_WRITER_CONFIG['enabled'] else None
+
+def save_sensor_data(reading):
+    """Menyimpan data sensor mentah (Reading) ke database (lewat writer batch, tidak blocking)"""
+    if sensor_data_writer is None:
+        return False
+    return sensor_data_writer.submit(reading)
 
 def save_analysis_to_database(analysis_data, image_path=None, image_filename=None):
     """Menyimpan hasil analisis ke database"""
@@ -0,0 +1,167 @@
+import queue
+import threading
+import time
+from collections import deque
+
+from analysis.analyzer import perform_30s_analysis
+from core.config import ANALYSIS_SCHEDULER_CONFIG
+
+
+class DeviceAnalysisJobs:
+    """Antrian job analisis satu device (dijalankan berurutan, tidak pernah paralel)"""
+    __slots__ = ('session', 'jobs', 'live_queued', 'state')
+    
+    def __init__(self, session):
+        self.session = session
+        self.jobs = deque()  # (data_points, waktu masuk antrian); data_points None = analisis live buffer
+        self.live_queued = False  # Sudah ada job live yang belum mulai (trigger berikutnya digabung)
+        self.state = AnalysisScheduler.IDLE
+
+
+class AnalysisScheduler:
+    """
+    Scheduler analisis jendela untuk semua device: job disimpan per device dan device yang punya job
+    masuk antrian siap, lalu dijalankan pool worker berukuran tetap (bukan satu thread per trigger).
+    
+    - Satu device hanya dianalisis satu worker pada satu waktu, sehingga setiap jendela dievaluasi
+      tepat sekali (aggregator pane tidak pernah di-advance bersamaan).
+    - Trigger live yang datang saat job live device masih antri digabung (coalesce): job yang antri
+      akan membaca buffer terbaru saat mulai. Trigger saat analisis sedang berjalan membuat satu job
+      lanjutan untuk pane yang selesai selama analisis.
+    - Job replay offline (data_points) tidak digabung dan dijalankan berurutan per device.
+    """
+    IDLE = 'idle'
+    READY = 'ready'
+    RUNNING = 'running'
+    
+    def __init__(self, workers=2, max_pending=256):
+        self.worker_count = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.ready = queue.Queue()  # device_id yang punya job dan tidak sedang berjalan
+        self.devices = {}
+        self.pending = 0
+        self.running = 0
+        self.workers = []
+        self.lock = threading.Lock()
+        self.stats = {
+            'scheduled': 0,
+            'coalesced': 0,
+            'rejected': 0,
+            'closed_skipped': 0,
+            'executed': 0,
+            'errors': 0,
+            'max_queue_ms': 0.0,
+            'total_queue_ms': 0.0,
+            'max_run_ms': 0.0,
+            'total_run_ms': 0.0
+        }
+    
+    def start(self):
+        with self.lock:
+            if self.workers:
+                return
+            for index in range(self.worker_count):
+                worker = threading.Thread(target=self._worker, name=f"analysis-worker-{index}")
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+        print(f"🧵 Analysis scheduler started: {self.worker_count} workers, maks {self.max_pending} job antri")
+    
+    def schedule(self, session, data_points=None):
+        """
+        Jadwalkan analisis device. data_points None = jendela live dari buffer device (bisa digabung),
+        selain itu replay offline. Return True jika job baru masuk antrian.
+        """
+        if not self.workers:
+            self.start()
+        
+        live = data_points is None
+        with self.lock:
+            device = self.devices.get(session.device_id)
+            if device is None:
+                device = self.devices[session.device_id] = DeviceAnalysisJobs(session)
+            device.session = session
+            
+            if live and device.live_queued:
+                self.stats['coalesced'] += 1
+                return False
+            if self.pending >= self.max_pending:
+                self.stats['rejected'] += 1
+                print(f"⚠️ [{session.device_id}] Antrian analisis penuh ({self.max_pending} job) - analisis dilewati")
+                return False
+            
+            device.jobs.append((data_points, time.monotonic()))
+            device.live_queued = device.live_queued or live
+            self.pending += 1
+            self.stats['scheduled'] += 1
+            if device.state == self.IDLE:
+                device.state = self.READY
+                self.ready.put(session.device_id)
+        return True
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['pending'] = self.pending
+            stats['running'] = self.running
+            stats['devices_pending'] = sum(1 for device in self.devices.values() if device.jobs)
+        executed = stats['executed']
+        stats['avg_queue_ms'] = stats.pop('total_queue_ms') / executed if executed else 0.0
+        stats['avg_run_ms'] = stats.pop('total_run_ms') / executed if executed else 0.0
+        stats['workers'] = self.worker_count
+        stats['max_pending'] = self.max_pending
+        return stats
+    
+    def _worker(self):
+        while True:
+            device_id = self.ready.get()
+            with self.lock:
+                device = self.devices[device_id]
+                data_points, enqueued_at = device.jobs.popleft()
+                if data_points is None:
+                    device.live_queued = False
+                device.state = self.RUNNING
+                self.pending -= 1
+                self.running += 1
+                session = device.session
+            
+            started_at = time.monotonic()
+            queue_ms = (started_at - enqueued_at) * 1000
+            failed = False
+            # Device dihapus dari registry (idle/LRU) selama job antri: buffer-nya sudah dilepas
+            skipped = not session.begin_use()
+            if skipped:
+                print(f"💤 [{device_id}] Session sudah dihapus - job analisis dilewati")
+            else:
+                try:
+                    perform_30s_analysis(session, data_points)
+                except Exception as e:
+                    failed = True
+                    print(f"❌ Analysis worker error [{device_id}]: {e}")
+                finally:
+                    session.end_use()
+            run_ms = (time.monotonic() - started_at) * 1000
+            
+            with self.lock:
+                self.running -= 1
+                self.stats['closed_skipped'] += skipped
+                self.stats['executed'] += not skipped
+                self.stats['errors'] += failed
+                self.stats['total_queue_ms'] += queue_ms
+                self.stats['max_queue_ms'] = max(self.stats['max_queue_ms'], queue_ms)
+                self.stats['total_run_ms'] += run_ms
+                self.stats['max_run_ms'] = max(self.stats['max_run_ms'], run_ms)
+                
+                if device.jobs:
+                    device.state = self.READY
+                    self.ready.put(device_id)
+                else:
+                    # Tidak ada job lagi: hapus entry supaya device yang sudah di-evict tidak tertahan
+                    del self.devices[device_id]
+
+
+# Scheduler global untuk semua device
+analysis_scheduler = AnalysisScheduler(
+    ANALYSIS_SCHEDULER_CONFIG['workers'],
+    ANALYSIS_SCHEDULER_CONFIG['max_pending']
+)
@@ -0,0 +1,479 @@
+import fcntl
+import hashlib
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from analysis.buffer import BUFFER_BACKEND_SHARED, DataBuffer, DeviceSession
+from analysis.dedup import ReplayFilter
+from analysis.reading import (
+    NAN, RECORD_DTYPE, readings_to_records, records_to_readings, records_to_columns
+)
+from analysis.windowing import SlidingWindowAggregator
+from core.config import BUFFER_CONFIG, SHARED_BUFFER_CONFIG
+from core.wal import is_process_alive
+from thresholds import ANALYSIS_INTERVAL, ANALYSIS_HOP
+
+MAX_ATTACHED_WORKERS = 16  # Slot pid worker yang memetakan segment (lebih dari ini: segment tidak dihapus otomatis)
+
+# Header segment: seqlock version, jendela ring [start:end) (index logis), state device bersama
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u8'),
+    ('capacity', '<i8'),
+    ('version', '<u8'),             # Ganjil = writer (proses mana pun) sedang mengubah segment
+    ('start', '<i8'),
+    ('end', '<i8'),
+    ('overflow_count', '<i8'),      # Data dibuang karena ring penuh sebelum lewat max_duration
+    ('clock_offset', '<f8'),
+    ('first_data_received_time', '<f8'),
+    ('warming_up_cleared', '<i8'),
+    ('last_analysis_time', '<f8'),
+    ('owner_pid', '<i8'),           # Worker yang memegang lease analisis device
+    ('owner_expires', '<f8'),
+    ('attached_overflow', '<i8'),   # Pernah lebih dari MAX_ATTACHED_WORKERS worker (tabel pid tidak lengkap)
+    ('attached_pids', '<i8', (MAX_ATTACHED_WORKERS,)),  # Worker yang memetakan segment (0 = slot kosong)
+])
+HEADER_SIZE = 256
+SHM_DIRECTORY = '/dev/shm'  # Linux: segment shared_memory terlihat sebagai file di sini
+SHARED_MEMORY_TRACK_PARAMETER = sys.version_info >= (3, 13)
+SEGMENT_MAGIC = 0x524F41445345474D  # "ROADSEGM"
+
+assert HEADER_DTYPE.itemsize <= HEADER_SIZE
+
+
+def segment_name(prefix, device_id):
+    """Nama shared memory per device (device_id bebas karakter, jadi di-hash)"""
+    digest = hashlib.sha1(str(device_id).encode('utf-8')).hexdigest()[:20]
+    return f"{prefix}-{digest}"
+
+
+def _open_shared_memory(name, create, size=0):
+    # Segment dipakai bersama beberapa worker: jangan di-unlink resource_tracker saat proses ini keluar
+    if SHARED_MEMORY_TRACK_PARAMETER:
+        return shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    segment = shared_memory.SharedMemory(name=name, create=create, size=size)
+    resource_tracker.unregister(segment._name, 'shared_memory')
+    return segment
+
+
+def live_attached_pids(header):
+    """
+    Pid di tabel attach header yang prosesnya masih hidup (slot worker yang crash diabaikan).
+    Satu pid bisa muncul beberapa kali: satu entry per store yang dibuka proses itu.
+    """
+    return [pid for pid in header['attached_pids'].tolist() if pid and is_process_alive(pid)]
+
+
+def unlink_shared_memory(segment):
+    if not SHARED_MEMORY_TRACK_PARAMETER:
+        # SharedMemory.unlink() < 3.13 juga unregister dari resource_tracker
+        resource_tracker.register(segment._name, 'shared_memory')
+    segment.unlink()
+
+
+def sweep_stale_segments(prefix=None, lock_dir=None, current_time=None):
+    """
+    Hapus segment device di /dev/shm yang tidak dipetakan worker hidup mana pun: worker yang crash
+    (kill -9, OOM) tidak sempat close(), jadi segment-nya tertinggal. Dipanggil saat startup worker,
+    sebelum checkpoint dipulihkan. Segment yang lease analisisnya masih berlaku tidak disentuh.
+    Return jumlah segment yang dihapus.
+    """
+    prefix = prefix if prefix is not None else SHARED_BUFFER_CONFIG['prefix']
+    lock_dir = lock_dir if lock_dir is not None else SHARED_BUFFER_CONFIG['lock_dir']
+    current_time = current_time if current_time is not None else time.time()
+    if not os.path.isdir(SHM_DIRECTORY):
+        return 0
+    
+    removed = 0
+    for name in sorted(os.listdir(SHM_DIRECTORY)):
+        if not name.startswith(f"{prefix}-"):
+            continue
+        os.makedirs(lock_dir, exist_ok=True)
+        lock_fd = os.open(os.path.join(lock_dir, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Lock yang sama dengan attach/close: worker lain tidak bisa attach di tengah pengecekan
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                segment = _open_shared_memory(name, False)
+            except (FileNotFoundError, ValueError):
+                continue
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=segment.buf)
+            stale = (header['magic'] == SEGMENT_MAGIC and not header['attached_overflow']
+                     and not live_attached_pids(header) and header['owner_expires'] <= current_time)
+            del header
+            if stale:
+                unlink_shared_memory(segment)
+                removed += 1
+            segment.close()
+        finally:
+            os.close(lock_fd)  # Menutup fd juga melepas flock
+    
+    if removed:
+        print(f"🧹 Shared buffer: {removed} segment tanpa worker hidup dihapus")
+    return removed
+
+
+class SharedWindowStore:
+    """
+    Ring buffer record RECORD_DTYPE di multiprocessing.shared_memory untuk satu device,
+    dipakai bersama semua worker WSGI (segment dibuat worker pertama, worker lain attach).
+    
+    Writer: threading.Lock (antar thread) + fcntl.flock pada file lock per device (antar proses),
+    version di header ganjil selama perubahan. Reader: sequence lock tanpa lock writer,
+    fallback ke lock setelah beberapa kali bentrok.
+    
+    Pid worker yang memetakan segment dicatat di header: close() worker terakhir (pid lain di tabel
+    sudah tidak hidup) menghapus segment, di bawah lock yang sama dengan attach.
+    """
+    def __init__(self, name, capacity, lock_dir, snapshot_retries=3):
+        self.name = name
+        self.snapshot_retries = snapshot_retries
+        self.thread_lock = threading.Lock()
+        os.makedirs(lock_dir, exist_ok=True)
+        self.lock_fd = os.open(os.path.join(lock_dir, f"{name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        self.lock_contended = 0
+        self.lock_wait_seconds = 0.0
+        self.snapshot_conflicts = 0
+        self.snapshot_fallbacks = 0
+        
+        # Buat atau attach di bawah lock supaya worker lain tidak membaca header yang belum diinisialisasi
+        with self._exclusive():
+            try:
+                self.segment = _open_shared_memory(name, True, HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+                created = True
+            except FileExistsError:
+                self.segment = _open_shared_memory(name, False)
+                created = False
+            
+            self.header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.segment.buf)
+            if created or self.header['magic'] != SEGMENT_MAGIC:
+                self.header[()] = np.zeros((), dtype=HEADER_DTYPE)
+                self.header['capacity'] = capacity
+                self.header['clock_offset'] = NAN
+                self.header['first_data_received_time'] = NAN
+                self.header['magic'] = SEGMENT_MAGIC
+            
+            # Kapasitas mengikuti segment yang sudah ada (worker lain bisa dibuat dengan config lama)
+            self.capacity = int(self.header['capacity'])
+            self.records = np.ndarray(
+                (self.capacity,), dtype=RECORD_DTYPE, buffer=self.segment.buf, offset=HEADER_SIZE
+            )
+            self._set_attached(live_attached_pids(self.header) + [os.getpid()])
+        self.created = created
+    
+    def get(self, field):
+        return self.header[field].item()
+    
+    def set(self, field, value):
+        self.header[field] = value
+    
+    @contextmanager
+    def locked(self):
+        """Lock writer antar thread & proses; version ganjil selama blok berjalan"""
+        with self._exclusive():
+            self.header['version'] += 1
+            try:
+                yield self
+            finally:
+                self.header['version'] += 1
+    
+    def count(self):
+        return self.get('end') - self.get('start')
+    
+    def snapshot(self):
+        """Copy record jendela aktif (urut waktu) tanpa menahan writer (sequence lock)"""
+        for _ in range(self.snapshot_retries):
+            version = self.get('version')
+            if not version & 1:
+                records = self._copy_window()
+                if self.get('version') == version:
+                    return records
+            self.snapshot_conflicts += 1
+            time.sleep(0)
+        
+        self.snapshot_fallbacks += 1
+        with self._exclusive():
+            return self._copy_window()
+    
+    def latest(self):
+        """Copy record terbaru (array 0 atau 1 record) dengan sequence lock seperti snapshot()"""
+        for _ in range(self.snapshot_retries):
+            version = self.get('version')
+            if not version & 1:
+                end = self.get('end')
+                records = self._window(max(self.get('start'), end - 1), end)
+                if self.get('version') == version:
+                    return records
+            self.snapshot_conflicts += 1
+            time.sleep(0)
+        
+        self.snapshot_fallbacks += 1
+        with self._exclusive():
+            end = self.get('end')
+            return self._window(max(self.get('start'), end - 1), end)
+    
+    def insert(self, records, max_duration):
+        """Masukkan record terurut waktu (di dalam locked()): append, atau merge ekor untuk data terlambat"""
+        start = self.get('start')
+        end = self.get('end')
+        
+        if end > start and records['time'][0] < self._time_at(end - 1):
+            # Data terlambat: ekor yang lebih baru dari data pertama di-merge ulang (stable, ekor lama dulu)
+            window_times = self._window(start, end)['time']
+            split = start + int(np.searchsorted(window_times, records['time'][0], side='right'))
+            merged = np.concatenate((self._window(split, end), records))
+            records = merged[np.argsort(merged['time'], kind='stable')]
+            end = split
+        
+        # Ring penuh: data tertua dibuang walaupun belum lewat max_duration
+        overflow = max(0, end - start + len(records) - self.capacity)
+        if len(records) > self.capacity:
+            records = records[-self.capacity:]
+            start = end
+        else:
+            start += overflow
+        if overflow:
+            self.header['overflow_count'] += overflow
+        
+        self._write(end, records)
+        end += len(records)
+        
+        # Eviction berdasarkan waktu data terbaru
+        cutoff_time = self._time_at(end - 1) - max_duration
+        start += int(np.searchsorted(self._window(start, end)['time'], cutoff_time, side='left'))
+        self.set('start', start)
+        self.set('end', end)
+    
+    def clear(self):
+        """Kosongkan jendela (di dalam locked())"""
+        self.set('start', self.get('end'))
+    
+    def get_stats(self):
+        return {
+            "segment": self.name,
+            "capacity": self.capacity,
+            "overflow_count": self.get('overflow_count'),
+            "owner_pid": self.get('owner_pid'),
+            "lock_contended_local": self.lock_contended,
+            "lock_wait_ms_local": self.lock_wait_seconds * 1000,
+            "snapshot_conflicts_local": self.snapshot_conflicts,
+            "snapshot_fallbacks_local": self.snapshot_fallbacks
+        }
+    
+    def close(self):
+        """
+        Lepas mapping & file lock proses ini. Segment dihapus jika tidak ada worker hidup lain yang
+        memetakannya; jika masih ada, segment tetap untuk worker lain.
+        """
+        with self._exclusive():
+            attached = live_attached_pids(self.header)
+            if os.getpid() in attached:
+                attached.remove(os.getpid())
+            self._set_attached(attached)
+            if not attached and not self.header['attached_overflow']:
+                try:
+                    self.unlink()
+                except FileNotFoundError:
+                    pass  # Sudah dihapus (sweep startup worker lain)
+        self.records = None
+        self.header = None
+        try:
+            self.segment.close()
+        except BufferError:
+            pass  # Masih ada view yang dipakai thread lain; dilepas GC
+        os.close(self.lock_fd)
+    
+    def unlink(self):
+        """Hapus segment dari sistem (semua worker harus sudah tidak memakai device ini)"""
+        unlink_shared_memory(self.segment)
+    
+    def _set_attached(self, pids):
+        # Dipanggil di dalam _exclusive()
+        if len(pids) > MAX_ATTACHED_WORKERS:
+            self.header['attached_overflow'] = 1
+        pids = pids[:MAX_ATTACHED_WORKERS]
+        attached = self.header['attached_pids']
+        attached[:] = 0
+        attached[:len(pids)] = pids
+    
+    @contextmanager
+    def _exclusive(self):
+        if not self.thread_lock.acquire(blocking=False):
+            wait_start = time.perf_counter()
+            self.thread_lock.acquire()
+            self.lock_contended += 1
+            self.lock_wait_seconds += time.perf_counter() - wait_start
+        try:
+            fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+        finally:
+            self.thread_lock.release()
+    
+    def _time_at(self, index):
+        return self.records['time'][index % self.capacity].item()
+    
+    def _window(self, start, end):
+        # Index logis [start:end) -> copy record urut (ring bisa wrap ke awal)
+        first = start % self.capacity
+        count = end - start
+        if first + count <= self.capacity:
+            return self.records[first:first + count].copy()
+        return np.concatenate((self.records[first:], self.records[:first + count - self.capacity]))
+    
+    def _copy_window(self):
+        return self._window(self.get('start'), self.get('end'))
+    
+    def _write(self, index, records):
+        first = index % self.capacity
+        head = min(len(records), self.capacity - first)
+        self.records[first:first + head] = records[:head]
+        self.records[:len(records) - head] = records[head:]
+
+
+class SharedMemoryDataBuffer(DataBuffer):
+    """
+    Backend buffer di shared memory (SharedWindowStore): record fixed-layout per data, sehingga
+    semua worker WSGI menulis dan membaca jendela device yang sama. Offset jam device juga
+    disimpan di header segment. get_data()/get_columns() membangun Reading dari snapshot record.
+    """
+    def __init__(self, device_id, store, max_duration=30):
+        self.device_id = device_id
+        self.store = store
+        self.max_duration = max_duration
+        self.lock = store.thread_lock
+        self.snapshot_reads = 0
+    
+    @property
+    def clock_offset(self):
+        offset = self.store.get('clock_offset')
+        return None if offset != offset else offset
+    
+    @clock_offset.setter
+    def clock_offset(self, value):
+        self.store.set('clock_offset', NAN if value is None else value)
+    
+    @property
+    def version(self):
+        return self.store.get('version')
+    
+    def add_data(self, reading, live=True, current_time=None):
+        with self.store.locked():
+            point_time = self._stamp(reading, current_time if current_time is not None else time.time(), live)
+            self.store.insert(readings_to_records([(point_time, reading)]), self.max_duration)
+    
+    def add_batch(self, batch, live=False, current_time=None):
+        if not batch:
+            return
+        with self.store.locked():
+            self.store.insert(readings_to_records(self._stamp_batch(batch, live, current_time)), self.max_duration)
+    
+    def get_data(self):
+        self.snapshot_reads += 1
+        return tuple(records_to_readings(self.store.snapshot(), self.device_id))
+    
+    def get_data_count(self):
+        return self.store.count()
+    
+    def get_latest(self):
+        readings = records_to_readings(self.store.latest(), self.device_id)
+        return readings[-1] if readings else None
+    
+    def get_columns(self):
+        """Kolom NumPy dari snapshot record (copy, karena worker lain terus menulis ring)"""
+        self.snapshot_reads += 1
+        return records_to_columns(self.store.snapshot(), self.device_id)
+    
+    def clear(self):
+        with self.store.locked():
+            self.store.clear()
+    
+    def get_stats(self):
+        stats = {
+            "backend": BUFFER_BACKEND_SHARED,
+            "version": self.version,
+            "snapshot_reads": self.snapshot_reads
+        }
+        stats.update(self.store.get_stats())
+        return stats
+
+
+class SharedDeviceSession(DeviceSession):
+    """
+    Session device untuk backend 'shared': buffer, waktu warming up, dan jadwal analisis disimpan di
+    header shared memory sehingga semua worker melihat state yang sama. Analisis hanya dijalankan
+    worker pemegang lease (diperpanjang setiap analisis, diambil alih worker lain jika kedaluwarsa),
+    sehingga ringkasan pane dan deduplikasi kerusakan tetap di satu proses.
+    Filter replay (dedup) tetap per worker.
+    """
+    def __init__(self, device_id, max_duration=ANALYSIS_INTERVAL):
+        self.device_id = device_id
+        self.store = SharedWindowStore(
+            segment_name(SHARED_BUFFER_CONFIG['prefix'], device_id), SHARED_BUFFER_CONFIG['capacity'],
+            SHARED_BUFFER_CONFIG['lock_dir'], BUFFER_CONFIG['snapshot_retries']
+        )
+        self.data_buffer = SharedMemoryDataBuffer(device_id, self.store, max_duration + ANALYSIS_HOP)
+        self.window_aggregator = SlidingWindowAggregator(max_duration, ANALYSIS_HOP)
+        self.owner_lease = SHARED_BUFFER_CONFIG['owner_lease']
+        self.last_seen = time.time()
+        self.replay_filter = ReplayFilter()
+        self.offline_replay = []
+        self.bulk_pending = {}
+        self.usage_lock = threading.Lock()
+        self.users = 0
+        self.closed = False
+    
+    @property
+    def first_data_received_time(self):
+        value = self.store.get('first_data_received_time')
+        return None if value != value else value
+    
+    @first_data_received_time.setter
+    def first_data_received_time(self, value):
+        self.store.set('first_data_received_time', NAN if value is None else value)
+    
+    @property
+    def warming_up_cleared(self):
+        return bool(self.store.get('warming_up_cleared'))
+    
+    @warming_up_cleared.setter
+    def warming_up_cleared(self, value):
+        self.store.set('warming_up_cleared', int(bool(value)))
+    
+    @property
+    def last_analysis_time(self):
+        return self.store.get('last_analysis_time')
+    
+    @last_analysis_time.setter
+    def last_analysis_time(self, value):
+        self.store.set('last_analysis_time', value)
+    
+    def acquire_analysis(self, current_time=None):
+        """Ambil/perpanjang lease analisis device untuk worker ini. False jika dipegang worker lain"""
+        current_time = current_time if current_time is not None else time.time()
+        pid = os.getpid()
+        with self.store.locked():
+            owner_pid = self.store.get('owner_pid')
+            if owner_pid not in (0, pid) and self.store.get('owner_expires') > current_time:
+                return False
+            if owner_pid != pid:
+                # Worker baru memegang device: ringkasan pane proses lain tidak ada di sini
+                self.window_aggregator.reset()
+            self.store.set('owner_pid', pid)
+            self.store.set('owner_expires', current_time + self.owner_lease)
+        return True
+    
+    def release(self):
+        # Lease dilepas supaya worker lain langsung bisa menganalisis device ini
+        with self.store.locked():
+            if self.store.get('owner_pid') == os.getpid():
+                self.store.set('owner_pid', 0)
+                self.store.set('owner_expires', 0.0)
+        self.store.close()
@@ -0,0 +1,380 @@
+import math
+import threading
+from collections import deque
+
+import numpy as np
+
+from analysis.reading import SENSOR_COUNT
+from thresholds import (
+    ANALYSIS_INTERVAL, ANALYSIS_HOP, SURFACE_CHANGE_THRESHOLDS, SHOCK_THRESHOLDS, VIBRATION_THRESHOLDS
+)
+
+
+def extract_surface_changes(window):
+    """Perubahan jarak ultrasonic antar data berurutan yang >= threshold minor (dengan tanda asli)"""
+    return find_surface_changes(window.sensors)
+
+
+def find_surface_changes(sensors):
+    """
+    Selisih antar baris matriks ultrasonic (N x 8) sekaligus, lalu ambil yang >= threshold minor.
+    Return (changes, channels): perubahan dengan tanda asli (urut data lalu sensor, sama seperti loop
+    per pasangan data per sensor) dan index sensor 0-7 tiap perubahan.
+    """
+    sensors = np.asarray(sensors, dtype=np.float64).reshape(-1, SENSOR_COUNT)
+    diffs = sensors[1:] - sensors[:-1]  # Bisa positif atau negatif
+    
+    # Sensor hilang / error = NaN, selisihnya NaN dan tidak lolos threshold
+    rows, channels = np.nonzero(np.abs(diffs) >= SURFACE_CHANGE_THRESHOLDS['minor'])
+    return diffs[rows, channels], channels
+
+
+def extract_shock_candidates(window):
+    """shock_magnitude >= threshold light (NaN tidak lolos), urut waktu"""
+    shock = window.shock_magnitude
+    return shock[shock >= SHOCK_THRESHOLDS['light']].tolist()
+
+
+def extract_vibration_candidates(window):
+    """|vibration_magnitude| >= threshold light (NaN tidak lolos), urut waktu"""
+    vibration = np.abs(window.vibration_magnitude)
+    return vibration[vibration >= VIBRATION_THRESHOLDS['light']].tolist()
+
+
+def extract_speeds(window):
+    """Kecepatan GPS valid (km/h), NaN tidak lolos >= 0"""
+    return window.speed[window.speed >= 0].tolist()
+
+
+class RunningAggregate:
+    """
+    Count, jumlah, max, dan min nilai di jendela sliding yang bergeser per pane.
+    Kontribusi masuk di ekor dengan expire_key (index pane yang membuatnya keluar jendela, tidak menurun)
+    dan keluar di kepala: running sum untuk count/jumlah, monotonic deque untuk max/min,
+    sehingga statistik jendela tersedia O(1) tanpa menghitung ulang semua data.
+    """
+    __slots__ = ('count', 'total', 'entries', 'maxima', 'minima')
+    
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.entries = deque()  # (expire_key, count, total)
+        self.maxima = deque()   # (expire_key, max), max menurun dari kepala
+        self.minima = deque()   # (expire_key, min), min menaik dari kepala
+    
+    def push(self, expire_key, values):
+        count = len(values)
+        if not count:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        total = float(values.sum())
+        maximum = values.max().item()
+        minimum = values.min().item()
+        
+        self.count += count
+        self.total += total
+        self.entries.append((expire_key, count, total))
+        while self.maxima and self.maxima[-1][1] <= maximum:
+            self.maxima.pop()
+        self.maxima.append((expire_key, maximum))
+        while self.minima and self.minima[-1][1] >= minimum:
+            self.minima.pop()
+        self.minima.append((expire_key, minimum))
+    
+    def expire(self, expire_key):
+        """Buang kontribusi dengan expire_key <= expire_key (pane tersebut keluar dari jendela)"""
+        while self.entries and self.entries[0][0] <= expire_key:
+            _, count, total = self.entries.popleft()
+            self.count -= count
+            self.total -= total
+        while self.maxima and self.maxima[0][0] <= expire_key:
+            self.maxima.popleft()
+        while self.minima and self.minima[0][0] <= expire_key:
+            self.minima.popleft()
+        if not self.entries:
+            self.total = 0.0  # Jendela kosong: buang sisa pembulatan running sum
+    
+    def clear(self):
+        self.count = 0
+        self.total = 0.0
+        self.entries.clear()
+        self.maxima.clear()
+        self.minima.clear()
+    
+    @property
+    def maximum(self):
+        return self.maxima[0][1] if self.maxima else 0
+    
+    @property
+    def minimum(self):
+        return self.minima[0][1] if self.minima else 0
+
+
+class PaneSummary:
+    """
+    Ringkasan satu sub-jendela (pane) sepanjang hop: kandidat anomali dan data GPS/kecepatan.
+    Dihitung sekali per pane, lalu dipakai ulang oleh semua jendela yang overlap dengannya.
+    Baris ultrasonic pertama & terakhir disimpan untuk perubahan permukaan di batas antar pane.
+    """
+    __slots__ = (
+        'index', 'count', 'first_sensors', 'last_sensors', 'surface_changes', 'surface_channels',
+        'shock_candidates', 'vibration_candidates', 'speeds', 'gps_points'
+    )
+    
+    def __init__(self, index, window):
+        self.index = index  # Nomor pane: waktu mulai = index * hop
+        self.count = len(window)
+        # Copy: kolom jendela bisa berupa view ke buffer yang terus ditulis
+        self.first_sensors = window.sensors[0].copy() if self.count else None
+        self.last_sensors = window.sensors[-1].copy() if self.count else None
+        self.surface_changes, self.surface_channels = find_surface_changes(window.sensors)
+        self.shock_candidates = extract_shock_candidates(window)
+        self.vibration_candidates = extract_vibration_candidates(window)
+        self.speeds = extract_speeds(window)
+        self.gps_points = window.gps_points()
+
+
+class WindowSummary:
+    """
+    Gabungan pane satu jendela analisis, setara dengan menjalankan ekstraksi pada seluruh data jendela.
+    Statistik surface & kecepatan diambil dari running aggregate SlidingWindowAggregator saat jendela dibuat;
+    list (perubahan permukaan, kecepatan, GPS) baru digabung dari pane saat diakses, misalnya hanya
+    jika ada kerusakan yang disimpan. Filter kendaraan tetap dijalankan per jendela oleh analyzer.
+    """
+    def __init__(self, panes, hop, surface_stats, speed_stats):
+        self.panes = list(panes)
+        self.start_time = self.panes[0].index * hop
+        self.end_time = (self.panes[-1].index + 1) * hop
+        self.pane_count = len(self.panes)
+        self.count = sum(pane.count for pane in self.panes)
+        self.surface_stats = surface_stats  # (count, jumlah |perubahan|, max |perubahan|, max positif, min negatif)
+        self.speed_stats = speed_stats      # (count, jumlah, max, min)
+        self._surface = None
+    
+    @property
+    def surface_changes(self):
+        return self._surface_arrays()[0]
+    
+    @property
+    def surface_channels(self):
+        return self._surface_arrays()[1]
+    
+    @property
+    def shock_candidates(self):
+        return [shock for pane in self.panes for shock in pane.shock_candidates]
+    
+    @property
+    def vibration_candidates(self):
+        return [vibration for pane in self.panes for vibration in pane.vibration_candidates]
+    
+    @property
+    def speeds(self):
+        return [speed for pane in self.panes for speed in pane.speeds]
+    
+    @property
+    def gps_points(self):
+        return [point for pane in self.panes for point in pane.gps_points]
+    
+    @property
+    def start_location(self):
+        return next((pane.gps_points[0] for pane in self.panes if pane.gps_points), None)
+    
+    @property
+    def end_location(self):
+        return next((pane.gps_points[-1] for pane in reversed(self.panes) if pane.gps_points), None)
+    
+    def _surface_arrays(self):
+        if self._surface is not None:
+            return self._surface
+        surface_changes = []
+        surface_channels = []
+        previous = None
+        for pane in self.panes:
+            if not pane.count:
+                continue
+            # Perubahan permukaan antara data terakhir pane sebelumnya dan data pertama pane ini
+            if previous is not None:
+                changes, channels = find_pane_boundary_changes(previous, pane)
+                surface_changes.append(changes)
+                surface_channels.append(channels)
+            surface_changes.append(pane.surface_changes)
+            surface_channels.append(pane.surface_channels)
+            previous = pane
+        
+        self._surface = (
+            np.concatenate(surface_changes) if surface_changes else np.empty(0),
+            np.concatenate(surface_channels) if surface_channels else np.empty(0, dtype=np.intp)
+        )
+        return self._surface
+    
+    def __len__(self):
+        return self.count
+
+
+def find_pane_boundary_changes(previous, pane):
+    """Perubahan permukaan antara data terakhir pane `previous` dan data pertama `pane` (keduanya tidak kosong)"""
+    return find_surface_changes(np.vstack((previous.last_sensors, pane.first_sensors)))
+
+
+class SlidingWindowAggregator:
+    """
+    Jendela analisis sliding/hopping per device: panjang `window` detik, dievaluasi setiap `hop` detik.
+    Data dibagi ke pane sepanjang hop (sejajar epoch) yang diringkas sekali saat pane sudah lewat,
+    sehingga jendela yang overlap hanya menggabungkan ringkasan (biaya overlap hampir nol).
+    hop = window berarti jendela tumbling seperti sebelumnya.
+    Data terlambat yang masuk ke pane yang sudah diringkas tidak ikut jendela berikutnya.
+    
+    Statistik surface change & kecepatan dijaga sebagai RunningAggregate yang diperbarui saat pane
+    masuk/keluar jendela, jadi biaya per trigger tidak bergantung pada sample rate / panjang jendela.
+    """
+    def __init__(self, window=ANALYSIS_INTERVAL, hop=ANALYSIS_HOP):
+        self.hop = hop
+        self.panes_per_window = max(1, int(round(window / hop)))
+        self.window = self.panes_per_window * hop
+        self.panes = deque()
+        self.last_filled_pane = None  # Pane tidak kosong terakhir (perubahan permukaan di batas pane)
+        self.surface = RunningAggregate()           # |perubahan permukaan|
+        self.surface_positive = RunningAggregate()  # Perubahan positif (lubang)
+        self.surface_negative = RunningAggregate()  # Perubahan negatif (gundukan)
+        self.speed = RunningAggregate()
+        self.next_pane = None  # Index pane berikutnya yang belum diringkas
+        self.last_damage = None  # (end_time, klasifikasi) kerusakan terakhir yang dilaporkan
+        self.lock = threading.Lock()
+        self.pane_count = 0
+        self.window_count = 0
+    
+    def advance(self, columns, final=False):
+        """
+        Ringkas pane yang sudah selesai dari kolom jendela buffer (urut waktu) dan
+        return WindowSummary untuk setiap jendela penuh yang berakhir di batas pane baru.
+        final=True (replay offline): pane terakhir yang belum selesai ikut ditutup, dan jika
+        data lebih pendek dari satu jendela, jendela parsial tetap dikembalikan.
+        """
+        windows = []
+        if not len(columns):
+            return windows
+        
+        times = columns.times
+        latest = times[-1]
+        with self.lock:
+            first_pane = math.floor(times[0] / self.hop)
+            if self.next_pane is None or first_pane - self.next_pane >= self.panes_per_window:
+                # Awal data atau jeda panjang (device diam): mulai dari pane data tertua
+                self._clear_panes()
+                self.next_pane = first_pane
+            
+            while True:
+                pane_start = self.next_pane * self.hop
+                pane_end = pane_start + self.hop
+                if pane_end > latest and not (final and pane_start <= latest):
+                    break
+                
+                lo = int(np.searchsorted(times, pane_start, side='left'))
+                hi = int(np.searchsorted(times, pane_end, side='left'))
+                self._append_pane(PaneSummary(self.next_pane, columns.slice(lo, hi)))
+                self.next_pane += 1
+                self.pane_count += 1
+                
+                if len(self.panes) == self.panes_per_window:
+                    windows.append(self._window_summary())
+            
+            if final and not windows and self.panes:
+                windows.append(self._window_summary())
+            self.window_count += len(windows)
+        return windows
+    
+    def claim_damage(self, window, classification, severity_rank):
+        """
+        Jendela yang overlap menemukan kerusakan yang sama: laporkan hanya jika jendela tidak overlap
+        dengan kerusakan terakhir yang dilaporkan, atau klasifikasinya lebih berat. Return True jika dilaporkan.
+        """
+        with self.lock:
+            if self.last_damage is not None:
+                last_end_time, last_classification = self.last_damage
+                if window.start_time < last_end_time and severity_rank[classification] <= severity_rank[last_classification]:
+                    return False
+            self.last_damage = (window.end_time, classification)
+            return True
+    
+    def export_state(self):
+        """Posisi pane dan kerusakan terakhir yang dilaporkan (untuk checkpoint session)"""
+        with self.lock:
+            return {
+                "next_pane": self.next_pane,
+                "last_damage": list(self.last_damage) if self.last_damage is not None else None
+            }
+    
+    def restore_state(self, state, columns):
+        """
+        Pulihkan state dari export_state() setelah restart: ringkasan pane jendela berjalan dibangun
+        ulang dari kolom buffer yang dipulihkan, sehingga jendela berikutnya langsung dievaluasi
+        tanpa mengulang jendela yang sudah dilaporkan.
+        """
+        with self.lock:
+            self._clear_panes()
+            self.next_pane = state.get('next_pane')
+            last_damage = state.get('last_damage')
+            self.last_damage = tuple(last_damage) if last_damage else None
+            if self.next_pane is None or not len(columns):
+                return
+            
+            times = columns.times
+            for index in range(self.next_pane - self.panes_per_window, self.next_pane):
+                lo = int(np.searchsorted(times, index * self.hop, side='left'))
+                hi = int(np.searchsorted(times, (index + 1) * self.hop, side='left'))
+                self._append_pane(PaneSummary(index, columns.slice(lo, hi)))
+    
+    def reset(self):
+        with self.lock:
+            self._clear_panes()
+            self.next_pane = None
+            self.last_damage = None
+    
+    def get_stats(self):
+        return {
+            "window_seconds": self.window,
+            "hop_seconds": self.hop,
+            "panes_summarized": self.pane_count,
+            "windows_evaluated": self.window_count
+        }
+    
+    def _append_pane(self, pane):
+        # Pane tertua keluar jendela: kontribusinya (dan perubahan di batas setelahnya) dibuang
+        if len(self.panes) == self.panes_per_window:
+            expired = self.panes.popleft()
+            for aggregate in self._aggregates():
+                aggregate.expire(expired.index)
+        self.panes.append(pane)
+        if not pane.count:
+            return
+        
+        # Perubahan di batas pane ikut jendela selama pane tidak kosong sebelumnya masih di jendela
+        previous = self.last_filled_pane
+        if previous is not None and previous.index > pane.index - self.panes_per_window:
+            changes, _ = find_pane_boundary_changes(previous, pane)
+            self._push_surface(previous.index, changes)
+        self._push_surface(pane.index, pane.surface_changes)
+        self.speed.push(pane.index, pane.speeds)
+        self.last_filled_pane = pane
+    
+    def _push_surface(self, expire_key, changes):
+        self.surface.push(expire_key, np.abs(changes))
+        self.surface_positive.push(expire_key, changes[changes > 0])
+        self.surface_negative.push(expire_key, changes[changes < 0])
+    
+    def _clear_panes(self):
+        self.panes.clear()
+        self.last_filled_pane = None
+        for aggregate in self._aggregates():
+            aggregate.clear()
+    
+    def _aggregates(self):
+        return (self.surface, self.surface_positive, self.surface_negative, self.speed)
+    
+    def _window_summary(self):
+        return WindowSummary(
+            self.panes, self.hop,
+            (self.surface.count, self.surface.total, self.surface.maximum,
+             self.surface_positive.maximum, self.surface_negative.minimum),
+            (self.speed.count, self.speed.total, self.speed.maximum, self.speed.minimum)
+        )
@@ -2,9 +2,11 @@ from flask import Flask
 import matplotlib
 matplotlib.use('Agg')
 import os
+import threading
 from datetime import datetime
 from core.config import (
-    DB_CONFIG, FLASK_CONFIG, THINGSBOARD_URL, THINGSBOARD_IMAGE_CONFIG, UPLOAD_FOLDER, THINGSBOARD_CONFIG
+    DB_CONFIG, FLASK_CONFIG, THINGSBOARD_URL, THINGSBOARD_IMAGE_CONFIG, UPLOAD_FOLDER, THINGSBOARD_CONFIG,
+    STREAM_CONFIG, BUFFER_CONFIG
 )
 from core.database import get_db_connection, test_database_connection
 
@@ -14,20 +16,70 @@ from core.thingsboard import (
 from thresholds import (
     ANALYSIS_INTERVAL
 )
-from analysis.buffer import INITIAL_SKIP_PERIOD
+from analysis.buffer import INITIAL_SKIP_PERIOD, BUFFER_BACKEND_SHARED
 # init_buffer(ANALYSIS_INTERVAL)
 from dashboard import dashboard_bp
 from routes.multisensor import multisensor_bp
 from routes.status import status_bp
 from routes.analysis import analysis_bp
+from routes.stream import stream_bp, sock
+from analysis.ingest import replay_write_ahead_log
+from core.wal import ingest_wal
+from analysis.checkpoint import session_checkpoint
 
 app = Flask(__name__)
+app.config['SOCK_SERVER_OPTIONS'] = {
+    'max_message_size': STREAM_CONFIG['max_frame_bytes'],
+    'ping_interval': STREAM_CONFIG['ping_interval']
+}
+sock.init_app(app)
 
 
 app.register_blueprint(dashboard_bp, url_prefix='/dashboard')
 app.register_blueprint(multisensor_bp)
 app.register_blueprint(status_bp)
 app.register_blueprint(analysis_bp)
+app.register_blueprint(stream_bp)
+
+services_lock = threading.Lock()
+services_started = False
+
+
+def start_session_services():
+    """
+    Pulihkan session dari checkpoint, lalu buffer dari write-ahead log (data setelah checkpoint),
+    kemudian mulai WAL dan checkpoint berkala. Sekali per proses yang menangani request:
+    setiap worker WSGI (setelah fork) dan proses anak reloader Flask debug.
+    """
+    global services_started
+    with services_lock:
+        if services_started:
+            return
+        if BUFFER_CONFIG['backend'] == BUFFER_BACKEND_SHARED:
+            # Segment shared memory worker yang crash dihapus dulu, supaya tidak dianggap buffer hidup
+            from analysis.shared_buffer import sweep_stale_segments
+            sweep_stale_segments()
+        restored = session_checkpoint.restore() if session_checkpoint is not None else {}
+        # WAL dibuka dulu: open() mengambil alih segmen worker yang sudah berhenti supaya ikut di-replay
+        if ingest_wal is not None:
+            ingest_wal.open()
+        replay_write_ahead_log(restored=restored)
+        if session_checkpoint is not None:
+            session_checkpoint.start()
+        services_started = True
+
+
+@app.before_request
+def ensure_session_services():
+    # Server WSGI tidak menjalankan blok __main__: state dipulihkan sebelum request pertama worker
+    if not services_started:
+        start_session_services()
+
+
+def is_reloader_parent():
+    """Proses induk reloader Flask debug hanya memantau file, tidak menangani request"""
+    use_reloader = FLASK_CONFIG.get('use_reloader', FLASK_CONFIG.get('debug', False))
+    return use_reloader and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
 
 
 if __name__ == '__main__':
@@ -46,6 +98,10 @@ if __name__ == '__main__':
 
     # Test koneksi ThingsBoard
     test_thingsboard_conn()
+
+    # Proses yang menangani request memulihkan session sebelum server jalan (bukan induk reloader)
+    if not is_reloader_parent():
+        start_session_services()
           
     print(f"🌐 Server running on http://{FLASK_CONFIG['host']}:{FLASK_CONFIG['port']}")
     print("=" * 60)
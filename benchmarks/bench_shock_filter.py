@@ -0,0 +1,34 @@
+"""
+Benchmark filter guncangan kendaraan: loop per data vs mask NumPy.
+Jalankan dari root repo: python -m benchmarks.bench_shock_filter
+"""
+import contextlib
+import io
+import random
+import timeit
+
+from filters.shock_filter import filter_vehicle_shock
+from tests.reference import reference_filter_vehicle_shock
+
+SERIES_SIZES = (100, 1000, 10000, 100000)
+
+
+def best_time(function, series, number):
+    # Log filter tidak ikut diukur
+    with contextlib.redirect_stdout(io.StringIO()):
+        return min(timeit.repeat(lambda: function(series), number=number, repeat=3)) / number
+
+
+def main():
+    rnd = random.Random(22)
+    print(f"{'data':>8} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for count in SERIES_SIZES:
+        shocks = [rnd.uniform(0, 60) for _ in range(count)]
+        number = max(1, 10000 // count)
+        loop_time = best_time(reference_filter_vehicle_shock, shocks, number)
+        numpy_time = best_time(filter_vehicle_shock, shocks, number)
+        print(f"{count:>8} {loop_time * 1000:>10.2f} {numpy_time * 1000:>10.2f} {loop_time / numpy_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Benchmark ekstraksi perubahan permukaan (8 sensor ultrasonic): loop per data vs selisih matriks NumPy.
+Jalankan dari root repo: python -m benchmarks.bench_surface_changes
+"""
+import random
+import timeit
+
+import numpy as np
+
+from analysis.analyzer import summarize_surface_changes
+from analysis.reading import SENSOR_COUNT
+from analysis.windowing import find_surface_changes
+from tests.reference import reference_find_surface_changes, reference_summarize_surface_changes
+
+# Jendela 30 detik pada 10, 50, dan 100 Hz, plus replay offline panjang
+WINDOW_SIZES = (300, 1500, 3000, 30000)
+SENSOR_VALUES = [20.0, 20.5, 21.7, 35.2, 50.0, 18.3, 400.0, float('nan')]
+
+
+def best_time(function, number):
+    return min(timeit.repeat(function, number=number, repeat=5)) / number
+
+
+def main():
+    rnd = random.Random(20)
+    print(f"{'data':>8} {'perubahan':>10} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for count in WINDOW_SIZES:
+        rows = [[rnd.choice(SENSOR_VALUES) for _ in range(SENSOR_COUNT)] for _ in range(count)]
+        sensors = np.array(rows, dtype=np.float64)
+        number = max(1, 30000 // count)
+
+        loop_time = best_time(lambda: reference_summarize_surface_changes(reference_find_surface_changes(rows)[0]), number)
+        numpy_time = best_time(lambda: summarize_surface_changes(*find_surface_changes(sensors)), number)
+        changes = len(find_surface_changes(sensors)[0])
+        print(f"{count:>8} {changes:>10} {loop_time * 1000:>10.2f} {numpy_time * 1000:>10.2f} {loop_time / numpy_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+"""
+Benchmark filter getaran kendaraan: loop dengan np.polyfit per jendela vs rolling_slope (closed form) + mask NumPy.
+Jalankan dari root repo: python -m benchmarks.bench_vibration_filter
+"""
+import contextlib
+import io
+import random
+import timeit
+
+from filters.vibration_filter import filter_vehicle_vibration
+from tests.reference import reference_filter_vehicle_vibration
+
+SERIES_SIZES = (100, 1000, 10000, 100000)
+
+
+def best_time(function, series, number, repeat=3):
+    # Log filter tidak ikut diukur
+    with contextlib.redirect_stdout(io.StringIO()):
+        return min(timeit.repeat(lambda: function(series), number=number, repeat=repeat)) / number
+
+
+def main():
+    rnd = random.Random(23)
+    print(f"{'data':>8} {'loop ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for count in SERIES_SIZES:
+        vibrations = [rnd.uniform(-15, 15) for _ in range(count)]
+        # Loop polyfit lambat (~50 us per data): cukup sekali untuk seri panjang
+        loop_time = best_time(reference_filter_vehicle_vibration, vibrations, 1, repeat=1 if count > 10000 else 3)
+        numpy_time = best_time(filter_vehicle_vibration, vibrations, max(1, 10000 // count))
+        print(f"{count:>8} {loop_time * 1000:>10.2f} {numpy_time * 1000:>10.2f} {loop_time / numpy_time:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -42,3 +42,101 @@ FLASK_CONFIG = {
 UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'static')
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
+
+# Antrian ingest: /multisensor langsung return setelah data masuk antrian
+INGEST_QUEUE_CONFIG = {
+    'max_size': int(os.getenv('INGEST_QUEUE_SIZE', 2000)),   # Total kapasitas antrian (semua worker)
+    'workers': int(os.getenv('INGEST_WORKERS', 4)),          # Jumlah worker thread
+    'retry_after': int(os.getenv('INGEST_RETRY_AFTER', 1)),  # Detik (header Retry-After saat antrian penuh)
+}
+
+# Batas body request ingest (Content-Encoding gzip/deflate didekompresi bertahap)
+PAYLOAD_CONFIG = {
+    'max_body_bytes': int(os.getenv('PAYLOAD_MAX_BODY_BYTES', 2 * 1024 * 1024)),              # Body mentah (terkompresi)
+    'max_decompressed_bytes': int(os.getenv('PAYLOAD_MAX_DECOMPRESSED_BYTES', 8 * 1024 * 1024)),
+    'max_item_bytes': int(os.getenv('PAYLOAD_MAX_ITEM_BYTES', 64 * 1024)),                    # Satu data sensor
+    'read_chunk_size': 16 * 1024,
+    'submit_chunk_size': int(os.getenv('PAYLOAD_SUBMIT_CHUNK', 100)),  # Data per item antrian ingest
+}
+
+# Rate limit ingest (token bucket) per device dan global, dicek sebelum body di-parse
+RATE_LIMIT_CONFIG = {
+    'enabled': os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == "true",
+    'device_rate': float(os.getenv('RATE_LIMIT_DEVICE_RATE', 20)),      # Request/detik per device
+    'device_burst': float(os.getenv('RATE_LIMIT_DEVICE_BURST', 40)),
+    'global_rate': float(os.getenv('RATE_LIMIT_GLOBAL_RATE', 1000)),    # Request/detik semua device
+    'global_burst': float(os.getenv('RATE_LIMIT_GLOBAL_BURST', 2000)),
+    'max_tracked_devices': int(os.getenv('RATE_LIMIT_MAX_DEVICES', 4096)),  # Bucket per device (LRU)
+}
+
+# Pool koneksi MySQL untuk writer latar belakang
+DB_POOL_CONFIG = {
+    'pool_name': os.getenv('DB_POOL_NAME', 'road_monitoring_pool'),
+    'pool_size': int(os.getenv('DB_POOL_SIZE', 4))
+}
+
+# Writer sensor_data: simpan data mentah per batch (group commit), bukan INSERT per data
+SENSOR_WRITER_CONFIG = {
+    'enabled': os.getenv('SENSOR_WRITER_ENABLED', 'True').lower() == "true",
+    'max_queue_size': int(os.getenv('SENSOR_WRITER_QUEUE_SIZE', 20000)),  # Data menunggu ditulis
+    'batch_size': int(os.getenv('SENSOR_WRITER_BATCH_SIZE', 500)),        # Flush setiap N data
+    'flush_interval_ms': int(os.getenv('SENSOR_WRITER_FLUSH_MS', 1000))   # atau setiap M milidetik
+}
+
+# Write-ahead log lokal: data yang diterima ditulis ke segmen file sebelum diproses
+WAL_CONFIG = {
+    'enabled': os.getenv('WAL_ENABLED', 'True').lower() == "true",
+    'directory': os.getenv('WAL_DIR', 'wal'),
+    'segment_max_bytes': int(os.getenv('WAL_SEGMENT_MAX_BYTES', 8 * 1024 * 1024)),  # Rotasi segmen
+    'max_segments': int(os.getenv('WAL_MAX_SEGMENTS', 8)),              # Segmen lama dihapus
+    'fsync_interval_ms': int(os.getenv('WAL_FSYNC_INTERVAL_MS', 200)),   # fsync per batch, bukan per data
+    'replay_max_age': float(os.getenv('WAL_REPLAY_MAX_AGE', 120))        # Detik, record lebih lama tidak di-replay
+}
+
+# Arsip kolumnar (Parquet) data sensor mentah, dipartisi per tanggal dan device
+ARCHIVE_CONFIG = {
+    'enabled': os.getenv('ARCHIVE_ENABLED', 'True').lower() == "true",
+    'directory': os.getenv('ARCHIVE_DIR', 'archive'),
+    'max_queue_size': int(os.getenv('ARCHIVE_QUEUE_SIZE', 20000)),
+    'row_group_size': int(os.getenv('ARCHIVE_ROW_GROUP_SIZE', 5000)),      # Data per row group
+    'flush_interval': int(os.getenv('ARCHIVE_FLUSH_INTERVAL', 60)),        # Detik, tulis row group yang belum penuh
+    'max_rows_per_file': int(os.getenv('ARCHIVE_MAX_ROWS_PER_FILE', 200000)),
+    'compression': os.getenv('ARCHIVE_COMPRESSION', 'zstd')
+}
+
+# Streaming ingest (WebSocket /multisensor/stream): satu koneksi per device, ack kumulatif
+STREAM_CONFIG = {
+    'ack_every_frames': int(os.getenv('STREAM_ACK_EVERY_FRAMES', 10)),   # Kirim ack setiap N frame
+    'ack_interval_ms': int(os.getenv('STREAM_ACK_INTERVAL_MS', 1000)),   # atau setelah M milidetik
+    'max_frame_bytes': int(os.getenv('STREAM_MAX_FRAME_BYTES', 256 * 1024)),
+    'ping_interval': int(os.getenv('STREAM_PING_INTERVAL', 25))          # Detik, deteksi koneksi mati
+}
+
+# Backend buffer jendela analisis per device
+BUFFER_CONFIG = {
+    'backend': os.getenv('BUFFER_BACKEND', 'columnar'),  # 'columnar' (NumPy), 'deque', atau 'shared' (multi worker)
+    'initial_capacity': int(os.getenv('BUFFER_INITIAL_CAPACITY', 1024)),  # Slot awal per device (tumbuh x2)
+    'snapshot_retries': int(os.getenv('BUFFER_SNAPSHOT_RETRIES', 3))  # Percobaan seqlock sebelum reader ambil lock
+}
+
+# Backend buffer 'shared': jendela per device di shared memory, dipakai bersama semua worker WSGI
+SHARED_BUFFER_CONFIG = {
+    'prefix': os.getenv('SHARED_BUFFER_PREFIX', 'roadsense'),          # Prefix nama segment /dev/shm
+    'capacity': int(os.getenv('SHARED_BUFFER_CAPACITY', 2048)),        # Slot record per device (ring)
+    'lock_dir': os.getenv('SHARED_BUFFER_LOCK_DIR', '/tmp/roadsense-locks'),  # File lock antar proses
+    'owner_lease': float(os.getenv('SHARED_BUFFER_OWNER_LEASE', 15))   # Detik lease worker yang menganalisis device
+}
+
+# Checkpoint session device (buffer, warming up, jadwal analisis) untuk warm restart
+SESSION_CHECKPOINT_CONFIG = {
+    'enabled': os.getenv('SESSION_CHECKPOINT_ENABLED', 'True').lower() == "true",
+    'path': os.getenv('SESSION_CHECKPOINT_PATH', 'checkpoint/sessions.npz'),
+    'interval': float(os.getenv('SESSION_CHECKPOINT_INTERVAL', 5)),    # Detik antar checkpoint
+    'max_age': float(os.getenv('SESSION_CHECKPOINT_MAX_AGE', 120))     # Checkpoint lebih lama diabaikan (device dianggap restart juga)
+}
+
+# Scheduler analisis jendela: antrian job per device, dijalankan pool worker terbatas
+ANALYSIS_SCHEDULER_CONFIG = {
+    'workers': int(os.getenv('ANALYSIS_WORKERS', 2)),              # Analisis berjalan bersamaan (semua device)
+    'max_pending': int(os.getenv('ANALYSIS_MAX_PENDING', 256))      # Job antri maksimum, job baru ditolak jika penuh
+}
@@ -1,7 +1,12 @@
 from debugpy import connect
 from mysql.connector import Error
 import mysql.connector
-from core.config import DB_CONFIG 
+import mysql.connector.pooling
+import threading
+from core.config import DB_CONFIG, DB_POOL_CONFIG
+
+_connection_pool = None
+_pool_lock = threading.Lock()
 
 def get_db_connection():
     """Membuat koneksi ke database MySQL"""
@@ -12,6 +17,19 @@ def get_db_connection():
     except Error as e:
         print(f"❌ Error connecting to MySQL: {e}")
         return None
+
+
+def get_pooled_connection():
+    """Ambil koneksi dari pool MySQL (dibuat saat pertama dipakai). close() mengembalikan ke pool"""
+    global _connection_pool
+    try:
+        with _pool_lock:
+            if _connection_pool is None:
+                _connection_pool = mysql.connector.pooling.MySQLConnectionPool(**DB_POOL_CONFIG, **DB_CONFIG)
+        return _connection_pool.get_connection()
+    except Error as e:
+        print(f"❌ Error getting pooled MySQL connection: {e}")
+        return None
     
     
 # Test database connection
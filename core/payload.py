@@ -0,0 +1,337 @@
+import codecs
+import json
+import struct
+import zlib
+
+from core.config import PAYLOAD_CONFIG
+
+# Content-Type untuk newline-delimited JSON (satu data sensor per baris)
+NDJSON_CONTENT_TYPES = (
+    'application/x-ndjson',
+    'application/ndjson',
+    'application/jsonlines',
+    'application/x-jsonlines',
+)
+
+# Content-Type untuk record biner fixed-layout (lihat BINARY_READING_STRUCT)
+BINARY_CONTENT_TYPES = (
+    'application/vnd.road-sensing.v1',
+    'application/octet-stream',
+)
+
+# Layout record biner v1 (little-endian, 121 byte per data sensor):
+#   B  version            (1)
+#   B  flags              (bit0: GPS valid, bit1: motion sensor valid)
+#   6s device MAC         (-> device_id "AA:BB:CC:DD:EE:FF")
+#   I  timestamp          (millis device)
+#   I  seq                (nomor urut data, 0 = tidak dipakai)
+#   d  latitude, d longitude, f speed, B satellites
+#   8f sensor1..sensor8   (cm, -1 = error)
+#   6h accelX, accelY, accelZ, gyroX, gyroY, gyroZ (raw)
+#   4f accelX_ms2, accelY_ms2, accelZ_ms2, accel_magnitude_ms2
+#   4f gyroX_dps, gyroY_dps, gyroZ_dps, rotation_magnitude_dps
+#   2f shock_magnitude, vibration_magnitude
+BINARY_READING_VERSION = 1
+BINARY_READING_STRUCT = struct.Struct('<BB6sII ddfB 8f 6h 4f 4f 2f')
+
+BINARY_FLAG_GPS = 0x01
+BINARY_FLAG_MOTION = 0x02
+
+_SENSOR_KEYS = tuple(f'sensor{i}' for i in range(1, 9))
+_RAW_MOTION_KEYS = ('accelX', 'accelY', 'accelZ', 'gyroX', 'gyroY', 'gyroZ')
+_MOTION_KEYS = (
+    'accelX_ms2', 'accelY_ms2', 'accelZ_ms2', 'accel_magnitude_ms2',
+    'gyroX_dps', 'gyroY_dps', 'gyroZ_dps', 'rotation_magnitude_dps',
+    'shock_magnitude', 'vibration_magnitude'
+)
+
+# Penanda baris kosong NDJSON (bukan data, bukan invalid)
+_SKIP = object()
+
+
+class PayloadError(ValueError):
+    """Payload dari device tidak bisa di-parse"""
+    status_code = 400
+
+
+class PayloadTooLarge(PayloadError):
+    """Body request (atau hasil dekompresinya) melebihi batas"""
+    status_code = 413
+
+
+class UnsupportedEncoding(PayloadError):
+    """Content-Encoding tidak didukung"""
+    status_code = 415
+
+
+def is_ndjson(content_type):
+    if not content_type:
+        return False
+    return content_type.split(';', 1)[0].strip().lower() in NDJSON_CONTENT_TYPES
+
+
+def is_binary(content_type):
+    if not content_type:
+        return False
+    return content_type.split(';', 1)[0].strip().lower() in BINARY_CONTENT_TYPES
+
+
+def _format_mac(raw_mac):
+    return ':'.join(f'{b:02X}' for b in raw_mac)
+
+
+def decode_binary_readings(body):
+    """
+    Decode satu atau lebih record biner (BINARY_READING_STRUCT) menjadi dict data sensor
+    dengan key yang sama seperti payload JSON firmware.
+    """
+    record_size = BINARY_READING_STRUCT.size
+    if not body:
+        return []
+    if len(body) % record_size != 0:
+        raise PayloadError(f"Binary payload length {len(body)} is not a multiple of {record_size}")
+    
+    readings = []
+    for values in BINARY_READING_STRUCT.iter_unpack(body):
+        version, flags, raw_mac, timestamp, seq = values[:5]
+        if version != BINARY_READING_VERSION:
+            raise PayloadError(f"Unsupported binary record version {version}")
+        
+        data = {'timestamp': timestamp}
+        if any(raw_mac):
+            data['device_id'] = _format_mac(raw_mac)
+        if seq:
+            data['seq'] = seq
+        
+        if flags & BINARY_FLAG_GPS:
+            data['latitude'], data['longitude'], data['speed'], data['satellites'] = values[5:9]
+        
+        data.update(zip(_SENSOR_KEYS, values[9:17]))
+        
+        if flags & BINARY_FLAG_MOTION:
+            data.update(zip(_RAW_MOTION_KEYS, values[17:23]))
+            data.update(zip(_MOTION_KEYS, values[23:33]))
+        
+        readings.append(data)
+    
+    return readings
+
+
+def encode_binary_reading(data):
+    """Encode dict data sensor ke record biner v1 (untuk simulator/test device)"""
+    device_id = data.get('device_id') or ''
+    raw_mac = bytes.fromhex(device_id.replace(':', '')) if device_id else bytes(6)
+    if len(raw_mac) != 6:
+        raise PayloadError(f"device_id {device_id!r} is not a MAC address")
+    
+    has_gps = data.get('latitude') is not None and data.get('longitude') is not None
+    has_motion = data.get('shock_magnitude') is not None
+    flags = (BINARY_FLAG_GPS if has_gps else 0) | (BINARY_FLAG_MOTION if has_motion else 0)
+    
+    def value(key, default=0):
+        item = data.get(key)
+        return default if item is None else item
+    
+    return BINARY_READING_STRUCT.pack(
+        BINARY_READING_VERSION, flags, raw_mac,
+        int(value('timestamp')), int(value('seq')),
+        value('latitude'), value('longitude'), value('speed'), int(value('satellites')),
+        *(value(key, -1) for key in _SENSOR_KEYS),
+        *(int(value(key)) for key in _RAW_MOTION_KEYS),
+        *(value(key) for key in _MOTION_KEYS)
+    )
+
+
+def iter_request_chunks(stream, content_encoding=None, chunk_size=None,
+                        max_body_bytes=None, max_decompressed_bytes=None):
+    """
+    Baca body request per chunk dan dekompresi gzip/deflate secara bertahap.
+    Ukuran body mentah dan hasil dekompresi dibatasi (PayloadTooLarge).
+    """
+    chunk_size = chunk_size or PAYLOAD_CONFIG['read_chunk_size']
+    max_body_bytes = max_body_bytes or PAYLOAD_CONFIG['max_body_bytes']
+    max_decompressed_bytes = max_decompressed_bytes or PAYLOAD_CONFIG['max_decompressed_bytes']
+    
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding not in ('identity', 'gzip', 'x-gzip', 'deflate'):
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {content_encoding}")
+    
+    decompressor = None
+    raw_total = 0
+    output_total = 0
+    
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        
+        raw_total += len(chunk)
+        if raw_total > max_body_bytes:
+            raise PayloadTooLarge(f"Request body exceeds {max_body_bytes} bytes")
+        
+        if encoding == 'identity':
+            output_total += len(chunk)
+            if output_total > max_decompressed_bytes:
+                raise PayloadTooLarge(f"Request body exceeds {max_decompressed_bytes} bytes")
+            yield chunk
+            continue
+        
+        if decompressor is None:
+            decompressor = _create_decompressor(encoding, chunk)
+        
+        # max_length membatasi output per langkah (aman dari zip bomb)
+        data = chunk
+        while data and not decompressor.eof:
+            try:
+                output = decompressor.decompress(data, chunk_size)
+            except zlib.error as e:
+                raise PayloadError(f"Invalid {encoding} body: {e}")
+            output_total += len(output)
+            if output_total > max_decompressed_bytes:
+                raise PayloadTooLarge(f"Decompressed body exceeds {max_decompressed_bytes} bytes")
+            if output:
+                yield output
+            data = decompressor.unconsumed_tail
+    
+    if decompressor is not None:
+        output = decompressor.flush()
+        output_total += len(output)
+        if output_total > max_decompressed_bytes:
+            raise PayloadTooLarge(f"Decompressed body exceeds {max_decompressed_bytes} bytes")
+        if output:
+            yield output
+        if not decompressor.eof:
+            raise PayloadError(f"Truncated {encoding} body")
+
+
+def _create_decompressor(encoding, first_chunk):
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    
+    # 'deflate' seharusnya zlib-wrapped, tapi sebagian client mengirim raw deflate
+    if len(first_chunk) >= 2 and (first_chunk[0] & 0x0F) == 8 and ((first_chunk[0] << 8) | first_chunk[1]) % 31 == 0:
+        return zlib.decompressobj(zlib.MAX_WBITS)
+    return zlib.decompressobj(-zlib.MAX_WBITS)
+
+
+class ReadingStream:
+    """
+    Iterator data sensor dari chunk body request, di-parse bertahap (memori terbatas):
+    JSON array, satu/lebih JSON object, NDJSON, atau record biner sesuai Content-Type.
+    Item yang bukan object dihitung di invalid_count.
+    """
+    def __init__(self, chunks, content_type=None, max_item_bytes=None):
+        self.chunks = chunks
+        self.content_type = content_type
+        self.max_item_bytes = max_item_bytes or PAYLOAD_CONFIG['max_item_bytes']
+        self.count = 0
+        self.invalid_count = 0
+    
+    def __iter__(self):
+        if is_binary(self.content_type):
+            items = self._iter_binary()
+        elif is_ndjson(self.content_type):
+            items = self._iter_ndjson()
+        else:
+            items = self._iter_json()
+        
+        for item in items:
+            if item is _SKIP:
+                continue
+            if isinstance(item, dict):
+                self.count += 1
+                yield item
+            else:
+                self.invalid_count += 1
+    
+    def _iter_binary(self):
+        record_size = BINARY_READING_STRUCT.size
+        pending = b''
+        for chunk in self.chunks:
+            pending += chunk
+            usable = len(pending) - len(pending) % record_size
+            if usable:
+                yield from decode_binary_readings(pending[:usable])
+                pending = pending[usable:]
+        if pending:
+            raise PayloadError(f"Binary payload has {len(pending)} trailing bytes (record size {record_size})")
+    
+    def _iter_ndjson(self):
+        pending = b''
+        for chunk in self.chunks:
+            pending += chunk
+            *lines, pending = pending.split(b'\n')
+            for line in lines:
+                yield self._decode_line(line)
+            if len(pending) > self.max_item_bytes:
+                raise PayloadError(f"NDJSON line exceeds {self.max_item_bytes} bytes")
+        if pending.strip():
+            yield self._decode_line(pending)
+    
+    def _decode_line(self, line):
+        line = line.strip()
+        if not line:
+            return _SKIP
+        try:
+            return json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            return None
+    
+    def _iter_json(self):
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder('utf-8')()
+        chunks = iter(self.chunks)
+        buffer = ''
+        position = 0
+        eof = False
+        in_array = None
+        
+        while True:
+            # Lewati whitespace; baca chunk berikutnya jika buffer habis
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position >= len(buffer):
+                if eof:
+                    break
+                buffer, position, eof = self._read_more(chunks, text_decoder, buffer, position)
+                continue
+            
+            char = buffer[position]
+            if in_array is None:
+                in_array = char == '['
+                if in_array:
+                    position += 1
+                    continue
+            if in_array:
+                if char == ']':
+                    break
+                if char == ',':
+                    position += 1
+                    continue
+            
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise PayloadError("Invalid JSON body")
+                if len(buffer) - position > self.max_item_bytes:
+                    raise PayloadError(f"JSON item exceeds {self.max_item_bytes} bytes")
+                buffer, position, eof = self._read_more(chunks, text_decoder, buffer, position)
+                continue
+            
+            # Angka di ujung buffer mungkin belum lengkap
+            if end == len(buffer) and not eof and not isinstance(item, (dict, list)):
+                buffer, position, eof = self._read_more(chunks, text_decoder, buffer, position)
+                continue
+            
+            position = end
+            yield item
+    
+    def _read_more(self, chunks, text_decoder, buffer, position):
+        chunk = next(chunks, None)
+        try:
+            if chunk is None:
+                return buffer[position:] + text_decoder.decode(b'', final=True), 0, True
+            return buffer[position:] + text_decoder.decode(chunk), 0, False
+        except UnicodeDecodeError as e:
+            raise PayloadError(f"Body bukan UTF-8: {e}")
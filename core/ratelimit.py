@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+from core.config import RATE_LIMIT_CONFIG
+
+
+class TokenBucket:
+    """Token bucket: isi ulang `rate` token/detik sampai maksimal `burst`"""
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at')
+    
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now if now is not None else time.monotonic()
+    
+    def consume(self, now, cost=1.0):
+        """Return 0 jika token cukup (dan dikurangi), selain itu detik tunggu sampai token cukup"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate if self.rate > 0 else float('inf')
+    
+    def refund(self, cost=1.0):
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class RateLimiter:
+    """
+    Admission control ingest: bucket per device (LRU, jumlah dibatasi) + satu bucket global.
+    check() murah dan dipanggil sebelum body request dibaca.
+    """
+    def __init__(self, device_rate, device_burst, global_rate, global_burst, max_tracked_devices=4096):
+        self.device_rate = device_rate
+        self.device_burst = device_burst
+        self.max_tracked_devices = max_tracked_devices
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.device_buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            'allowed': 0,
+            'limited_device': 0,
+            'limited_global': 0
+        }
+    
+    def check(self, device_key, cost=1.0):
+        """Return (allowed, retry_after_seconds, scope)"""
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.device_buckets.get(device_key)
+            if bucket is None:
+                bucket = self.device_buckets[device_key] = TokenBucket(self.device_rate, self.device_burst, now)
+                if len(self.device_buckets) > self.max_tracked_devices:
+                    self.device_buckets.popitem(last=False)
+            else:
+                self.device_buckets.move_to_end(device_key)
+            
+            wait = bucket.consume(now, cost)
+            if wait:
+                self.stats['limited_device'] += 1
+                return False, wait, 'device'
+            
+            wait = self.global_bucket.consume(now, cost)
+            if wait:
+                # Token device dikembalikan: yang penuh adalah kapasitas global
+                bucket.refund(cost)
+                self.stats['limited_global'] += 1
+                return False, wait, 'global'
+            
+            self.stats['allowed'] += 1
+            return True, 0.0, None
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['tracked_devices'] = len(self.device_buckets)
+            stats['global_tokens'] = round(self.global_bucket.tokens, 1)
+        stats.update({
+            'device_rate': self.device_rate,
+            'device_burst': self.device_burst,
+            'global_rate': self.global_bucket.rate,
+            'global_burst': self.global_bucket.burst
+        })
+        return stats
+
+# Rate limiter global untuk endpoint ingest (None jika dimatikan lewat config)
+ingest_rate_limiter = RateLimiter(
+    RATE_LIMIT_CONFIG['device_rate'], RATE_LIMIT_CONFIG['device_burst'],
+    RATE_LIMIT_CONFIG['global_rate'], RATE_LIMIT_CONFIG['global_burst'],
+    RATE_LIMIT_CONFIG['max_tracked_devices']
+) if RATE_LIMIT_CONFIG['enabled'] else None
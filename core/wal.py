@@ -0,0 +1,325 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from core.config import WAL_CONFIG
+
+# Header record: panjang payload dan CRC32 payload (little-endian)
+RECORD_HEADER = struct.Struct('<II')
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.wal'
+WORKER_PREFIX = 'worker-'
+CHECKPOINT_MARKER = 'checkpoint_saved_at'  # Field record penanda batas checkpoint session
+
+
+def is_process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Proses ada tapi milik user lain
+    return True
+
+
+def encode_record(record):
+    """Record dict -> entry segmen: header (panjang, CRC32) + payload JSON"""
+    payload = json.dumps(record, separators=(',', ':'), default=str).encode('utf-8')
+    return RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+class WriteAheadLog:
+    """
+    Log append-only di disk lokal, dibagi per segmen file yang dirotasi berdasarkan ukuran.
+    Record ditulis ke buffer file dan di-fsync berkala oleh thread latar belakang (group fsync),
+    sehingga append() tidak menunggu disk. Record terakhir yang terpotong (crash) diabaikan saat replay.
+    
+    Setiap proses worker menulis ke subdirektori sendiri (worker-<pid>), jadi index segmen dan retensi
+    tidak bentrok antar worker. Saat open(), segmen worker yang sudah mati dipindahkan ke direktori
+    worker ini (rename atomik, satu worker saja yang berhasil) untuk di-replay dan dirotasi di sini.
+    
+    Checkpoint session menandai batasnya dengan record penanda sebagai record pertama segmen baru
+    (rotate(marker)). Penanda ikut berpindah bersama segmennya, jadi posisi batas tetap benar setelah
+    segmen diambil alih worker lain (index segmen berubah, urutan record tidak).
+    """
+    def __init__(self, directory, segment_max_bytes=8 * 1024 * 1024, max_segments=8, fsync_interval_ms=200):
+        self.root_directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_segments = max(1, max_segments)
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.lock = threading.Lock()
+        self.file = None
+        self.segment_index = 0
+        self.segment_bytes = 0
+        self.dirty = False
+        self.sync_thread = None
+        # Dipegang worker ingest dari append sampai data masuk buffer, dan oleh checkpoint selama
+        # rotate + snapshot: record sebelum penanda checkpoint pasti sudah ada di snapshot
+        self.apply_lock = threading.Lock()
+        self.stats = {
+            'appended_records': 0,
+            'appended_bytes': 0,
+            'fsyncs': 0,
+            'rotations': 0,
+            'deleted_segments': 0,
+            'truncated_segments': 0,
+            'claimed_segments': 0,
+            'errors': 0,
+            'max_fsync_ms': 0.0,
+            'total_fsync_ms': 0.0
+        }
+    
+    @property
+    def directory(self):
+        # Dihitung dari pid saat dipakai: objek global dibuat sebelum fork worker WSGI
+        return os.path.join(self.root_directory, f"{WORKER_PREFIX}{os.getpid()}")
+    
+    def open(self):
+        """Buka segmen baru untuk ditulis (segmen lama tidak pernah di-append lagi)"""
+        with self.lock:
+            if self.file is not None:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._claim_orphan_segments()
+            existing = self.segment_indexes()
+            self.segment_index = existing[-1] if existing else 0
+            self._open_next_segment()
+            
+            self.sync_thread = threading.Thread(target=self._sync_loop, name="wal-fsync")
+            self.sync_thread.daemon = True
+            self.sync_thread.start()
+        print(f"📝 WAL opened: {self.directory} (segment {self.segment_index}, fsync setiap {self.fsync_interval * 1000:.0f}ms)")
+    
+    def append(self, record):
+        """Tambahkan satu record (dict JSON). Durable setelah fsync berikutnya"""
+        entry = encode_record(record)
+        
+        if self.file is None:
+            self.open()
+        
+        with self.lock:
+            try:
+                if self.segment_bytes and self.segment_bytes + len(entry) > self.segment_max_bytes:
+                    self._rotate()
+                self._write(entry)
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"❌ WAL append error: {e}")
+                return False
+        return True
+    
+    def sync(self):
+        """Flush buffer dan fsync segmen aktif jika ada record baru"""
+        with self.lock:
+            if not self.dirty or self.file is None:
+                return
+            started_at = time.monotonic()
+            try:
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"❌ WAL fsync error: {e}")
+                return
+            self.dirty = False
+            fsync_ms = (time.monotonic() - started_at) * 1000
+            self.stats['fsyncs'] += 1
+            self.stats['total_fsync_ms'] += fsync_ms
+            self.stats['max_fsync_ms'] = max(self.stats['max_fsync_ms'], fsync_ms)
+    
+    def rotate(self, saved_at=None):
+        """
+        Tutup segmen aktif (jika berisi record) dan mulai segmen baru, dipanggil sebelum checkpoint session.
+        saved_at: waktu checkpoint, ditulis sebagai record penanda pertama di segmen baru.
+        Return index segmen aktif: semua record di segmen sebelumnya sudah di-append sebelum panggilan ini.
+        """
+        with self.lock:
+            if self.file is None:
+                return None
+            try:
+                if self.segment_bytes:
+                    self._rotate()
+                if saved_at is not None:
+                    self._write(encode_record({CHECKPOINT_MARKER: saved_at}))
+            except OSError as e:
+                self.stats['errors'] += 1
+                print(f"❌ WAL rotate error: {e}")
+                return None
+            return self.segment_index
+    
+    def truncate(self, before_index):
+        """Hapus segmen dengan index < before_index (sudah tercakup checkpoint session). Return jumlah segmen"""
+        deleted = 0
+        with self.lock:
+            for index in self.segment_indexes():
+                if index >= before_index or index == self.segment_index:
+                    break
+                try:
+                    os.remove(self.segment_path(index))
+                    deleted += 1
+                except OSError:
+                    pass
+            self.stats['truncated_segments'] += deleted
+        return deleted
+    
+    def segment_indexes(self, directory=None):
+        directory = directory if directory is not None else self.directory
+        if not os.path.isdir(directory):
+            return []
+        indexes = []
+        for name in os.listdir(directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    indexes.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+                except ValueError:
+                    continue
+        return sorted(indexes)
+    
+    def segment_path(self, index, directory=None):
+        directory = directory if directory is not None else self.directory
+        return os.path.join(directory, f"{SEGMENT_PREFIX}{index:08d}{SEGMENT_SUFFIX}")
+    
+    def replay(self, with_index=False):
+        """
+        Iterasi semua record data dari segmen terlama ke terbaru (baca sekuensial lewat mmap),
+        tanpa record penanda checkpoint. with_index=True: yield (index segmen, record).
+        """
+        for index in self.segment_indexes():
+            for record in self._read_segment(self.segment_path(index)):
+                if CHECKPOINT_MARKER in record:
+                    continue
+                yield (index, record) if with_index else record
+    
+    def checkpoint_markers(self):
+        """Penanda checkpoint di segmen yang masih ada: dict waktu checkpoint -> index segmen penanda"""
+        markers = {}
+        for index in self.segment_indexes():
+            # Penanda selalu record pertama segmen, jadi cukup baca satu record per segmen
+            for record in self._read_segment(self.segment_path(index)):
+                if CHECKPOINT_MARKER in record:
+                    markers[record[CHECKPOINT_MARKER]] = index
+                break
+        return markers
+    
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['segment_index'] = self.segment_index
+            stats['segment_bytes'] = self.segment_bytes
+            stats['pending_sync'] = self.dirty
+        fsyncs = stats['fsyncs']
+        stats['avg_fsync_ms'] = stats.pop('total_fsync_ms') / fsyncs if fsyncs else 0.0
+        stats['segments'] = len(self.segment_indexes())
+        stats['directory'] = self.directory
+        return stats
+    
+    def _read_segment(self, path):
+        try:
+            with open(path, 'rb') as segment:
+                if os.fstat(segment.fileno()).st_size == 0:
+                    return
+                with mmap.mmap(segment.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                    position = 0
+                    end = len(view)
+                    while position + RECORD_HEADER.size <= end:
+                        length, checksum = RECORD_HEADER.unpack_from(view, position)
+                        start = position + RECORD_HEADER.size
+                        payload = view[start:start + length]
+                        if len(payload) < length or zlib.crc32(payload) != checksum:
+                            # Ekor segmen terpotong/rusak (crash saat menulis)
+                            print(f"⚠️ WAL {os.path.basename(path)}: record rusak di offset {position}, sisa segmen diabaikan")
+                            return
+                        position = start + length
+                        try:
+                            yield json.loads(payload)
+                        except ValueError:
+                            continue
+        except OSError as e:
+            print(f"❌ WAL read error {path}: {e}")
+    
+    def _claim_orphan_segments(self):
+        # Direktori worker yang prosesnya sudah tidak ada, plus segmen lama langsung di root (sebelum per worker)
+        orphans = [self.root_directory]
+        for name in sorted(os.listdir(self.root_directory)):
+            path = os.path.join(self.root_directory, name)
+            if not name.startswith(WORKER_PREFIX) or path == self.directory or not os.path.isdir(path):
+                continue
+            try:
+                pid = int(name[len(WORKER_PREFIX):])
+            except ValueError:
+                continue
+            if not is_process_alive(pid):
+                orphans.append(path)
+        
+        existing = self.segment_indexes()
+        next_index = existing[-1] + 1 if existing else 1
+        claimed = 0
+        for orphan in orphans:
+            for index in self.segment_indexes(orphan):
+                try:
+                    os.rename(self.segment_path(index, orphan), self.segment_path(next_index))
+                except FileNotFoundError:
+                    continue  # Sudah diambil worker lain
+                except OSError as e:
+                    self.stats['errors'] += 1
+                    print(f"❌ WAL claim error {orphan}: {e}")
+                    continue
+                next_index += 1
+                claimed += 1
+            if orphan != self.root_directory:
+                try:
+                    os.rmdir(orphan)
+                except OSError:
+                    pass
+        
+        if claimed:
+            self.stats['claimed_segments'] += claimed
+            print(f"📝 WAL: {claimed} segmen dari worker yang sudah berhenti diambil alih")
+    
+    def _open_next_segment(self):
+        self.segment_index += 1
+        self.file = open(self.segment_path(self.segment_index), 'ab')
+        self.segment_bytes = 0
+        
+        # Segmen lama di luar retensi dihapus
+        indexes = self.segment_indexes()
+        for index in indexes[:-self.max_segments]:
+            try:
+                os.remove(self.segment_path(index))
+                self.stats['deleted_segments'] += 1
+            except OSError:
+                pass
+    
+    def _write(self, entry):
+        # Dipanggil dengan self.lock
+        self.file.write(entry)
+        self.segment_bytes += len(entry)
+        self.dirty = True
+        self.stats['appended_records'] += 1
+        self.stats['appended_bytes'] += len(entry)
+    
+    def _rotate(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        self.dirty = False
+        self.stats['rotations'] += 1
+        self._open_next_segment()
+    
+    def _sync_loop(self):
+        while True:
+            time.sleep(self.fsync_interval)
+            self.sync()
+
+
+# WAL global untuk data ingest (None jika dimatikan lewat config)
+ingest_wal = WriteAheadLog(
+    WAL_CONFIG['directory'],
+    WAL_CONFIG['segment_max_bytes'],
+    WAL_CONFIG['max_segments'],
+    WAL_CONFIG['fsync_interval_ms']
+) if WAL_CONFIG['enabled'] else None
@@ -1,3 +1,4 @@
+import math
 import numpy as np
 from thresholds import (
     MIN_DATA_POINTS, ANALYSIS_INTERVAL, EARTH_RADIUS, MAX_GPS_GAP,
@@ -23,7 +24,7 @@ def filter_vehicle_shock(shocks, timestamps=None):
         }
     
     # Konversi ke numpy array untuk analisis
-    shock_array = np.array(shocks)
+    shock_array = np.asarray(shocks, dtype=np.float64)
     
     # Hitung baseline guncangan (guncangan konstan kendaraan)
     baseline = np.median(shock_array)
@@ -32,43 +33,26 @@ def filter_vehicle_shock(shocks, timestamps=None):
     shock_std = np.std(shock_array)
     shock_mean = np.mean(shock_array)
     
-    # Deteksi lonjakan guncangan yang tidak wajar (indikasi jalan rusak)
-    vehicle_shocks = []
-    road_shocks = []
+    # Deteksi lonjakan guncangan yang tidak wajar (indikasi jalan rusak) - semua data sekaligus
+    # Kriteria 1: Guncangan dalam range normal kendaraan
+    is_vehicle_shock = (
+        (VEHICLE_SHOCK_FILTER['baseline_min'] <= shock_array) & (shock_array <= VEHICLE_SHOCK_FILTER['baseline_max'])
+    )
     
-    for i, shock in enumerate(shock_array):
-        is_vehicle_shock = False
-        
-        # Kriteria 1: Guncangan dalam range normal kendaraan
-        if (VEHICLE_SHOCK_FILTER['baseline_min'] <= shock <= VEHICLE_SHOCK_FILTER['baseline_max']):
-            is_vehicle_shock = True
-        
-        # Kriteria 2: Guncangan konsisten dengan baseline
-        if abs(shock - baseline) <= VEHICLE_SHOCK_FILTER['baseline_tolerance']:
-            is_vehicle_shock = True
-        
-        # Kriteria 3: Analisis pola jika ada data sekitar
-        if i > 0 and i < len(shock_array) - 1:
-            prev_shock = shock_array[i-1]
-            next_shock = shock_array[i+1]
-            
-            # Guncangan motor cenderung gradual, bukan spike tiba-tiba
-            gradient_prev = abs(shock - prev_shock)
-            gradient_next = abs(shock - next_shock)
-            
-            if (gradient_prev <= VEHICLE_SHOCK_FILTER['max_gradient'] and 
-                gradient_next <= VEHICLE_SHOCK_FILTER['max_gradient']):
-                is_vehicle_shock = True
-        
-        # Kriteria 4: Override untuk spike tinggi (pasti jalan rusak)
-        if shock >= VEHICLE_SHOCK_FILTER['road_spike_threshold']:
-            is_vehicle_shock = False
-        
-        # Kategorikan guncangan
-        if is_vehicle_shock:
-            vehicle_shocks.append(shock)
-        else:
-            road_shocks.append(shock)
+    # Kriteria 2: Guncangan konsisten dengan baseline
+    is_vehicle_shock |= np.abs(shock_array - baseline) <= VEHICLE_SHOCK_FILTER['baseline_tolerance']
+    
+    # Kriteria 3: Analisis pola dengan data sebelum & sesudahnya (data pertama & terakhir tidak punya tetangga)
+    # Guncangan motor cenderung gradual, bukan spike tiba-tiba
+    gradual = np.abs(np.diff(shock_array)) <= VEHICLE_SHOCK_FILTER['max_gradient']  # |shock[i+1] - shock[i]|
+    is_vehicle_shock[1:-1] |= gradual[:-1] & gradual[1:]
+    
+    # Kriteria 4: Override untuk spike tinggi (pasti jalan rusak)
+    is_vehicle_shock &= ~(shock_array >= VEHICLE_SHOCK_FILTER['road_spike_threshold'])
+    
+    # Kategorikan guncangan (urutan asli dipertahankan)
+    vehicle_shocks = shock_array[is_vehicle_shock].tolist()
+    road_shocks = shock_array[~is_vehicle_shock].tolist()
     
     # Hasil filter
     result = {
@@ -96,9 +80,9 @@ def filter_vehicle_shock(shocks, timestamps=None):
 
 def process_realtime_shock(data):
     """Memproses guncangan real-time dari shock_magnitude ESP32"""
-    shock = data.get('shock_magnitude')
+    shock = data.shock_magnitude
     
-    if shock is not None:
+    if not math.isnan(shock):
         # Terapkan filter guncangan kendaraan pada single data point
         is_vehicle_shock = (
             VEHICLE_SHOCK_FILTER['baseline_min'] <= shock <= VEHICLE_SHOCK_FILTER['baseline_max']
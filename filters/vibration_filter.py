@@ -1,3 +1,4 @@
+import math
 import numpy as np
 from thresholds import (
     MIN_DATA_POINTS, ANALYSIS_INTERVAL, EARTH_RADIUS, MAX_GPS_GAP,
@@ -8,6 +9,30 @@ from analysis.classifier import (
     classify_damage_three_params, get_surface_change_severity, get_shock_severity, get_vibration_severity
 )
 
+# Toleransi (deg/s per sample) di sekitar slope_trend_threshold: slope dihitung ulang dengan np.polyfit
+# supaya hasil pembulatan sama persis dengan perhitungan per jendela sebelumnya
+SLOPE_TIE_TOLERANCE = 1e-9
+
+
+def rolling_slope(values, window_size):
+    """
+    Kemiringan regresi linear (least squares, x = 0..window_size-1) untuk setiap jendela
+    values[k:k + window_size] sekaligus: korelasi dengan bobot (x - mean x) / sum((x - mean x)^2).
+    Return array sepanjang len(values) - window_size + 1.
+    """
+    x = np.arange(window_size, dtype=np.float64)
+    weights = x - x.mean()
+    slopes = np.correlate(values, weights, mode='valid') / np.dot(weights, weights)
+    
+    # Nilai tepat di threshold: pakai np.polyfit agar klasifikasi identik
+    ties = np.flatnonzero(
+        np.abs(np.abs(slopes) - VEHICLE_VIBRATION_FILTER['slope_trend_threshold']) <= SLOPE_TIE_TOLERANCE
+    )
+    for k in ties:
+        slopes[k] = np.polyfit(x, values[k:k + window_size], 1)[0]
+    return slopes
+
+
 def filter_vehicle_vibration(vibrations, timestamps=None):
     if not vibrations or len(vibrations) < 3:
         return {
@@ -25,7 +50,7 @@ def filter_vehicle_vibration(vibrations, timestamps=None):
         }
     
     # Konversi ke numpy array untuk analisis
-    vib_array = np.array(vibrations)
+    vib_array = np.asarray(vibrations, dtype=np.float64)
     
     # Hitung baseline getaran
     baseline = np.median(vib_array)
@@ -34,64 +59,47 @@ def filter_vehicle_vibration(vibrations, timestamps=None):
     vib_std = np.std(vib_array)
     vib_mean = np.mean(vib_array)
     
-    # Deteksi berbagai jenis getaran
-    vehicle_vibrations = []
-    slope_vibrations = []
-    road_vibrations = []
+    # Deteksi berbagai jenis getaran - semua data sekaligus
+    abs_vib = np.abs(vib_array)
     
-    for i, vib in enumerate(vib_array):
-        is_vehicle_vibration = False
-        is_slope_vibration = False
-        
-        # Kriteria 1: Getaran dalam range normal kendaraan
-        if (VEHICLE_VIBRATION_FILTER['baseline_min'] <= vib <= VEHICLE_VIBRATION_FILTER['baseline_max']):
-            is_vehicle_vibration = True
-        
-        # Kriteria 2: Getaran konsisten dengan baseline
-        if abs(vib - baseline) <= VEHICLE_VIBRATION_FILTER['baseline_tolerance']:
-            is_vehicle_vibration = True
-        
-        # Kriteria 3: Deteksi pola tanjakan/turunan (rotasi konstan dalam satu arah)
-        if i >= 2 and i < len(vib_array) - 2:
-            # Ambil 5 point sekitar untuk analisis tren
-            window = vib_array[i-2:i+3]
-            
-            # Cek apakah ada tren konstan (tanjakan/turunan)
-            if len(window) >= 5:
-                # Hitung tren linear
-                trend = np.polyfit(range(len(window)), window, 1)[0]
-                
-                # Jika tren konstan dan dalam range slope
-                if abs(trend) <= VEHICLE_VIBRATION_FILTER['slope_trend_threshold']:
-                    # Cek apakah amplitudo dalam range slope
-                    if abs(vib) <= VEHICLE_VIBRATION_FILTER['slope_amplitude_threshold']:
-                        is_slope_vibration = True
-        
-        # Kriteria 4: Analisis gradien untuk getaran motor
-        if i > 0 and i < len(vib_array) - 1:
-            prev_vib = vib_array[i-1]
-            next_vib = vib_array[i+1]
-            
-            # Getaran motor cenderung gradual
-            gradient_prev = abs(vib - prev_vib)
-            gradient_next = abs(vib - next_vib)
-            
-            if (gradient_prev <= VEHICLE_VIBRATION_FILTER['max_gradient'] and 
-                gradient_next <= VEHICLE_VIBRATION_FILTER['max_gradient']):
-                is_vehicle_vibration = True
-        
-        # Kriteria 5: Override untuk spike tinggi (pasti jalan rusak)
-        if abs(vib) >= VEHICLE_VIBRATION_FILTER['road_spike_threshold']:
-            is_vehicle_vibration = False
-            is_slope_vibration = False
+    # Kriteria 1: Getaran dalam range normal kendaraan
+    is_vehicle_vibration = (
+        (VEHICLE_VIBRATION_FILTER['baseline_min'] <= vib_array) & (vib_array <= VEHICLE_VIBRATION_FILTER['baseline_max'])
+    )
+    
+    # Kriteria 2: Getaran konsisten dengan baseline
+    is_vehicle_vibration |= np.abs(vib_array - baseline) <= VEHICLE_VIBRATION_FILTER['baseline_tolerance']
+    
+    # Kriteria 3: Deteksi pola tanjakan/turunan (rotasi konstan dalam satu arah)
+    # Tren linear jendela slope_window point di sekitar tiap data (hanya jika jendela penuh)
+    window_size = VEHICLE_VIBRATION_FILTER['slope_window']
+    before = (window_size - 1) // 2
+    is_slope_vibration = np.zeros(len(vib_array), dtype=bool)
+    if len(vib_array) >= window_size:
+        trend = rolling_slope(vib_array, window_size)
         
-        # Kategorikan getaran
-        if is_slope_vibration:
-            slope_vibrations.append(vib)
-        elif is_vehicle_vibration:
-            vehicle_vibrations.append(vib)
-        else:
-            road_vibrations.append(vib)
+        # Jika tren konstan dan dalam range slope, dan amplitudo dalam range slope
+        is_slope_vibration[before:before + len(trend)] = (
+            (np.abs(trend) <= VEHICLE_VIBRATION_FILTER['slope_trend_threshold'])
+            & (abs_vib[before:before + len(trend)] <= VEHICLE_VIBRATION_FILTER['slope_amplitude_threshold'])
+        )
+    
+    # Kriteria 4: Analisis gradien untuk getaran motor (data dengan tetangga sebelum & sesudah)
+    # Getaran motor cenderung gradual
+    gradual = np.abs(np.diff(vib_array)) <= VEHICLE_VIBRATION_FILTER['max_gradient']  # |vib[i+1] - vib[i]|
+    is_vehicle_vibration[1:-1] |= gradual[:-1] & gradual[1:]
+    
+    # Kriteria 5: Override untuk spike tinggi (pasti jalan rusak)
+    is_spike = abs_vib >= VEHICLE_VIBRATION_FILTER['road_spike_threshold']
+    is_vehicle_vibration &= ~is_spike
+    is_slope_vibration &= ~is_spike
+    
+    # Kategorikan getaran (slope lebih dulu, lalu kendaraan; urutan asli dipertahankan)
+    is_vehicle_vibration &= ~is_slope_vibration
+    is_road_vibration = ~(is_slope_vibration | is_vehicle_vibration)
+    vehicle_vibrations = vib_array[is_vehicle_vibration].tolist()
+    slope_vibrations = vib_array[is_slope_vibration].tolist()
+    road_vibrations = vib_array[is_road_vibration].tolist()
     
     # Hasil filter
     result = {
@@ -121,9 +129,9 @@ def filter_vehicle_vibration(vibrations, timestamps=None):
 
 def process_realtime_vibration(data):
     """Memproses getaran real-time dari vibration_magnitude ESP32"""
-    vibration = data.get('vibration_magnitude')
+    vibration = data.vibration_magnitude
     
-    if vibration is not None:
+    if not math.isnan(vibration):
         abs_vibration = abs(vibration)
         
         # Terapkan filter getaran kendaraan pada single data point
@@ -141,6 +141,7 @@ struct SensorData {
   float vibration_magnitude;
   
   unsigned long timestamp;
+  unsigned long seq;  // Nomor urut data (dedup replay di server)
 };
 
 // Buffer untuk menyimpan data offline
@@ -148,6 +149,7 @@ const int OFFLINE_BUFFER_SIZE = 60;
 SensorData offlineBuffer[OFFLINE_BUFFER_SIZE];
 int offlineBufferIndex = 0;
 bool offlineBufferFull = false;
+unsigned long readingSeq = 0;  // Counter nomor urut data yang dikirim ke Flask
 
 void setup() {
   Serial.begin(115200);
@@ -650,7 +652,9 @@ void sendOfflineData() {
     SensorData data = offlineBuffer[i];
     
     String dataJson = "{";
+    dataJson += "\"device_id\":\"" + WiFi.macAddress() + "\",";
     dataJson += "\"timestamp\":" + String(data.timestamp) + ",";
+    dataJson += "\"seq\":" + String(data.seq) + ",";
     
     // GPS data
     if (data.latitude != 0 && data.longitude != 0) {
@@ -692,6 +696,7 @@ void sendOfflineData() {
   HTTPClient http;
   http.begin("http://192.168.43.18:5000/offline-data");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", WiFi.macAddress());  // Rate limit per device (server)
   
   int httpResponseCode = http.POST(batchPayload);
   
@@ -715,6 +720,7 @@ void sendAllSensorData() {
     // Create sensor data struct
     SensorData data;
     data.timestamp = millis();
+    data.seq = ++readingSeq;
     
     // GPS data
     if (gps.location.isValid()) {
@@ -756,6 +762,7 @@ void sendAllSensorData() {
     
     SensorData data;
     data.timestamp = millis();
+    data.seq = ++readingSeq;
 
     // GPS data
     if (gps.location.isValid()) {
@@ -912,6 +919,11 @@ String createThingsBoardPayload() {
 String createFlaskPayload() {
   String payload = "{";
   
+  // Identitas device (MAC) agar server memisahkan buffer per kendaraan
+  payload += "\"device_id\":\"" + WiFi.macAddress() + "\",";
+  payload += "\"seq\":" + String(++readingSeq) + ",";
+  payload += "\"timestamp\":" + String(millis()) + ",";  // Waktu device untuk urutan data di server
+  
   // GPS Data untuk Flask
   if (gps.location.isValid()) {
     payload += "\"latitude\":" + String(gps.location.lat(), 6) + ",";
@@ -998,6 +1010,7 @@ void sendToFlaskServer(String payload) {
   HTTPClient http;
   http.begin("http://192.168.43.18:5000/multisensor");
   http.addHeader("Content-Type", "application/json");
+  http.addHeader("X-Device-ID", WiFi.macAddress());  // Rate limit per device (server)
   int httpResponseCode = http.POST(payload);
   Serial.print("📡 Flask response: ");
   Serial.println(httpResponseCode);
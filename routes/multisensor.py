@@ -1,49 +1,151 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
+import math
 import time
-import threading
-from thresholds import MIN_DATA_POINTS
+import uuid
 
-from analysis.buffer import data_buffer
-from analysis.analyzer import perform_30s_analysis
+from analysis.buffer import device_registry, resolve_device_id
+from analysis.ingest import (
+    check_warming_up, ingest_queue, MODE_REALTIME, MODE_BULK, MODE_BULK_CHUNK, MODE_OFFLINE, MODE_OFFLINE_CHUNK
+)
 # from analysis.saver import save_sensor_data
-from filters.shock_filter import process_realtime_shock
-from filters.vibration_filter import process_realtime_vibration
-from core.thingsboard import send_to_thingsboard
-from analysis.buffer import INITIAL_SKIP_PERIOD
-from thresholds import ANALYSIS_INTERVAL
+from core.config import INGEST_QUEUE_CONFIG, PAYLOAD_CONFIG
+from core.payload import iter_request_chunks, ReadingStream, PayloadError
+from core.ratelimit import ingest_rate_limiter
 
 multisensor_bp = Blueprint('multisensor', __name__)
 
+def rate_limit_key():
+    """Identitas device tanpa membaca body: header X-Device-ID, fallback ke IP client"""
+    device_id = request.headers.get('X-Device-ID', '').strip()
+    return device_id or request.remote_addr or 'unknown'
+
+@multisensor_bp.before_request
+def enforce_rate_limit():
+    """Admission control sebelum body di-parse: token bucket per device dan global"""
+    if ingest_rate_limiter is None:
+        return None
+    
+    device_key = rate_limit_key()
+    allowed, retry_after, scope = ingest_rate_limiter.check(device_key)
+    if allowed:
+        return None
+    
+    retry_after = max(1, math.ceil(retry_after))
+    response = jsonify({
+        "status": "rate_limited",
+        "message": f"Too many requests ({scope} limit) - resend later",
+        "device_key": device_key,
+        "scope": scope,
+        "timestamp": datetime.now().isoformat(),
+        "retry_after_seconds": retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+def backpressure_response(message, **extra):
+    """Response 503 saat antrian ingest penuh - device harus kirim ulang"""
+    body = {
+        "status": "backpressure",
+        "message": message,
+        "timestamp": datetime.now().isoformat(),
+        "queue_depth": ingest_queue.depth(),
+        "retry_after_seconds": INGEST_QUEUE_CONFIG['retry_after']
+    }
+    body.update(extra)
+    response = jsonify(body)
+    response.status_code = 503
+    response.headers['Retry-After'] = str(INGEST_QUEUE_CONFIG['retry_after'])
+    return response
+
+def open_reading_stream():
+    """Stream data sensor dari body request: dekompresi (Content-Encoding) dan parse bertahap"""
+    chunks = iter_request_chunks(request.stream, request.headers.get('Content-Encoding'))
+    return ReadingStream(chunks, request.content_type)
+
+def payload_error_response(error):
+    return jsonify({"error": str(error)}), error.status_code
+
+def submit_reading_stream(stream, chunk_mode, final_mode, check_warmup=False):
+    """
+    Masukkan data dari stream ke antrian ingest per device, dipotong per submit_chunk_size
+    supaya batch besar tidak perlu ditampung utuh di memori. Return ringkasan per device.
+    Semua potongan request membawa batch_id yang sama, sehingga request bulk bersamaan tidak tercampur.
+    """
+    chunk_size = PAYLOAD_CONFIG['submit_chunk_size']
+    current_time = time.time()
+    batch_id = uuid.uuid4().hex
+    sessions = {}
+    pending = {}
+    results = {}
+    
+    def submit(device_id, readings, mode):
+        if ingest_queue.submit(sessions[device_id], readings, mode, batch_id):
+            results[device_id]['queued'] += len(readings)
+        else:
+            results[device_id]['rejected'] += len(readings)
+    
+    for data in stream:
+        device_id = resolve_device_id(data)
+        result = results.get(device_id)
+        if result is None:
+            session = sessions[device_id] = device_registry.get_session(device_id)
+            warming_up = check_warming_up(session, current_time)[0] if check_warmup else False
+            result = results[device_id] = {"queued": 0, "rejected": 0, "warming_up": 0, "is_warming_up": warming_up}
+            pending[device_id] = []
+        
+        if result['is_warming_up']:
+            result['warming_up'] += 1
+            continue
+        
+        batch = pending[device_id]
+        batch.append(data)
+        if len(batch) >= chunk_size:
+            submit(device_id, batch, chunk_mode)
+            pending[device_id] = []
+    
+    # Potongan terakhir per device (mode final, misalnya untuk trigger analisis offline)
+    for device_id, batch in pending.items():
+        if results[device_id]['is_warming_up']:
+            continue
+        if batch or final_mode != chunk_mode:
+            submit(device_id, batch, final_mode)
+    
+    return results
+
 @multisensor_bp.route('/multisensor', methods=['POST'])
 def multisensor():
     """Endpoint untuk menerima data sensor dari ESP32 - FIXED Warming Up Period"""
-    from analysis import buffer
-    buffer.first_data_received_time
-    buffer.last_analysis_time
-    
-    data = request.get_json()
+    # JSON atau record biner (sesuai Content-Type), boleh gzip/deflate
+    try:
+        readings = list(open_reading_stream())
+    except PayloadError as e:
+        return payload_error_response(e)
+    if len(readings) > 1:
+        return jsonify({"error": f"Expected 1 data point, got {len(readings)}"}), 400
+    
+    data = readings[0] if readings else None
     if not data:
         return jsonify({"error": "No data received"}), 400
     
     current_time = time.time()
     
-    # SET WAKTU PERTAMA MENERIMA DATA
-    if buffer.first_data_received_time is None:
-        buffer.first_data_received_time = current_time
-        print(f"🔌 ESP32 connected! Hardware warming up started ({INITIAL_SKIP_PERIOD}s)")
-        print(f"💡 During warming up: NO data save, NO buffer collection, NO analysis")
+    # Setiap device punya buffer, warming up, dan jadwal analisis sendiri
+    device_id = resolve_device_id(data)
+    session = device_registry.get_session(device_id)
+    data_buffer = session.data_buffer
     
     # CEK WARMING UP SEBELUM SEMUA OPERASI
-    elapsed_since_first_data = current_time - buffer.first_data_received_time
+    warming_up, remaining_time, elapsed_since_first_data = check_warming_up(session, current_time)
     
-    if elapsed_since_first_data < INITIAL_SKIP_PERIOD:
-        remaining_time = INITIAL_SKIP_PERIOD - elapsed_since_first_data
+    if warming_up:
         print(f"⏳ Warming up: {remaining_time:.1f}s remaining - SKIPPING all data operations")
         
         # Return immediately - NO data save, NO buffer, NO processing
         return jsonify({
             "status": "warming_up",
+            "device_id": device_id,
             "message": "Hardware warming up - data not saved or processed",
             "remaining_seconds": remaining_time,
             "elapsed_seconds": elapsed_since_first_data,
@@ -53,102 +155,95 @@ def multisensor():
             "warming_up": True
         }), 200
     
-    # CLEAR BUFFER SAAT PERTAMA KALI KELUAR DARI WARMING UP
-    if not hasattr(multisensor, 'warming_up_cleared'):
-        with data_buffer.lock:
-            data_buffer.data_points.clear()  # Clear semua data warming up
-        multisensor.warming_up_cleared = True
-        buffer.last_analysis_time = current_time
-        print("🧹 Buffer cleared after warming up period - Starting fresh data collection")
-        print("✅ Hardware stabilized - Normal operations begin")
-    
     # OPERASI NORMAL DIMULAI SETELAH WARMING UP SELESAI
-    print(f"📩 Data diterima: {datetime.now().strftime('%H:%M:%S')} (Post warming up)")
-    
-    # Simpan data mentah ke database (HANYA SETELAH WARMING UP)
-    # save_sensor_data(data)
-    
-    # Tambahkan ke buffer untuk analisis (HANYA SETELAH WARMING UP)
-    data_buffer.add_data(data)
-    
-    # Proses shock dan vibration real-time
-    shock_result = process_realtime_shock(data)
-    vibration_result = process_realtime_vibration(data)
-    
-    # Kirim payload real-time ke ThingsBoard
-    realtime_payload = {}
-    
-    if shock_result and shock_result['is_road_shock']:
-        realtime_payload["realtime_shock_ms2"] = shock_result['filtered_shock']
-        print(f"📡 Shock real-time: {shock_result['filtered_shock']:.2f} m/s²")
-    
-    if vibration_result and vibration_result['is_road_vibration']:
-        realtime_payload["realtime_vibration_dps"] = vibration_result['filtered_vibration']
-        print(f"📡 Vibration real-time: {vibration_result['filtered_vibration']:.2f} deg/s")
-    
-    if realtime_payload:
-        realtime_payload.update({
-            "timestamp": datetime.now().isoformat(),
-            # "fls_data_type": "realtime_3param",
-            # "fls_shock_filter_enabled": True,
-            # "fls_vibration_filter_enabled": True,
-            # "fls_post_warming_up": True
-        })
-        send_to_thingsboard(realtime_payload, "realtime_3param")
-    
-    # Cek apakah sudah waktunya untuk analisis 30 detik
-    if (current_time - buffer.last_analysis_time) >= ANALYSIS_INTERVAL:
-        if data_buffer.get_data_count() >= MIN_DATA_POINTS:
-            analysis_thread = threading.Thread(target=perform_30s_analysis)
-            analysis_thread.daemon = True
-            analysis_thread.start()
-        else:
-            print(f"⚠️ Skip analisis: data belum cukup ({data_buffer.get_data_count()}/{MIN_DATA_POINTS})")
+    # Buffer, filter real-time, ThingsBoard dan trigger analisis diproses worker ingest
+    if not ingest_queue.submit(session, [data], MODE_REALTIME):
+        print(f"🚦 Ingest queue penuh - data [{device_id}] ditolak")
+        return backpressure_response("Ingest queue full - resend later", device_id=device_id)
     
     return jsonify({
-        "status": "success",
-        "message": "Data processed successfully (post warming up)",
+        "status": "queued",
+        "device_id": device_id,
+        "message": "Data queued for processing (post warming up)",
         "timestamp": datetime.now().isoformat(),
         "data_buffer_count": data_buffer.get_data_count(),
-        "data_saved": True,
-        "buffer_updated": True,
+        "queue_depth": ingest_queue.depth(),
+        "queued": True,
+        "buffer_updated": False,
         "warming_up": False,
         "warming_up_completed": True,
         "elapsed_since_connection": elapsed_since_first_data,
         "parameters": "surface + shock + vibration",
         "filters": "shock & vibration filters enabled"
-    }), 200
+    }), 202
+
+@multisensor_bp.route('/multisensor/bulk', methods=['POST'])
+def multisensor_bulk():
+    """
+    Endpoint bulk untuk banyak data sensor sekaligus (JSON array, NDJSON, atau record biner).
+    Setiap data sebaiknya membawa timestamp device (millis) dan device_id.
+    """
+    stream = open_reading_stream()
+    try:
+        device_results = submit_reading_stream(stream, MODE_BULK_CHUNK, MODE_BULK, check_warmup=True)
+    except PayloadError as e:
+        return payload_error_response(e)
+    
+    if not stream.count:
+        return jsonify({"error": "No data received", "invalid_count": stream.invalid_count}), 400
+    
+    queued_count = sum(result['queued'] for result in device_results.values())
+    rejected_count = sum(result['rejected'] for result in device_results.values())
+    skipped_warming_up = sum(result['warming_up'] for result in device_results.values())
+    print(f"📦 Bulk diterima: {stream.count} data, {queued_count} queued, "
+          f"{skipped_warming_up} warming up, {rejected_count} rejected, {stream.invalid_count} invalid")
+    
+    if rejected_count:
+        return backpressure_response(
+            f"Ingest queue full - {rejected_count} data points rejected",
+            received_count=stream.count,
+            queued_count=queued_count,
+            rejected_count=rejected_count,
+            devices=device_results
+        )
+    
+    return jsonify({
+        "status": "queued",
+        "message": f"Queued {queued_count} of {stream.count} data points",
+        "timestamp": datetime.now().isoformat(),
+        "received_count": stream.count,
+        "queued_count": queued_count,
+        "skipped_warming_up": skipped_warming_up,
+        "invalid_count": stream.invalid_count,
+        "queue_depth": ingest_queue.depth(),
+        "devices": device_results
+    }), 202
 
 @multisensor_bp.route('/offline-data', methods=['POST'])
 def process_offline_data():
-    """Endpoint untuk menerima dan memproses data offline dari ESP32"""
-    data_batch = request.get_json()
-    if not data_batch:
+    """
+    Endpoint untuk menerima dan memproses data offline dari ESP32 (JSON array atau record biner).
+    Body boleh gzip/deflate; batch di-parse bertahap dan masuk antrian per potongan.
+    """
+    stream = open_reading_stream()
+    try:
+        device_results = submit_reading_stream(stream, MODE_OFFLINE_CHUNK, MODE_OFFLINE)
+    except PayloadError as e:
+        return payload_error_response(e)
+    
+    if not stream.count:
         return jsonify({"error": "No data received"}), 400
     
-    print(f"📥 Received {len(data_batch)} offline data points")
-    
-    # Process each data point in a separate thread to not block real-time analysis
-    def process_offline_batch():
-        for data in data_batch:
-            # Add to buffer for analysis
-            data_buffer.add_data(data)
-            
-            # Process shock and vibration
-            shock_result = process_realtime_shock(data)
-            vibration_result = process_realtime_vibration(data)
-        
-        # Trigger analysis if enough data
-        if data_buffer.get_data_count() >= MIN_DATA_POINTS:
-            perform_30s_analysis()
+    print(f"📥 Received {stream.count} offline data points")
     
-    # Start processing in background
-    thread = threading.Thread(target=process_offline_batch)
-    thread.daemon = True
-    thread.start()
+    rejected_devices = [device_id for device_id, result in device_results.items() if result['rejected']]
+    if rejected_devices:
+        # Non-200: ESP32 menyimpan offline buffer dan mengirim ulang nanti
+        print(f"🚦 Ingest queue penuh - offline batch {rejected_devices} ditolak")
+        return backpressure_response("Ingest queue full - offline batch rejected", devices=rejected_devices)
     
     return jsonify({
         "status": "success",
-        "message": f"Processing {len(data_batch)} offline data points",
+        "message": f"Processing {stream.count} offline data points",
         "timestamp": datetime.now().isoformat()
-    }), 200
\ No newline at end of file
+    }), 200
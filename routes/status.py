@@ -1,13 +1,22 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from datetime import datetime
 import time
 
-from analysis.buffer import data_buffer
+from analysis.buffer import device_registry
+from analysis.ingest import ingest_queue
+from analysis.analyzer import analysis_stage_stats
+from analysis.scheduler import analysis_scheduler
+from analysis.saver import sensor_data_writer
+from analysis.archiver import sensor_archiver
 from core.config import THINGSBOARD_URL
+from core.wal import ingest_wal
+from analysis.checkpoint import session_checkpoint
+from routes.stream import get_stream_stats
+from core.ratelimit import ingest_rate_limiter
 from core.thingsboard import send_to_thingsboard
 
-from analysis.buffer import INITIAL_SKIP_PERIOD, first_data_received_time, last_analysis_time
-from thresholds import ANALYSIS_INTERVAL
+from analysis.buffer import INITIAL_SKIP_PERIOD
+from thresholds import ANALYSIS_INTERVAL, ANALYSIS_HOP
 
 
 status_bp = Blueprint('status', __name__)
@@ -15,7 +24,17 @@ status_bp = Blueprint('status', __name__)
 @status_bp.route('/status', methods=['GET'])
 def status():
     """Endpoint untuk cek status sistem - UPDATED dengan 3 parameter"""
-    data_points = data_buffer.get_data()
+    # Status untuk device tertentu (?device_id=...), default device yang terakhir aktif
+    device_id = request.args.get('device_id')
+    session = device_registry.find_session(device_id) if device_id else device_registry.latest_session()
+    if device_id and session is None:
+        return jsonify({"error": f"Device {device_id} not found"}), 404
+    
+    # Cukup jumlah dan data terbaru: /status tidak menyalin seluruh jendela buffer
+    data_count = session.data_buffer.get_data_count() if session else 0
+    latest_data = session.data_buffer.get_latest() if session else None
+    first_data_received_time = session.first_data_received_time if session else None
+    last_analysis_time = session.last_analysis_time if session else 0
     
     # Cek warming up berdasarkan data pertama
     current_time = time.time()
@@ -29,19 +48,15 @@ def status():
         warming_up_remaining = 0
         hardware_connected_duration = 0
     
-    # Analisis data terbaru
-    latest_data = data_points[-1] if data_points else {}
-    
     # Status GPS
-    gps_status = "active" if latest_data.get('latitude') is not None else "inactive"
+    gps_status = "active" if latest_data is not None and latest_data.has_gps else "inactive"
     
     # Status sensor ultrasonic
-    ultrasonic_active = sum(1 for i in range(1, 9) 
-                           if latest_data.get(f'sensor{i}') not in [None, -1])
+    ultrasonic_active = latest_data.active_sensor_count if latest_data is not None else 0
     
     # Status motion sensor
     motion_status = "inactive"
-    if any(latest_data.get(key) is not None for key in ['accelX', 'accelY', 'accelZ']):
+    if latest_data is not None and latest_data.has_motion:
         motion_status = "active (shock + vibration)"
     
     # Test ThingsBoard connection
@@ -56,6 +71,14 @@ def status():
     return jsonify({
         "system_status": "running",
         "timestamp": datetime.now().isoformat(),
+        "device_id": session.device_id if session else None,
+        "devices": {
+            "active_count": len(device_registry),
+            "evicted_count": device_registry.evicted_count,
+            "idle_timeout": device_registry.idle_timeout,
+            "max_devices": device_registry.max_devices,
+            "device_ids": [s.device_id for s in device_registry.get_sessions()]
+        },
         "warming_up": {
             "is_warming_up": warming_up,
             "remaining_seconds": warming_up_remaining,
@@ -65,9 +88,22 @@ def status():
             "reason": "Hardware sensor stabilization, GPS acquisition, initial data settling"
         },
         "data_buffer": {
-            "count": len(data_points),
-            "max_duration": ANALYSIS_INTERVAL
+            "count": data_count,
+            "max_duration": ANALYSIS_INTERVAL,
+            "duplicates_dropped": session.replay_filter.duplicate_count if session else 0,
+            "device_reboots": session.replay_filter.reboot_count if session else 0,
+            "contention": session.data_buffer.get_stats() if session else None
         },
+        "analysis_windows": session.window_aggregator.get_stats() if session else None,
+        "analysis_pipeline": analysis_stage_stats.get_stats(),
+        "analysis_scheduler": analysis_scheduler.get_stats(),
+        "ingest_queue": ingest_queue.get_stats(),
+        "sensor_writer": sensor_data_writer.get_stats() if sensor_data_writer else {"enabled": False},
+        "archive": sensor_archiver.get_stats() if sensor_archiver else {"enabled": False},
+        "wal": ingest_wal.get_stats() if ingest_wal else {"enabled": False},
+        "checkpoint": session_checkpoint.get_stats() if session_checkpoint else {"enabled": False},
+        "stream": get_stream_stats(),
+        "rate_limit": ingest_rate_limiter.get_stats() if ingest_rate_limiter else {"enabled": False},
         "sensors": {
             "ultrasonic_active": ultrasonic_active,
             "ultrasonic_total": 8,
@@ -86,6 +122,6 @@ def status():
             "filters": "vehicle & slope filters enabled"
         },
         "last_analysis": datetime.fromtimestamp(last_analysis_time).isoformat() if last_analysis_time > 0 else "Never",
-        "next_analysis_in": max(0, ANALYSIS_INTERVAL - (time.time() - last_analysis_time))
+        "next_analysis_in": max(0, ANALYSIS_HOP - (time.time() - last_analysis_time))
     })
 
@@ -0,0 +1,170 @@
+from flask import Blueprint, request
+from flask_sock import Sock
+from datetime import datetime
+import json
+import threading
+import time
+
+from analysis.buffer import device_registry, resolve_device_id
+from analysis.ingest import check_warming_up, ingest_queue, MODE_REALTIME, MODE_BULK
+from core.config import INGEST_QUEUE_CONFIG, STREAM_CONFIG
+from core.payload import ReadingStream, PayloadError, BINARY_CONTENT_TYPES
+from core.ratelimit import ingest_rate_limiter
+
+stream_bp = Blueprint('stream', __name__)
+sock = Sock()
+
+# Statistik semua koneksi streaming (untuk /status)
+stream_stats = {
+    'active_connections': 0,
+    'total_connections': 0,
+    'frames': 0,
+    'readings_queued': 0,
+    'nacks': 0,
+    'dropped_after_nack': 0,
+    'invalid_frames': 0
+}
+stream_stats_lock = threading.Lock()
+
+def _count(key, value=1):
+    with stream_stats_lock:
+        stream_stats[key] += value
+
+def get_stream_stats():
+    with stream_stats_lock:
+        return dict(stream_stats)
+
+
+class IngestStream:
+    """
+    State satu koneksi streaming device.
+    Setiap frame (JSON object/array, atau record biner) diproses seperti /multisensor,
+    lalu di-ack kumulatif: ack_seq = seq terbesar yang semua data sebelumnya sudah diterima.
+    Jika frame ditolak (antrian penuh / rate limit) server kirim nack dan membuang frame berikutnya
+    sampai device mengirim ulang mulai dari ack_seq + 1 (go-back-N).
+    """
+    def __init__(self, device_id=None):
+        self.device_id = device_id or None
+        self.ack_seq = None
+        self.frames_accepted = 0
+        self.readings_accepted = 0
+        self.pending_acks = 0
+        self.stalled = False
+        self.warming_up = False
+    
+    def ack_message(self):
+        self.pending_acks = 0
+        return {
+            "type": "ack",
+            "device_id": self.device_id,
+            "ack_seq": self.ack_seq,
+            "frames": self.frames_accepted,
+            "readings": self.readings_accepted,
+            "warming_up": self.warming_up,
+            "queue_depth": ingest_queue.depth()
+        }
+    
+    def nack_message(self, status, message, retry_after):
+        self.stalled = True
+        self.pending_acks = 0
+        _count('nacks')
+        return {
+            "type": "nack",
+            "status": status,
+            "message": message,
+            "device_id": self.device_id,
+            "ack_seq": self.ack_seq,
+            "frames": self.frames_accepted,
+            "retry_after_seconds": retry_after,
+            "timestamp": datetime.now().isoformat()
+        }
+    
+    def handle_frame(self, frame):
+        """Proses satu frame. Return pesan yang harus langsung dikirim (ack/nack/error) atau None"""
+        _count('frames')
+        if isinstance(frame, str):
+            frame = frame.encode('utf-8')
+            content_type = 'application/json'
+        else:
+            content_type = BINARY_CONTENT_TYPES[0]
+        
+        try:
+            readings = list(ReadingStream([frame], content_type))
+        except PayloadError as e:
+            _count('invalid_frames')
+            return {"type": "error", "message": str(e), "ack_seq": self.ack_seq}
+        
+        # Satu koneksi = satu device; data tanpa device_id memakai device koneksi
+        for data in readings:
+            if self.device_id and not data.get('device_id'):
+                data['device_id'] = self.device_id
+        device_ids = {resolve_device_id(data) for data in readings}
+        if not readings or len(device_ids) != 1 or (self.device_id and self.device_id not in device_ids):
+            _count('invalid_frames')
+            return {"type": "error", "message": "Frame must contain data points of the connection's device",
+                    "ack_seq": self.ack_seq}
+        self.device_id = self.device_id or device_ids.pop()
+        
+        seqs = [data['seq'] for data in readings if isinstance(data.get('seq'), int)]
+        if self.stalled and seqs and self.ack_seq is not None and min(seqs) > self.ack_seq + 1:
+            # Frame yang sudah terkirim sebelum device menerima nack: tunggu pengiriman ulang
+            _count('dropped_after_nack')
+            return None
+        
+        if ingest_rate_limiter is not None:
+            allowed, retry_after, scope = ingest_rate_limiter.check(self.device_id)
+            if not allowed:
+                return self.nack_message("rate_limited", f"Too many frames ({scope} limit)", max(1, round(retry_after)))
+        
+        session = device_registry.get_session(self.device_id)
+        self.warming_up = check_warming_up(session, time.time())[0]
+        
+        # Data warming up di-ack tapi tidak diproses (sama seperti /multisensor)
+        if not self.warming_up:
+            mode = MODE_REALTIME if len(readings) == 1 else MODE_BULK
+            if not ingest_queue.submit(session, readings, mode):
+                print(f"🚦 Ingest queue penuh - frame stream [{self.device_id}] ditolak")
+                return self.nack_message("backpressure", "Ingest queue full - resend from ack_seq + 1",
+                                         INGEST_QUEUE_CONFIG['retry_after'])
+            _count('readings_queued', len(readings))
+        
+        self.stalled = False
+        self.frames_accepted += 1
+        self.readings_accepted += len(readings)
+        if seqs:
+            self.ack_seq = max(seqs)
+        
+        self.pending_acks += 1
+        if self.pending_acks >= STREAM_CONFIG['ack_every_frames']:
+            return self.ack_message()
+        return None
+
+
+@sock.route('/multisensor/stream', bp=stream_bp)
+def multisensor_stream(ws):
+    """
+    Endpoint WebSocket untuk stream data sensor terus-menerus dari ESP32 (tanpa koneksi baru per data).
+    Frame text: JSON object/array data sensor. Frame binary: record biner v1 (BINARY_READING_STRUCT).
+    Server mengirim ack kumulatif setiap ack_every_frames frame atau ack_interval_ms.
+    """
+    channel = IngestStream(request.args.get('device_id') or request.headers.get('X-Device-ID'))
+    ack_interval = STREAM_CONFIG['ack_interval_ms'] / 1000.0
+    _count('active_connections')
+    _count('total_connections')
+    print(f"🔗 Stream connected: {channel.device_id or request.remote_addr}")
+    
+    try:
+        while True:
+            frame = ws.receive(timeout=ack_interval)
+            if frame is None:
+                if channel.pending_acks:
+                    ws.send(json.dumps(channel.ack_message()))
+                continue
+            
+            reply = channel.handle_frame(frame)
+            if reply is not None:
+                ws.send(json.dumps(reply))
+    finally:
+        _count('active_connections', -1)
+        print(f"🔌 Stream closed [{channel.device_id}]: {channel.frames_accepted} frame, "
+              f"{channel.readings_accepted} data, ack_seq {channel.ack_seq}")
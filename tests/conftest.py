@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Modul aplikasi di-import dari root repo (sama seperti app.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# core/config.py membaca FLASK_PORT dengan int() saat import
+os.environ.setdefault('FLASK_PORT', '5000')
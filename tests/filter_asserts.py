@@ -0,0 +1,13 @@
+import numpy as np
+
+
+def assert_same_filter_result(actual, expected, list_keys):
+    """Hasil filter vektor sama dengan loop acuan: isi & urutan tiap kategori, flag, dan statistik (NaN == NaN)"""
+    assert actual.keys() == expected.keys()
+    assert actual['filter_applied'] == expected['filter_applied']
+    for key in list_keys:
+        assert np.array_equal(np.asarray(actual[key], dtype=np.float64),
+                              np.asarray(expected[key], dtype=np.float64), equal_nan=True), key
+    assert actual['stats'].keys() == expected['stats'].keys()
+    for key, value in expected['stats'].items():
+        assert actual['stats'][key] == value or (value != value and actual['stats'][key] != actual['stats'][key]), key
@@ -0,0 +1,199 @@
+"""
+Implementasi loop per data sebelum vektorisasi, disalin apa adanya (tanpa log).
+Dipakai sebagai acuan test kesetaraan dan pembanding di benchmarks/.
+"""
+import numpy as np
+
+from thresholds import SURFACE_CHANGE_THRESHOLDS, VEHICLE_SHOCK_FILTER, VEHICLE_VIBRATION_FILTER
+
+
+def reference_find_surface_changes(sensor_rows):
+    """Loop per pasangan data per sensor; return (changes, channels)"""
+    changes = []
+    channels = []
+
+    minor_threshold = SURFACE_CHANGE_THRESHOLDS['minor']
+
+    for i in range(1, len(sensor_rows)):
+        prev_sensors = sensor_rows[i-1]
+        curr_sensors = sensor_rows[i]
+
+        # Sensor hilang / error = NaN, selisihnya NaN dan tidak lolos threshold
+        for channel, (prev_val, curr_val) in enumerate(zip(prev_sensors, curr_sensors)):
+            change = curr_val - prev_val  # Bisa positif atau negatif
+            if abs(change) >= minor_threshold:
+                changes.append(change)  # Simpan dengan tanda asli
+                channels.append(channel)
+
+    return changes, channels
+
+
+def reference_summarize_surface_changes(changes):
+    return {
+        'changes': changes,
+        'max_change': max([abs(c) for c in changes]) if changes else 0,  # ABSOLUT untuk klasifikasi
+        'avg_change': sum([abs(c) for c in changes]) / len(changes) if changes else 0,  # ABSOLUT
+        'max_positive': max([c for c in changes if c > 0]) if any(c > 0 for c in changes) else 0,  # Lubang terdalam
+        'max_negative': min([c for c in changes if c < 0]) if any(c < 0 for c in changes) else 0,  # Gundukan tertinggi
+        'count': len(changes)
+    }
+
+
+def reference_filter_vehicle_shock(shocks):
+    """filter_vehicle_shock dengan loop per data"""
+    if not shocks or len(shocks) < 3:
+        return {
+            'filtered_shocks': shocks,
+            'vehicle_shocks': [],
+            'road_shocks': shocks,
+            'filter_applied': False,
+            'stats': {
+                'total_count': len(shocks),
+                'vehicle_count': 0,
+                'road_count': len(shocks)
+            }
+        }
+
+    shock_array = np.array(shocks)
+    baseline = np.median(shock_array)
+    shock_std = np.std(shock_array)
+    shock_mean = np.mean(shock_array)
+
+    vehicle_shocks = []
+    road_shocks = []
+
+    for i, shock in enumerate(shock_array):
+        is_vehicle_shock = False
+
+        # Kriteria 1: Guncangan dalam range normal kendaraan
+        if (VEHICLE_SHOCK_FILTER['baseline_min'] <= shock <= VEHICLE_SHOCK_FILTER['baseline_max']):
+            is_vehicle_shock = True
+
+        # Kriteria 2: Guncangan konsisten dengan baseline
+        if abs(shock - baseline) <= VEHICLE_SHOCK_FILTER['baseline_tolerance']:
+            is_vehicle_shock = True
+
+        # Kriteria 3: Analisis pola jika ada data sekitar
+        if i > 0 and i < len(shock_array) - 1:
+            prev_shock = shock_array[i-1]
+            next_shock = shock_array[i+1]
+
+            gradient_prev = abs(shock - prev_shock)
+            gradient_next = abs(shock - next_shock)
+
+            if (gradient_prev <= VEHICLE_SHOCK_FILTER['max_gradient'] and
+                    gradient_next <= VEHICLE_SHOCK_FILTER['max_gradient']):
+                is_vehicle_shock = True
+
+        # Kriteria 4: Override untuk spike tinggi (pasti jalan rusak)
+        if shock >= VEHICLE_SHOCK_FILTER['road_spike_threshold']:
+            is_vehicle_shock = False
+
+        if is_vehicle_shock:
+            vehicle_shocks.append(shock)
+        else:
+            road_shocks.append(shock)
+
+    return {
+        'filtered_shocks': road_shocks,
+        'vehicle_shocks': vehicle_shocks,
+        'road_shocks': road_shocks,
+        'filter_applied': True,
+        'stats': {
+            'total_count': len(shocks),
+            'vehicle_count': len(vehicle_shocks),
+            'road_count': len(road_shocks),
+            'baseline': float(baseline),
+            'shock_std': float(shock_std),
+            'shock_mean': float(shock_mean)
+        }
+    }
+
+
+def reference_filter_vehicle_vibration(vibrations):
+    """filter_vehicle_vibration dengan loop per data dan np.polyfit per jendela 5 point"""
+    if not vibrations or len(vibrations) < 3:
+        return {
+            'filtered_vibrations': vibrations,
+            'vehicle_vibrations': [],
+            'slope_vibrations': [],
+            'road_vibrations': vibrations,
+            'filter_applied': False,
+            'stats': {
+                'total_count': len(vibrations),
+                'vehicle_count': 0,
+                'slope_count': 0,
+                'road_count': len(vibrations)
+            }
+        }
+
+    vib_array = np.array(vibrations)
+    baseline = np.median(vib_array)
+    vib_std = np.std(vib_array)
+    vib_mean = np.mean(vib_array)
+
+    vehicle_vibrations = []
+    slope_vibrations = []
+    road_vibrations = []
+
+    for i, vib in enumerate(vib_array):
+        is_vehicle_vibration = False
+        is_slope_vibration = False
+
+        # Kriteria 1: Getaran dalam range normal kendaraan
+        if (VEHICLE_VIBRATION_FILTER['baseline_min'] <= vib <= VEHICLE_VIBRATION_FILTER['baseline_max']):
+            is_vehicle_vibration = True
+
+        # Kriteria 2: Getaran konsisten dengan baseline
+        if abs(vib - baseline) <= VEHICLE_VIBRATION_FILTER['baseline_tolerance']:
+            is_vehicle_vibration = True
+
+        # Kriteria 3: Deteksi pola tanjakan/turunan (rotasi konstan dalam satu arah)
+        if i >= 2 and i < len(vib_array) - 2:
+            window = vib_array[i-2:i+3]
+            if len(window) >= 5:
+                trend = np.polyfit(range(len(window)), window, 1)[0]
+                if abs(trend) <= VEHICLE_VIBRATION_FILTER['slope_trend_threshold']:
+                    if abs(vib) <= VEHICLE_VIBRATION_FILTER['slope_amplitude_threshold']:
+                        is_slope_vibration = True
+
+        # Kriteria 4: Analisis gradien untuk getaran motor
+        if i > 0 and i < len(vib_array) - 1:
+            prev_vib = vib_array[i-1]
+            next_vib = vib_array[i+1]
+
+            gradient_prev = abs(vib - prev_vib)
+            gradient_next = abs(vib - next_vib)
+
+            if (gradient_prev <= VEHICLE_VIBRATION_FILTER['max_gradient'] and
+                    gradient_next <= VEHICLE_VIBRATION_FILTER['max_gradient']):
+                is_vehicle_vibration = True
+
+        # Kriteria 5: Override untuk spike tinggi (pasti jalan rusak)
+        if abs(vib) >= VEHICLE_VIBRATION_FILTER['road_spike_threshold']:
+            is_vehicle_vibration = False
+            is_slope_vibration = False
+
+        if is_slope_vibration:
+            slope_vibrations.append(vib)
+        elif is_vehicle_vibration:
+            vehicle_vibrations.append(vib)
+        else:
+            road_vibrations.append(vib)
+
+    return {
+        'filtered_vibrations': road_vibrations,
+        'vehicle_vibrations': vehicle_vibrations,
+        'slope_vibrations': slope_vibrations,
+        'road_vibrations': road_vibrations,
+        'filter_applied': True,
+        'stats': {
+            'total_count': len(vibrations),
+            'vehicle_count': len(vehicle_vibrations),
+            'slope_count': len(slope_vibrations),
+            'road_count': len(road_vibrations),
+            'baseline': float(baseline),
+            'vib_std': float(vib_std),
+            'vib_mean': float(vib_mean)
+        }
+    }
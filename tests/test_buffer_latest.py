@@ -0,0 +1,30 @@
+import pytest
+
+from analysis.buffer import DataBuffer, ColumnarDataBuffer
+from analysis.reading import Reading
+
+RECEIVED_AT = 1_700_000_000.0
+
+
+def make_readings(count, first_millis=10_000):
+    return [Reading.from_dict({'seq': i + 1, 'timestamp': first_millis + i * 100, 'sensor1': i}, 'T')
+            for i in range(count)]
+
+
+@pytest.mark.parametrize('buffer_class', [DataBuffer, ColumnarDataBuffer])
+def test_latest_matches_end_of_snapshot(buffer_class):
+    data_buffer = buffer_class(30)
+    assert data_buffer.get_latest() is None
+
+    data_buffer.add_batch(make_readings(50), live=True, current_time=RECEIVED_AT)
+    assert data_buffer.get_latest() is data_buffer.get_data()[-1]
+    assert data_buffer.get_data_count() == 50
+
+    # Data terlambat di-merge ke tengah jendela: data terbaru tidak berubah
+    late = make_readings(1, first_millis=10_050)
+    data_buffer.add_batch(late, live=False, current_time=RECEIVED_AT)
+    assert data_buffer.get_latest() is data_buffer.get_data()[-1]
+    assert data_buffer.get_latest().device_timestamp == 10_000 + 49 * 100
+
+    data_buffer.clear()
+    assert data_buffer.get_latest() is None
@@ -0,0 +1,100 @@
+import pytest
+
+import analysis.ingest as ingest
+from analysis.buffer import DataBuffer, ColumnarDataBuffer, DeviceSession
+from thresholds import ANALYSIS_INTERVAL, ANALYSIS_HOP
+
+READING_COUNT = 600
+SAMPLE_PERIOD_MS = 100
+CHUNK_SIZE = 100
+RECEIVED_AT = 1_700_000_000.0
+
+
+@pytest.fixture(autouse=True)
+def isolated_ingest(monkeypatch):
+    # Hanya buffer yang diuji: database, arsip, ThingsBoard, WAL, dan analisis dimatikan
+    monkeypatch.setattr(ingest, 'save_sensor_data', lambda data: None)
+    monkeypatch.setattr(ingest, 'archive_sensor_data', lambda device_id, data: None)
+    monkeypatch.setattr(ingest, 'send_realtime_payload', lambda payload, data_type=None: False)
+    monkeypatch.setattr(ingest, 'trigger_analysis_if_due', lambda session, current_time=None: False)
+    monkeypatch.setattr(ingest, 'ingest_wal', None)
+
+
+def bulk_readings():
+    return [{'device_id': 'T', 'seq': i + 1, 'timestamp': 10_000 + i * SAMPLE_PERIOD_MS, 'sensor1': 10}
+            for i in range(READING_COUNT)]
+
+
+def device_times(readings):
+    return [data['timestamp'] for data in readings]
+
+
+def make_session(buffer_class):
+    session = DeviceSession('T')
+    session.data_buffer = buffer_class(ANALYSIS_INTERVAL + ANALYSIS_HOP)
+    return session
+
+
+def buffered_span(session):
+    readings = session.data_buffer.get_data()
+    return len(readings), (readings[-1].timestamp - readings[0].timestamp).total_seconds()
+
+
+@pytest.mark.parametrize('buffer_class', [DataBuffer, ColumnarDataBuffer])
+def test_chunked_bulk_matches_single_batch(buffer_class):
+    queue = ingest.IngestQueue(max_size=10, workers=1)
+
+    single = make_session(buffer_class)
+    queue._process(single, bulk_readings(), ingest.MODE_BULK, RECEIVED_AT)
+
+    # Urutan submit_reading_stream: potongan MODE_BULK_CHUNK lalu potongan terakhir MODE_BULK
+    chunked = make_session(buffer_class)
+    readings = bulk_readings()
+    chunks = [readings[i:i + CHUNK_SIZE] for i in range(0, READING_COUNT, CHUNK_SIZE)]
+    for chunk in chunks[:-1]:
+        queue._process(chunked, chunk, ingest.MODE_BULK_CHUNK, RECEIVED_AT, 'req-1')
+        assert chunked.data_buffer.get_data_count() == 0
+    queue._process(chunked, chunks[-1], ingest.MODE_BULK, RECEIVED_AT, 'req-1')
+
+    window = ANALYSIS_INTERVAL + ANALYSIS_HOP
+    expected_count = window * 1000 // SAMPLE_PERIOD_MS + 1
+    assert buffered_span(single) == (expected_count, pytest.approx(window))
+    assert buffered_span(chunked) == buffered_span(single)
+    assert chunked.bulk_pending == {}
+
+
+def test_concurrent_bulk_requests_do_not_mix():
+    queue = ingest.IngestQueue(max_size=10, workers=1)
+    session = make_session(DataBuffer)
+    readings = bulk_readings()
+
+    # Dua request bulk dari device yang sama diproses bergantian oleh worker
+    queue._process(session, readings[:100], ingest.MODE_BULK_CHUNK, RECEIVED_AT, 'req-1')
+    queue._process(session, readings[300:400], ingest.MODE_BULK_CHUNK, RECEIVED_AT, 'req-2')
+    queue._process(session, readings[100:200], ingest.MODE_BULK, RECEIVED_AT, 'req-1')
+    assert session.data_buffer.get_data_count() == 200
+    assert list(session.bulk_pending) == ['req-2']
+
+    queue._process(session, readings[400:500], ingest.MODE_BULK, RECEIVED_AT, 'req-2')
+    assert session.data_buffer.get_data_count() == 400
+    assert session.bulk_pending == {}
+
+
+def test_abandoned_bulk_request_is_flushed_not_mixed(monkeypatch):
+    saved = []
+    monkeypatch.setattr(ingest, 'save_sensor_data', lambda data: saved.append(data.device_timestamp))
+    queue = ingest.IngestQueue(max_size=10, workers=1)
+    session = make_session(DataBuffer)
+    readings = bulk_readings()
+
+    # Potongan terakhir request pertama ditolak (503): potongannya tidak ikut request berikutnya
+    queue._process(session, readings[:100], ingest.MODE_BULK_CHUNK, RECEIVED_AT, 'req-1')
+    queue._process(session, readings[100:200], ingest.MODE_BULK, RECEIVED_AT + 1, 'req-2')
+    assert saved == device_times(readings[100:200])
+    assert list(session.bulk_pending) == ['req-1']
+
+    # Setelah BULK_PENDING_TIMEOUT potongan yang tertinggal diproses sendiri, tidak dibuang
+    later = RECEIVED_AT + ingest.BULK_PENDING_TIMEOUT + 1
+    queue._process(session, readings[200:300], ingest.MODE_BULK, later, 'req-3')
+    assert saved == device_times(readings[100:200] + readings[:100] + readings[200:300])
+    assert session.bulk_pending == {}
@@ -0,0 +1,53 @@
+import time
+
+from analysis.buffer import DeviceRegistry
+from analysis.checkpoint import SessionCheckpoint
+from analysis.reading import Reading
+
+
+def add_readings(registry, device_id, count=20):
+    session = registry.get_session(device_id)
+    readings = [Reading.from_dict({'seq': i + 1, 'timestamp': 1000 + i * 100, 'sensor1': 10}, device_id)
+                for i in range(count)]
+    session.data_buffer.add_batch(readings, live=True)
+    session.warming_up_cleared = True
+    return session
+
+
+def test_workers_sharing_a_checkpoint_keep_each_others_devices(tmp_path):
+    path = str(tmp_path / 'sessions.npz')
+    first_worker, second_worker = DeviceRegistry(), DeviceRegistry()
+    add_readings(first_worker, 'A')
+    add_readings(second_worker, 'B', count=10)
+
+    assert SessionCheckpoint(path, registry=first_worker).save() == 1
+    second = SessionCheckpoint(path, registry=second_worker)
+    assert second.save() == 1
+    assert second.get_stats()['last_merged_devices'] == 1
+
+    restarted = DeviceRegistry()
+    restored = SessionCheckpoint(path, registry=restarted).restore()
+    assert sorted(restored) == ['A', 'B']
+    assert restarted.find_session('A').data_buffer.get_data_count() == 20
+    assert restarted.find_session('B').data_buffer.get_data_count() == 10
+
+
+def test_stale_devices_of_other_workers_are_dropped(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sessions.npz')
+    first_worker, second_worker = DeviceRegistry(), DeviceRegistry()
+    add_readings(first_worker, 'A')
+    add_readings(second_worker, 'B')
+
+    SessionCheckpoint(path, registry=first_worker, max_age=60).save()
+    saved_at = time.time()
+    monkeypatch.setattr(time, 'time', lambda: saved_at + 120)
+    later = SessionCheckpoint(path, registry=second_worker, max_age=60)
+    later.save()
+    assert later.get_stats()['last_merged_devices'] == 0
+
+
+def test_checkpoint_with_empty_buffer(tmp_path):
+    registry = DeviceRegistry()
+    registry.get_session('warming-up')  # Device masih warming up: buffer kosong
+
+    assert SessionCheckpoint(str(tmp_path / 'sessions.npz'), registry=registry).save() == 1
@@ -0,0 +1,81 @@
+from analysis.dedup import ReplayFilter, SequenceWindow
+
+SAMPLE_PERIOD_MS = 100  # 10 Hz, seperti firmware
+
+
+def live_reading(seq, millis):
+    return {'seq': seq, 'timestamp': millis, 'sensor1': 10}
+
+
+def send_live(replay_filter, readings, received_at):
+    """Urutan yang sama dengan IngestQueue._process untuk data live"""
+    replay_filter.observe_clock(readings, received_at)
+    return [data for data in readings if replay_filter.accept(data)]
+
+
+def test_sequence_window_drops_duplicates():
+    window = SequenceWindow(size=64)
+    assert [window.check_and_add(seq) for seq in (1, 2, 3, 2, 5, 4, 4)] == [True, True, True, False, True, True, False]
+
+
+def test_resent_live_reading_is_duplicate():
+    replay_filter = ReplayFilter()
+    reading = live_reading(1, 5000)
+    assert send_live(replay_filter, [reading], 1000.0) == [reading]
+    # Retry setelah timeout: millis sama, diterima jauh lebih lambat
+    assert send_live(replay_filter, [dict(reading)], 1030.0) == []
+    assert replay_filter.reboot_count == 0
+
+
+def test_reboot_resets_sequence_window():
+    replay_filter = ReplayFilter()
+    boot_time = 1000.0
+
+    # 500 data (50 detik) sebelum reboot, jauh di bawah DEDUP_WINDOW_SIZE
+    for seq in range(1, 501):
+        millis = 2000 + seq * SAMPLE_PERIOD_MS
+        assert send_live(replay_filter, [live_reading(seq, millis)], boot_time + millis / 1000.0)
+
+    # Reboot 20 detik kemudian: seq dan millis firmware mulai dari awal
+    reboot_time = boot_time + 2000 / 1000.0 + 500 * SAMPLE_PERIOD_MS / 1000.0 + 20
+    accepted = []
+    for seq in range(1, 101):
+        millis = 2000 + seq * SAMPLE_PERIOD_MS
+        accepted += send_live(replay_filter, [live_reading(seq, millis)], reboot_time + millis / 1000.0)
+
+    assert len(accepted) == 100
+    assert replay_filter.reboot_count == 1
+    assert replay_filter.duplicate_count == 0
+
+    # Setelah reboot, duplikat tetap dibuang
+    assert send_live(replay_filter, [live_reading(100, 12000)], reboot_time + 13.0) == []
+
+
+def test_bulk_resend_is_not_reboot():
+    replay_filter = ReplayFilter()
+    batch = [live_reading(seq, seq * SAMPLE_PERIOD_MS) for seq in range(1, 301)]
+    assert len(send_live(replay_filter, batch, 100.0)) == 300
+    # Batch yang sama dikirim ulang setelah timeout
+    assert send_live(replay_filter, [dict(data) for data in batch], 160.0) == []
+    assert replay_filter.reboot_count == 0
+
+
+def test_sequence_behind_window_is_duplicate():
+    window = SequenceWindow(size=64)
+    for seq in range(1, 201):
+        assert window.check_and_add(seq)
+    # Replay lama yang sudah keluar window tidak boleh me-reset window
+    assert not window.check_and_add(10)
+    assert window.highest == 200
+    assert not window.check_and_add(199)
+    assert window.check_and_add(201)
+
+
+def test_stale_replay_without_reboot_is_dropped():
+    replay_filter = ReplayFilter(size=64)
+    batch = [live_reading(seq, seq * SAMPLE_PERIOD_MS) for seq in range(1, 201)]
+    assert len(send_live(replay_filter, batch, 100.0)) == 200
+    # /offline-data lama datang lagi: tidak ada reboot, jadi tetap dibuang
+    stale = [live_reading(seq, seq * SAMPLE_PERIOD_MS) for seq in range(1, 11)]
+    assert [data for data in stale if replay_filter.accept(data)] == []
+    assert replay_filter.duplicate_count == 10
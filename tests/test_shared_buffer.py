@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('fcntl')
+from analysis import shared_buffer
+from analysis.reading import Reading
+from analysis.shared_buffer import SharedDeviceSession, sweep_stale_segments
+
+pytestmark = pytest.mark.skipif(not os.path.isdir(shared_buffer.SHM_DIRECTORY), reason="butuh /dev/shm")
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def prefix(tmp_path, monkeypatch):
+    prefix = f"rstest{os.getpid()}"
+    monkeypatch.setitem(shared_buffer.SHARED_BUFFER_CONFIG, 'prefix', prefix)
+    monkeypatch.setitem(shared_buffer.SHARED_BUFFER_CONFIG, 'lock_dir', str(tmp_path / 'locks'))
+    yield prefix
+    for name in segments(prefix):
+        os.remove(os.path.join(shared_buffer.SHM_DIRECTORY, name))
+
+
+def segments(prefix):
+    return [name for name in os.listdir(shared_buffer.SHM_DIRECTORY) if name.startswith(f"{prefix}-")]
+
+
+def test_last_release_unlinks_segment(prefix):
+    first, second = SharedDeviceSession('A'), SharedDeviceSession('A')
+    first.data_buffer.add_batch([Reading.from_dict({'seq': 1, 'timestamp': 1000, 'sensor1': 10}, 'A')], live=True)
+    assert first.acquire_analysis()
+
+    first.close()
+    assert len(segments(prefix)) == 1
+    # Lease pemilik yang menutup session dilepas untuk worker lain
+    assert second.store.get('owner_pid') == 0
+    assert second.data_buffer.get_data_count() == 1
+
+    second.close()
+    assert segments(prefix) == []
+
+
+def test_close_waits_for_running_work(prefix):
+    session = SharedDeviceSession('A')
+    assert session.begin_use()
+    session.close()
+    # Batch ingest / job analisis yang sedang berjalan masih bisa memakai buffer
+    assert not session.begin_use()
+    assert session.data_buffer.get_data_count() == 0
+    assert len(segments(prefix)) == 1
+
+    session.end_use()
+    assert segments(prefix) == []
+
+
+def test_sweep_removes_segments_of_dead_workers_only(prefix, tmp_path):
+    crashed_worker = (
+        f"import os, sys; sys.path.insert(0, {REPO_ROOT!r}); os.environ.setdefault('FLASK_PORT', '5000')\n"
+        f"from analysis import shared_buffer\n"
+        f"shared_buffer.SHARED_BUFFER_CONFIG.update(prefix={prefix!r}, lock_dir={str(tmp_path / 'locks')!r})\n"
+        f"shared_buffer.SharedDeviceSession('crashed')\n"
+        f"os._exit(1)\n"
+    )
+    subprocess.run([sys.executable, '-c', crashed_worker], check=False)
+    live = SharedDeviceSession('live')
+    assert len(segments(prefix)) == 2
+
+    assert sweep_stale_segments() == 1
+    assert segments(prefix) == [live.store.name]
+    live.close()
@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+from filters.shock_filter import filter_vehicle_shock
+from tests.filter_asserts import assert_same_filter_result
+from tests.reference import reference_filter_vehicle_shock
+from thresholds import VEHICLE_SHOCK_FILTER
+
+SHOCK_KEYS = ('filtered_shocks', 'vehicle_shocks', 'road_shocks')
+NAN = float('nan')
+# Nilai tepat di batas range kendaraan dan spike, serta selisih tepat max_gradient / baseline_tolerance
+BOUNDARY_VALUES = [
+    0.0, VEHICLE_SHOCK_FILTER['baseline_min'], VEHICLE_SHOCK_FILTER['baseline_max'],
+    VEHICLE_SHOCK_FILTER['road_spike_threshold'], VEHICLE_SHOCK_FILTER['road_spike_threshold'] - 0.1,
+    10.0, 15.0, 30.0, 35.0, 40.0
+]
+
+
+def random_shocks(rnd, count, kind):
+    if kind == 'uniform':
+        return [rnd.uniform(0, 60) for _ in range(count)]
+    if kind == 'boundary':
+        return [rnd.choice(BOUNDARY_VALUES) for _ in range(count)]
+    return [rnd.choice([NAN, 5.0, 26.0, 12.0, 40.0]) for _ in range(count)]
+
+
+@pytest.mark.parametrize('kind', ['uniform', 'boundary', 'nan'])
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 4, 5, 10, 300])
+def test_vectorized_filter_matches_loop(kind, count):
+    rnd = random.Random(f"{kind}-{count}")
+    for _ in range(50):
+        shocks = random_shocks(rnd, count, kind)
+        assert_same_filter_result(filter_vehicle_shock(shocks), reference_filter_vehicle_shock(shocks), SHOCK_KEYS)
+
+
+@pytest.mark.parametrize('shocks', [
+    [],
+    [26.0, 26.0],
+    [5.0, 5.0, 5.0],
+    [10.0, 15.0, 20.0, 25.0, 30.0],   # Gradien tepat max_gradient
+    [40.0, 35.0, 40.0, 35.0, 40.0],   # Di atas range kendaraan, gradual
+    [25.0, 25.0, 25.0, 25.0],         # Tepat road_spike_threshold
+    [NAN, NAN, NAN],
+])
+def test_edge_cases_match_loop(shocks):
+    assert_same_filter_result(filter_vehicle_shock(shocks), reference_filter_vehicle_shock(shocks), SHOCK_KEYS)
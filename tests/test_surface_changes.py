@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+import pytest
+
+from analysis.analyzer import summarize_surface_changes
+from analysis.reading import SENSOR_COUNT
+from analysis.windowing import find_surface_changes
+from tests.reference import reference_find_surface_changes, reference_summarize_surface_changes
+
+NAN = float('nan')
+# Nilai di sekitar threshold minor (selisih tepat 0.5), sensor hilang (NaN), dan lonjakan besar
+SENSOR_VALUES = [20.0, 20.5, 21.7, 35.2, 50.0, 18.3, 400.0, NAN]
+
+
+def random_sensor_rows(count, seed):
+    rnd = random.Random(seed)
+    return [[rnd.choice(SENSOR_VALUES) for _ in range(SENSOR_COUNT)] for _ in range(count)]
+
+
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 50, 300])
+@pytest.mark.parametrize('seed', range(5))
+def test_find_surface_changes_matches_loop(count, seed):
+    rows = random_sensor_rows(count, seed)
+    changes, channels = find_surface_changes(np.array(rows, dtype=np.float64).reshape(-1, SENSOR_COUNT))
+    expected_changes, expected_channels = reference_find_surface_changes(rows)
+
+    assert changes.tolist() == expected_changes
+    assert channels.tolist() == expected_channels
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_summarize_surface_changes_matches_loop(seed):
+    rows = random_sensor_rows(300, seed)
+    changes, channels = find_surface_changes(np.array(rows, dtype=np.float64))
+
+    summary = summarize_surface_changes(changes, channels)
+    per_sensor = summary.pop('channels')
+    assert summary == reference_summarize_surface_changes(changes.tolist())
+
+    expected_changes, expected_channels = reference_find_surface_changes(rows)
+    for channel, stats in enumerate(per_sensor):
+        sensor_changes = [c for c, ch in zip(expected_changes, expected_channels) if ch == channel]
+        expected = reference_summarize_surface_changes(sensor_changes)
+        assert stats['sensor'] == f"sensor{channel + 1}"
+        assert stats['count'] == expected['count']
+        assert stats['max_change'] == expected['max_change']
+        assert stats['avg_change'] == pytest.approx(expected['avg_change'])
+        assert stats['max_positive'] == expected['max_positive']
+        assert stats['max_negative'] == expected['max_negative']
+
+
+def test_summarize_without_changes():
+    summary = summarize_surface_changes(np.empty(0), np.empty(0, dtype=np.intp))
+    assert summary['count'] == 0 and summary['max_change'] == 0 and summary['avg_change'] == 0
+    assert all(stats['count'] == 0 for stats in summary['channels'])
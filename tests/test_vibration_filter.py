@@ -0,0 +1,56 @@
+import random
+import warnings
+
+import numpy as np
+import pytest
+
+from filters.vibration_filter import filter_vehicle_vibration, rolling_slope
+from tests.filter_asserts import assert_same_filter_result
+from tests.reference import reference_filter_vehicle_vibration
+from thresholds import VEHICLE_VIBRATION_FILTER
+
+VIBRATION_KEYS = ('filtered_vibrations', 'vehicle_vibrations', 'slope_vibrations', 'road_vibrations')
+WINDOW_SIZE = VEHICLE_VIBRATION_FILTER['slope_window']
+TREND_THRESHOLD = VEHICLE_VIBRATION_FILTER['slope_trend_threshold']
+NAN = float('nan')
+
+
+def random_vibrations(rnd, count, kind):
+    if kind == 'uniform':
+        return [rnd.uniform(-20, 20) for _ in range(count)]
+    if kind == 'integer':
+        # Banyak jendela dengan tren tepat di slope_trend_threshold
+        return [float(rnd.choice([0, 1, 2, 3, 4, 5, 6, 8, 10, 12, 13, -2, -4, -8, -12])) for _ in range(count)]
+    if kind == 'ramp':
+        start, step = rnd.choice([-8.0, 0.0, 3.0]), rnd.choice([-TREND_THRESHOLD, TREND_THRESHOLD, 1.5, 2.5])
+        return [start + step * i + rnd.choice([0.0, 0.0, 1e-12]) for i in range(count)]
+    return [rnd.choice([NAN, 0.5, 4.0, 8.0, 12.0]) for _ in range(count)]
+
+
+@pytest.mark.parametrize('kind', ['uniform', 'integer', 'ramp', 'nan'])
+@pytest.mark.parametrize('count', [0, 1, 2, 3, 4, 5, 6, 7, 10, 300])
+def test_vectorized_filter_matches_loop(kind, count):
+    rnd = random.Random(f"{kind}-{count}")
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')  # np.polyfit acuan pada jendela NaN
+        for _ in range(40):
+            vibrations = random_vibrations(rnd, count, kind)
+            assert_same_filter_result(
+                filter_vehicle_vibration(vibrations), reference_filter_vehicle_vibration(vibrations), VIBRATION_KEYS
+            )
+
+
+def test_rolling_slope_matches_polyfit():
+    values = np.random.default_rng(23).uniform(-15, 15, 200)
+    x = np.arange(WINDOW_SIZE)
+    expected = [np.polyfit(x, values[k:k + WINDOW_SIZE], 1)[0] for k in range(len(values) - WINDOW_SIZE + 1)]
+    assert rolling_slope(values, WINDOW_SIZE) == pytest.approx(expected, rel=1e-9, abs=1e-12)
+
+
+@pytest.mark.parametrize('step', [TREND_THRESHOLD, -TREND_THRESHOLD])
+def test_rolling_slope_uses_polyfit_at_threshold(step):
+    # Tren tepat di threshold: hasil closed form bisa berbeda di bit terakhir, jadi dihitung ulang
+    values = np.array([0.3 + step * i for i in range(WINDOW_SIZE + 3)])
+    x = np.arange(WINDOW_SIZE)
+    expected = [np.polyfit(x, values[k:k + WINDOW_SIZE], 1)[0] for k in range(len(values) - WINDOW_SIZE + 1)]
+    assert rolling_slope(values, WINDOW_SIZE).tolist() == expected
@@ -0,0 +1,104 @@
+import os
+import subprocess
+import sys
+import time
+
+import analysis.ingest as ingest
+from analysis.buffer import DeviceRegistry, device_registry
+from analysis.checkpoint import SessionCheckpoint
+from analysis.ingest import replay_write_ahead_log, MODE_BULK
+from analysis.reading import Reading
+from core.wal import WriteAheadLog
+
+NOW = 1_700_000_000.0
+
+
+def bulk_record(device_id, received_at, count=5):
+    readings = [{'device_id': device_id, 'seq': i + 1, 'timestamp': 1000 + i * 100, 'sensor1': 10} for i in range(count)]
+    return {'device_id': device_id, 'received_at': received_at, 'mode': MODE_BULK, 'readings': readings}
+
+
+def test_replay_skips_records_older_than_max_age(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / 'wal'))
+    wal.append(bulk_record('wal-stale', NOW - 3600))
+    wal.append(bulk_record('wal-recent', NOW - 10))
+    wal.sync()
+
+    assert replay_write_ahead_log(wal, current_time=NOW, max_age=120) == 5
+    assert device_registry.find_session('wal-stale') is None
+
+    session = device_registry.find_session('wal-recent')
+    assert session.data_buffer.get_data_count() == 5
+    assert session.warming_up_cleared
+    assert session.last_seen == NOW - 10
+
+
+def test_checkpoint_truncates_covered_segments(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / 'wal'))
+    registry = DeviceRegistry()
+    checkpoint = SessionCheckpoint(str(tmp_path / 'session.npz'), registry=registry, wal=wal)
+
+    record = bulk_record('A', NOW)
+    wal.append(record)
+    session = registry.get_session('A')
+    session.data_buffer.add_batch([Reading.from_dict(data, 'A') for data in record['readings']], live=True)
+    first_segment = wal.segment_indexes()[0]
+
+    # Checkpoint pertama menutup segmen; segmen baru dihapus setelah checkpoint berikutnya
+    assert checkpoint.save() == 1
+    assert first_segment in wal.segment_indexes()
+
+    wal.append(bulk_record('A', NOW + 5))
+    session.last_analysis_time = NOW + 5
+    assert checkpoint.save() == 1
+    assert first_segment not in wal.segment_indexes()
+    assert checkpoint.get_stats()['wal_segments_truncated'] == 1
+    assert sum(1 for _ in wal.replay()) == 1
+
+
+def test_open_claims_segments_of_dead_workers_only(tmp_path):
+    root = tmp_path / 'wal'
+    finished = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+    dead_pid, live_pid = int(finished.stdout), os.getppid()
+
+    for pid in (dead_pid, live_pid):
+        os.makedirs(root / f'worker-{pid}')
+        (root / f'worker-{pid}' / 'segment-00000001.wal').write_bytes(b'')
+
+    wal = WriteAheadLog(str(root))
+    wal.open()
+    assert wal.directory == str(root / f'worker-{os.getpid()}')
+    assert wal.get_stats()['claimed_segments'] == 1
+    assert sorted(os.listdir(root)) == sorted([f'worker-{os.getpid()}', f'worker-{live_pid}'])
+    assert os.listdir(root / f'worker-{live_pid}') == ['segment-00000001.wal']
+
+
+def test_reading_queued_across_checkpoint_is_replayed(tmp_path, monkeypatch):
+    for name in ('save_sensor_data', 'trigger_analysis_if_due', 'send_realtime_payload'):
+        monkeypatch.setattr(ingest, name, lambda *args, **kwargs: None)
+    monkeypatch.setattr(ingest, 'archive_sensor_data', lambda device_id, data: None)
+    wal = WriteAheadLog(str(tmp_path / 'wal'))
+    monkeypatch.setattr(ingest, 'ingest_wal', wal)
+    path = str(tmp_path / 'sessions.npz')
+
+    registry = DeviceRegistry()
+    session = registry.get_session('queued')
+    session.warming_up_cleared = True
+    queue = ingest.IngestQueue(max_size=10, workers=1)
+    enqueued_at = time.time() - 1
+    queue._process(session, [{'seq': 1, 'timestamp': 1000, 'sensor1': 10}], ingest.MODE_REALTIME, enqueued_at)
+
+    # Data kedua sudah diterima (received_at) sebelum checkpoint, tapi baru diproses worker setelahnya
+    assert SessionCheckpoint(path, registry=registry, wal=wal).save() == 1
+    queue._process(session, [{'seq': 2, 'timestamp': 1100, 'sensor1': 11}], ingest.MODE_REALTIME, enqueued_at)
+    assert session.data_buffer.get_data_count() == 2
+    wal.sync()
+
+    # Restart: checkpoint berisi data pertama, data kedua hanya ada di WAL setelah penanda checkpoint
+    restarted = DeviceRegistry()
+    monkeypatch.setattr(ingest, 'device_registry', restarted)
+    restored = SessionCheckpoint(path, registry=restarted).restore()
+    replay_write_ahead_log(WriteAheadLog(str(tmp_path / 'wal')), restored)
+
+    readings = restarted.find_session('queued').data_buffer.get_data()
+    assert sorted(reading.seq for reading in readings) == [1, 2]
@@ -59,6 +59,7 @@ VEHICLE_VIBRATION_FILTER = {
     # Parameter untuk deteksi tanjakan/turunan
     'slope_trend_threshold': 2.0,   
     'slope_amplitude_threshold': 10.0,  
+    'slope_window': 5,      # jumlah sample (sekitar titik) untuk tren linear tanjakan/turunan
     
     # Minimum sample untuk analisis pola
     'min_samples': 3        
@@ -93,4 +94,14 @@ MAX_GPS_GAP = 50.0  # Maximum gap antara data points GPS untuk kontinuitas (mete
 EARTH_RADIUS = 6371000  # Radius bumi untuk perhitungan jarak (meter)
 
 # PARAMETER WAKTU
-ANALYSIS_INTERVAL = 30  # Interval analisis (detik)
+ANALYSIS_INTERVAL = 30  # Panjang jendela analisis (detik)
+ANALYSIS_HOP = 5        # Jendela dievaluasi tiap hop detik (overlap, interval sebaiknya kelipatan hop); = ANALYSIS_INTERVAL untuk tumbling
+
+# PARAMETER DEVICE (multi-kendaraan)
+DEFAULT_DEVICE_ID = 'default'   # Dipakai jika payload tidak membawa device_id
+DEVICE_IDLE_TIMEOUT = 300       # Detik tanpa data sebelum session device dihapus
+MAX_DEVICES = 500               # Batas jumlah session device aktif (LRU)
+DEVICE_SWEEP_INTERVAL = 30      # Interval pengecekan device idle (detik)
+CLOCK_RESYNC_THRESHOLD = 5.0    # Detik: lompatan offset jam device lebih dari ini dianggap reboot/resync
+DEDUP_WINDOW_SIZE = 4096        # Jumlah seq/timestamp terakhir per device yang diingat untuk buang data replay
+BULK_PENDING_TIMEOUT = 30       # Detik: potongan /multisensor/bulk tanpa potongan terakhir diproses sendiri setelah ini